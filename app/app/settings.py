@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.1/ref/settings/
 """
 
+import importlib.util
 import os
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
@@ -78,17 +79,107 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
 
+# core.db.postgresql adds POOL_SIZE, HEALTH_CHECKS and STATEMENT_TIMEOUT
+# to Django's backend, see core/db/postgresql/base.py. With DB_POOL_SIZE,
+# set DB_CONN_MAX_AGE to 0 so that connections go back to the pool after
+# each request.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db.postgresql',
         'HOST': os.environ.get('DB_HOST'),
+        'PORT': os.environ.get('DB_PORT', ''),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
-        'PASSWORD': os.environ.get('DB_PASS')
+        'PASSWORD': os.environ.get('DB_PASS'),
+        # seconds a thread keeps its connection open across requests
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'POOL_SIZE': int(os.environ.get('DB_POOL_SIZE', 0)),
+        'HEALTH_CHECKS': os.environ.get('DB_HEALTH_CHECKS', '1') == '1',
+        # pgbouncer in transaction mode can't keep a cursor open across
+        # transactions; the export then reads all rows at once
+        'DISABLE_SERVER_SIDE_CURSORS': os.environ.get(
+            'DB_DISABLE_SERVER_SIDE_CURSORS', '0') == '1',
+        # milliseconds any one statement of a web request may run, 0 for
+        # no limit; migrations and other management commands run without
+        # it (pgbouncer needs `options` in ignore_startup_parameters)
+        'STATEMENT_TIMEOUT': int(
+            os.environ.get('DB_STATEMENT_TIMEOUT', 30000)),
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+        },
     }
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'default',
+    },
+    'responses': {
+        'BACKEND': os.environ.get(
+            'RESPONSE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('RESPONSE_CACHE_LOCATION', 'responses'),
+        'TIMEOUT': int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 300)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(
+                os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 5000)),
+        },
+    },
+}
+
+# per-user versioned cache for the recipe list endpoints, see recipe/cache.py
+RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', '1') == '1'
+RESPONSE_CACHE_ALIAS = 'responses'
+
+# build recipe/tag/ingredient lists from values() rows instead of
+# serializing model instances, see recipe/mixins.py
+VALUES_LIST_ENABLED = os.environ.get('VALUES_LIST_ENABLED', '1') == '1'
+
+# core/renderers.py encodes JSON with orjson when it is installed
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+}
+
+# recipes read per server-side cursor fetch by the streaming export, see
+# recipe/export.py
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 2000))
+
+# recipes written per bulk_create batch (and savepoint) by imports, see
+# recipe/importer.py
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 1000))
+
+# ?search= on recipes, see recipe/search.py: 'fulltext' (Postgres only)
+# or 'ilike'
+RECIPE_SEARCH_MODE = os.environ.get('RECIPE_SEARCH_MODE', 'fulltext')
+
+# read recipe tag/ingredient ids and filter on them from the denormalized
+# id arrays instead of the m2m tables, see recipe/id_arrays.py
+RECIPE_ID_ARRAYS = os.environ.get('RECIPE_ID_ARRAYS', '1') == '1'
+
+# authenticated token lookups, see user/authentication.py; the local LRU
+# timeout bounds how long other processes may honour a revoked token
+TOKEN_AUTH_CACHE_ALIAS = 'default'
+TOKEN_AUTH_CACHE_TIMEOUT = int(os.environ.get('TOKEN_AUTH_CACHE_TIMEOUT', 300))
+TOKEN_AUTH_CACHE_LOCAL_TIMEOUT = int(
+    os.environ.get('TOKEN_AUTH_CACHE_LOCAL_TIMEOUT', 10))
+TOKEN_AUTH_CACHE_SIZE = int(os.environ.get('TOKEN_AUTH_CACHE_SIZE', 1024))
+
+# API tokens, see user/tokens.py: TOKEN_SIGNED issues stateless signed
+# tokens instead of database ones, TOKEN_EXPIRY (seconds) limits the age
+# of either kind
+TOKEN_SIGNED = os.environ.get('TOKEN_SIGNED', '0') == '1'
+TOKEN_EXPIRY = int(os.environ['TOKEN_EXPIRY']) \
+    if os.environ.get('TOKEN_EXPIRY') else None
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -107,6 +198,37 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# PASSWORD_HASHER picks the hasher for new passwords among those whose
+# library is installed (argon2-cffi, bcrypt); the others stay listed so
+# existing hashes still verify and are rehashed on the next login
+
+PASSWORD_HASHER_CHOICES = (
+    ('argon2', 'argon2',
+     'django.contrib.auth.hashers.Argon2PasswordHasher'),
+    ('bcrypt', 'bcrypt',
+     'django.contrib.auth.hashers.BCryptSHA256PasswordHasher'),
+    ('pbkdf2', None, 'django.contrib.auth.hashers.PBKDF2PasswordHasher'),
+    ('pbkdf2_sha1', None,
+     'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher'),
+)
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'argon2')
+_AVAILABLE_HASHERS = [
+    (name, path) for name, library, path in PASSWORD_HASHER_CHOICES
+    if library is None or importlib.util.find_spec(library)
+]
+PASSWORD_HASHERS = [
+    path for name, path in _AVAILABLE_HASHERS if name == PASSWORD_HASHER
+] + [path for name, path in _AVAILABLE_HASHERS if name != PASSWORD_HASHER]
+
+# logins verify passwords on a bounded pool (see user/passwords.py) so a
+# burst of them can't take every thread of a worker; beyond
+# LOGIN_HASHING_QUEUE waiting logins are refused with a 503
+AUTHENTICATION_BACKENDS = ['user.backends.PooledModelBackend']
+LOGIN_HASHING_WORKERS = int(
+    os.environ.get('LOGIN_HASHING_WORKERS', os.cpu_count() or 1))
+LOGIN_HASHING_QUEUE = int(os.environ.get('LOGIN_HASHING_QUEUE', 32))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/2.1/topics/i18n/
@@ -131,4 +253,29 @@ MEDIA_URL = '/media/'
 STATIC_ROOT = '/vol/web/static'
 MEDIA_ROOT = '/vol/web/media'
 
-AUTH_USER_MODEL = 'core.User'
\ No newline at end of file
+# How core.views.serve_media hands files over: '' streams them from
+# Django (sendfile through wsgi.file_wrapper where the server has it),
+# 'x-accel-redirect' (nginx) or 'x-sendfile' (apache, lighttpd) let the
+# front end server send them
+MEDIA_SENDFILE = os.environ.get('MEDIA_SENDFILE', '')
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get(
+    'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+MEDIA_MAX_AGE = int(os.environ.get('MEDIA_MAX_AGE', 3600))
+
+AUTH_USER_MODEL = 'core.User'
+
+
+# Recipe image pipeline, see recipe/images.py
+# 'thread' processes uploads on a background pool after the request has
+# committed; 'sync' processes them inside the request (tests, debugging)
+
+IMAGE_PROCESSING_MODE = os.environ.get('IMAGE_PROCESSING_MODE', 'thread')
+IMAGE_PROCESSING_WORKERS = int(
+    os.environ.get('IMAGE_PROCESSING_WORKERS', 2))
+IMAGE_UPLOAD_MAX_SIZE = int(
+    os.environ.get('IMAGE_UPLOAD_MAX_SIZE', 25 * 2 ** 20))
+IMAGE_RENDITIONS = {
+    'thumbnail': (320, 320),
+    'medium': (1024, 1024),
+    'original': (2560, 2560),
+}
\ No newline at end of file
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+# only web requests get the database statement timeout
+from core.db.postgresql.base import serve_requests  # noqa: E402
+
+serve_requests()
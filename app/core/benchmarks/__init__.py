@@ -0,0 +1,32 @@
+"""Performance scenarios run by `manage.py benchmark <scenario>`
+
+Each scenario is a callable `run(command, user, options)` that is handed a
+user whose dataset has already been seeded.
+"""
+from django.utils.module_loading import import_string
+
+
+SCENARIOS = {
+    'indexes': 'core.benchmarks.indexes.run',
+    'filters': 'core.benchmarks.filters.run',
+    'cache': 'core.benchmarks.response_cache.run',
+    'images': 'core.benchmarks.images.run',
+    'uploads': 'core.benchmarks.uploads.run',
+    'media': 'core.benchmarks.media.run',
+    'token_auth': 'core.benchmarks.token_auth.run',
+    'logins': 'core.benchmarks.logins.run',
+    'tokens': 'core.benchmarks.tokens.run',
+    'search': 'core.benchmarks.search.run',
+    'fields': 'core.benchmarks.fields.run',
+    'serialization': 'core.benchmarks.serialization.run',
+    'export': 'core.benchmarks.export.run',
+    'imports': 'core.benchmarks.imports.run',
+    'ensure': 'core.benchmarks.ensure.run',
+    'id_arrays': 'core.benchmarks.id_arrays.run',
+    'connections': 'core.benchmarks.connections.run',
+}
+
+
+def get_scenario(name):
+    """import and return the scenario callable registered as <name>"""
+    return import_string(SCENARIOS[name])
@@ -0,0 +1,29 @@
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+
+def view_for(viewset, user, params=None, action='list', method='get'):
+    """instantiate <viewset> for <action> as if <user> requested it"""
+    factory_method = getattr(APIRequestFactory(), method)
+    request = Request(
+        factory_method('/', params or {}, HTTP_HOST='localhost'))
+    request.user = user
+
+    view = viewset(request=request, action=action, format_kwarg=None)
+    view.args, view.kwargs = (), {}
+    view.headers = {}
+
+    return view
+
+
+def call_view(viewset, actions, user, params=None, method='get', path='/',
+              **kwargs):
+    """run a request for <user> through <viewset> and return the response"""
+    request = getattr(APIRequestFactory(), method)(
+        path, params or {}, HTTP_HOST='localhost')
+    force_authenticate(request, user=user)
+    response = viewset.as_view(actions)(request, **kwargs)
+    # release uploaded temporary files, as the request handler would
+    request.close()
+
+    return response
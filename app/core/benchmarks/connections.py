@@ -0,0 +1,72 @@
+"""Connection setup overhead per request, by connection settings
+
+THREADS threads each serve REQUESTS requests of one small query through
+a connection handle of their own, the way Django serves requests: the
+handle is checked at the start and end of every request, which closes it
+(CONN_MAX_AGE = 0), keeps it open (CONN_MAX_AGE > 0) or returns it to
+the pool (POOL_SIZE, see core/db/postgresql/base.py). Reported are the
+requests per second and the median and 99th percentile request latency.
+
+The seeded rows are not committed, so the query sees none of them; what
+is measured is everything around it.
+"""
+import statistics
+import threading
+import time
+from django.db import connection
+from core.db.postgresql import base
+
+
+REQUESTS = 200
+THREADS = (1, 8)
+
+MODES = (
+    ('connect', {'CONN_MAX_AGE': 0, 'POOL_SIZE': 0}),
+    ('persistent', {'CONN_MAX_AGE': 60, 'POOL_SIZE': 0}),
+    ('pool', {'CONN_MAX_AGE': 0, 'POOL_SIZE': max(THREADS)}),
+)
+
+
+def run(command, user, options):
+    for threads in THREADS:
+        for label, settings in MODES:
+            settings = dict(
+                connection.settings_dict, HEALTH_CHECKS=True, **settings)
+            elapsed, latencies = _load(settings, threads, user.pk)
+            latencies.sort()
+            command.stdout.write(
+                f'{label:>10} x{threads}: '
+                f'{len(latencies) / elapsed:8.0f} requests/s  '
+                f'p50 {statistics.median(latencies):7.2f} ms  '
+                f'p99 {latencies[int(len(latencies) * .99)]:7.2f} ms')
+        base.close_pools()
+
+
+def _load(settings, threads, user_id):
+    """(seconds, request latencies in ms) of <threads> serving requests"""
+    latencies = []
+
+    def serve():
+        wrapper = base.DatabaseWrapper(settings, alias='benchmark')
+        samples = []
+        for _ in range(REQUESTS):
+            start = time.perf_counter()
+            wrapper.close_if_unusable_or_obsolete()
+            with wrapper.cursor() as cursor:
+                cursor.execute(
+                    'SELECT count(*) FROM core_recipe WHERE user_id = %s',
+                    [user_id])
+                cursor.fetchone()
+            wrapper.close_if_unusable_or_obsolete()
+            samples.append((time.perf_counter() - start) * 1000)
+        wrapper.close()
+        latencies.extend(samples)
+
+    workers = [threading.Thread(target=serve) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    return time.perf_counter() - start, latencies
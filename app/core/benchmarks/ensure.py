@@ -0,0 +1,49 @@
+"""Getting ids for a list of tag names, half of which exist
+
+Clients used to list every tag, diff the names and POST the missing ones
+one at a time; the ensure endpoint does it in one request. Each run asks
+for NAMES names, every other one already a tag of the seeded user; the
+tags a run creates are deleted before the next.
+"""
+import statistics
+from django.urls import reverse
+from core.benchmarks.api import call_view
+from core.benchmarks.seed import timed
+from core.models import Tag
+from recipe.views import TagViewSet
+
+
+NAMES = 200
+
+
+def run(command, user, options):
+    existing = list(Tag.objects.filter(user=user).values_list(
+        'name', flat=True)[:NAMES // 2])
+    names = [
+        name for pair in zip(existing, (
+            f'new tag {i}' for i in range(len(existing))))
+        for name in pair
+    ]
+    path = reverse('recipe:tag-list')
+
+    def diff():
+        tags = call_view(TagViewSet, {'get': 'list'}, user, path=path).data
+        known = {tag['name'] for tag in tags}
+        for name in names:
+            if name not in known:
+                call_view(TagViewSet, {'post': 'create'}, user,
+                          {'name': name}, method='post', path=path)
+
+    def ensure():
+        call_view(TagViewSet, {'post': 'ensure'}, user, {'names': names},
+                  method='post', path=reverse('recipe:tag-ensure'))
+
+    for label, func in (('list + POSTs', diff), ('ensure', ensure)):
+        samples = []
+        for _ in range(options['repeat']):
+            samples.append(timed(func, 1)[0])
+            created = Tag.objects.filter(user=user, name__startswith='new')
+            created._raw_delete(created.db)
+        command.stdout.write(
+            f'{label:>12}: best {min(samples):8.2f} ms  '
+            f'median {statistics.median(samples):8.2f} ms')
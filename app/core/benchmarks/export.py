@@ -0,0 +1,80 @@
+"""Time to first byte and peak memory of a full-collection download
+
+The whole collection is fetched as one unpaginated JSON list, and
+streamed by the export action as NDJSON and as CSV. Peak RSS is the
+process high-water mark over the request, reset beforehand through
+/proc/self/clear_refs (Linux only); the Python heap peak comes from
+tracemalloc, in a separate run so that it does not skew the timings.
+"""
+import time
+import tracemalloc
+from django.test.utils import override_settings
+from django.urls import reverse
+from core.benchmarks.api import call_view
+from recipe.views import RecipeViewSet
+
+
+def run(command, user, options):
+    # the list goes last: memory it frees stays with the process and
+    # would hide the RSS growth of whatever runs after it
+    cases = (
+        ('ndjson', {'get': 'export'}, 'recipe:recipe-export', {}),
+        ('csv', {'get': 'export'}, 'recipe:recipe-export',
+         {'output': 'csv'}),
+        ('list', {'get': 'list'}, 'recipe:recipe-list', {}),
+    )
+    for name, actions, url, params in cases:
+        def download():
+            """(seconds to the first byte, total seconds, bytes)"""
+            start = time.perf_counter()
+            response = call_view(
+                RecipeViewSet, actions, user, params, path=reverse(url))
+            if response.streaming:
+                chunks = iter(response.streaming_content)
+                size = len(next(chunks, b''))
+                first = time.perf_counter() - start
+                size += sum(len(chunk) for chunk in chunks)
+            else:
+                size = len(response.render().content)
+                first = time.perf_counter() - start
+
+            return first, time.perf_counter() - start, size
+
+        with override_settings(RESPONSE_CACHE_ENABLED=False):
+            baseline = _reset_peak_rss()
+            first, total, size = download()
+            rss = _peak_rss() - baseline if baseline is not None else None
+
+            tracemalloc.start()
+            download()
+            heap = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        rss = 'n/a' if rss is None else f'{rss / 2 ** 20:6.1f} MiB'
+        command.stdout.write(
+            f'{name:>6}: first byte {first * 1000:9.1f} ms  '
+            f'total {total * 1000:9.1f} ms  {size / 2 ** 20:7.1f} MiB  '
+            f'peak rss +{rss}  peak heap {heap / 2 ** 20:6.1f} MiB')
+
+
+def _reset_peak_rss():
+    """reset the RSS high-water mark, return the current RSS or None"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        return None
+
+    return _status('VmRSS')
+
+
+def _peak_rss():
+    return _status('VmHWM')
+
+
+def _status(name):
+    """a /proc/self/status memory figure in bytes"""
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(name + ':'):
+                return int(line.split()[1]) * 1024
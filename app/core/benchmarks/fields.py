@@ -0,0 +1,33 @@
+"""Payload size and time of recipe list pages with ?fields= and ?expand="""
+from django.test.utils import override_settings
+from django.urls import reverse
+from core.benchmarks.api import call_view
+from core.benchmarks.seed import timed
+from recipe.views import RecipeViewSet
+
+
+PAGE_SIZE = 1000
+
+
+def run(command, user, options):
+    cases = (
+        ('all fields', {}),
+        ('id,title', {'fields': 'id,title'}),
+        ('id,title,price', {'fields': 'id,title,price'}),
+        ('expand both', {'expand': 'tags,ingredients'}),
+    )
+    path = reverse('recipe:recipe-list')
+    for name, params in cases:
+        params = dict(params, page_size=PAGE_SIZE)
+
+        def request():
+            return call_view(
+                RecipeViewSet, {'get': 'list'}, user, params, path=path
+            ).render()
+
+        with override_settings(RESPONSE_CACHE_ENABLED=False):
+            size = len(request().content)
+            best, median = timed(request, options['repeat'])
+        command.stdout.write(
+            f'{name:>15}: {size:>9} bytes/page  '
+            f'best {best:8.2f} ms  median {median:8.2f} ms')
@@ -0,0 +1,37 @@
+"""Time tag/ingredient filtering on RecipeViewSet against the chained m2m
+joins it used to build"""
+from core.models import Recipe
+from core.benchmarks.api import view_for
+from core.benchmarks.seed import timed
+from recipe.views import RecipeViewSet
+
+
+def _chained_joins(user, tag_ids, ingred_ids):
+    return Recipe.objects.filter(
+        user=user, tags__id__in=tag_ids
+    ).filter(ingredients__id__in=ingred_ids)
+
+
+def run(command, user, options):
+    # filter on one recipe's own links so that match=all is not empty
+    sample = user.recipe_set.order_by('id').first()
+    tag_ids = list(sample.tags.values_list('id', flat=True))
+    ingred_ids = list(sample.ingredients.values_list('id', flat=True))
+    params = {
+        'tags': ','.join(map(str, tag_ids)),
+        'ingredients': ','.join(map(str, ingred_ids)),
+    }
+
+    cases = [('chained joins', _chained_joins(user, tag_ids, ingred_ids))]
+    for match in ('any', 'all'):
+        view = view_for(RecipeViewSet, user, dict(params, match=match))
+        cases.append((f'match={match}', view.get_queryset()))
+
+    for name, queryset in cases:
+        ids = queryset.values_list('id', flat=True)
+        rows = list(ids)
+        best, median = timed(lambda: list(ids.all()), options['repeat'])
+        command.stdout.write(
+            f'{name:>14}: {len(rows):>7} rows '
+            f'({len(set(rows)):>7} distinct)  '
+            f'best {best:8.2f} ms  median {median:8.2f} ms')
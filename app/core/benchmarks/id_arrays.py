@@ -0,0 +1,77 @@
+"""Recipe lists and tag/ingredient filters with and without the id arrays
+
+With RECIPE_ID_ARRAYS off, each listed recipe's tag and ingredient ids
+come from an ARRAY() subquery on the m2m tables and ?tags= and
+?ingredients= go through them as semi-joins; with it on, both read the
+recipe row's own arrays (see recipe/id_arrays.py). Timed are a page of
+PAGE_SIZE recipes, the full export, and the ids matching one recipe's
+tags and ingredients.
+"""
+from django.test.utils import override_settings
+from django.urls import reverse
+from core.benchmarks.api import call_view, view_for
+from core.benchmarks.seed import timed
+from recipe.views import RecipeViewSet
+
+
+PAGE_SIZE = 1000
+
+
+def run(command, user, options):
+    # filter on one recipe's own links so that match=all is not empty
+    sample = user.recipe_set.order_by('id').first()
+    params = {
+        'tags': ','.join(map(str, sample.tag_ids)),
+        'ingredients': ','.join(map(str, sample.ingredient_ids)),
+    }
+    tags = {'tags': str(sample.tag_ids[0])}
+
+    for enabled in (False, True):
+        label = 'arrays' if enabled else 'm2m'
+        with override_settings(RESPONSE_CACHE_ENABLED=False,
+                               RECIPE_ID_ARRAYS=enabled):
+            _time_list(command, user, label, options)
+            _time_export(command, user, label, options)
+            for match in ('any', 'all'):
+                _time_filter(command, user, f'{label} {match}',
+                             dict(params, match=match), options)
+            _time_filter(command, user, f'{label} one tag', tags, options)
+
+
+def _time_list(command, user, label, options):
+    path = reverse('recipe:recipe-list')
+
+    def request():
+        return call_view(RecipeViewSet, {'get': 'list'}, user,
+                         {'page_size': PAGE_SIZE}, path=path)
+
+    rows = len(request().data['results'])
+    best, median = timed(request, options['repeat'])
+    _report(command, f'{label} list', rows, best, median)
+
+
+def _time_export(command, user, label, options):
+    path = reverse('recipe:recipe-export')
+    rows = []
+
+    def request():
+        response = call_view(
+            RecipeViewSet, {'get': 'export'}, user, path=path)
+        rows[:] = [b''.join(response.streaming_content).count(b'\n')]
+
+    best, median = timed(request, options['repeat'])
+    _report(command, f'{label} export', rows[0], best, median)
+
+
+def _time_filter(command, user, label, params, options):
+    ids = view_for(RecipeViewSet, user, params).get_queryset().values_list(
+        'id', flat=True)
+    rows = len(list(ids))
+    best, median = timed(lambda: list(ids.all()), options['repeat'])
+    _report(command, label, rows, best, median)
+
+
+def _report(command, label, rows, best, median):
+    command.stdout.write(
+        f'{label:>16}: {rows:>7} rows  best {best:8.2f} ms  '
+        f'median {median:8.2f} ms  {rows / best * 1000:10.0f} rows/s')
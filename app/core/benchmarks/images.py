@@ -0,0 +1,87 @@
+"""Time recipe image uploads and compare the bytes each rendition serves
+
+The upload is timed with the renditions built inside the request (the
+'sync' mode, i.e. what an inline resize would cost), with them deferred
+to the worker pool, which leaves only the staging write, and for bytes
+that were uploaded before, which only repoints the recipe at its blob.
+"""
+import io
+import itertools
+import os
+from PIL import Image, ImageFilter
+from django.core.files.storage import default_storage
+from django.db.models import Max
+from django.test.utils import override_settings
+from core.benchmarks.api import call_view
+from core.benchmarks.seed import timed
+from core.models import ImageBlob, Recipe
+from recipe import images
+from recipe.views import RecipeViewSet
+
+
+def photo(width=4000, height=3000):
+    """JPEG bytes roughly as hard to compress as a phone photo"""
+    noise = Image.effect_noise((width, height), 48)
+    gradient = Image.linear_gradient('L').resize((width, height))
+    image = Image.merge('RGB', (noise, gradient, noise.transpose(
+        Image.FLIP_LEFT_RIGHT))).filter(ImageFilter.GaussianBlur(2))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=92)
+
+    return buffer.getvalue()
+
+
+def run(command, user, options):
+    recipe = Recipe.objects.filter(user=user).first()
+    data = photo()
+    staged_before = set(_listdir(images.STAGING_DIR))
+    last_blob = ImageBlob.objects.aggregate(last=Max('pk'))['last'] or 0
+    uploads = itertools.count()
+
+    def upload(content=None):
+        # distinct bytes after the JPEG end marker defeat deduplication
+        image = io.BytesIO(content or data + str(next(uploads)).encode())
+        image.name = 'photo.jpg'
+        response = call_view(
+            RecipeViewSet, {'post': 'upload_image'}, user,
+            params={'image': image}, method='post', pk=recipe.pk)
+        assert response.status_code == 200, response.data
+
+    try:
+        for mode in ('sync', 'thread'):
+            with override_settings(IMAGE_PROCESSING_MODE=mode):
+                best, median = timed(upload, options['repeat'])
+            command.stdout.write(
+                f'upload {mode:>9}: best {best:9.2f} ms  '
+                f'median {median:9.2f} ms')
+
+        with override_settings(IMAGE_PROCESSING_MODE='sync'):
+            upload(data)
+            best, median = timed(lambda: upload(data), options['repeat'])
+        command.stdout.write(
+            f'upload {"duplicate":>9}: best {best:9.2f} ms  '
+            f'median {median:9.2f} ms')
+
+        recipe.refresh_from_db()
+        # without renditions the upload itself was what got served
+        command.stdout.write(
+            f'{"uploaded original":>18}: {len(data):>10,} bytes')
+        for size, formats in recipe.renditions.items():
+            for fmt, name in formats.items():
+                command.stdout.write(
+                    f'{size + " " + fmt:>18}: '
+                    f'{default_storage.size(name):>10,} bytes')
+    finally:
+        for name in set(_listdir(images.STAGING_DIR)) - staged_before:
+            default_storage.delete(os.path.join(images.STAGING_DIR, name))
+        for blob in ImageBlob.objects.filter(pk__gt=last_blob):
+            for formats in blob.renditions.values():
+                for name in formats.values():
+                    default_storage.delete(name)
+
+
+def _listdir(directory):
+    if not default_storage.exists(directory):
+        return []
+
+    return default_storage.listdir(directory)[1]
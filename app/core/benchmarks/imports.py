@@ -0,0 +1,91 @@
+"""Migrating a collection: replaying it through create vs the importer
+
+The seeded collection is exported as NDJSON (with tag and ingredient
+names) and loaded into a second user's empty collection, once by POSTing
+recipes to RecipeViewSet.create, as migrations used to, and once by the
+streaming importer. The replay is stopped after REPLAYS recipes. The
+importer's peak Python heap is measured in a separate run.
+"""
+import io
+import itertools
+import json
+import time
+import tracemalloc
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from core.benchmarks.api import call_view
+from core.models import Ingredient, Recipe, Tag
+from recipe import importer
+from recipe.views import RecipeViewSet
+
+
+REPLAYS = 200
+EMAIL = 'import-benchmark@example.com'
+
+
+def run(command, user, options):
+    response = call_view(
+        RecipeViewSet, {'get': 'export'}, user,
+        {'expand': 'tags,ingredients'},
+        path=reverse('recipe:recipe-export'))
+    content = b''.join(response.streaming_content)
+
+    target = _target()
+    rate = _replay(target, content)
+    command.stdout.write(f'{"create":>10}: {rate:9.0f} recipes/s')
+
+    for batch_size in (100, 1000, 5000):
+        target = _target()
+        start = time.perf_counter()
+        created = _import(target, content, batch_size)
+        rate = created / (time.perf_counter() - start)
+
+        target = _target()
+        tracemalloc.start()
+        _import(target, content, batch_size)
+        heap = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        command.stdout.write(
+            f'{f"import/{batch_size}":>10}: {rate:9.0f} recipes/s  '
+            f'peak heap {heap / 2 ** 20:6.1f} MiB')
+
+
+def _target():
+    """a fresh user to import into"""
+    get_user_model().objects.filter(email=EMAIL).delete()
+
+    return get_user_model().objects.create_user(EMAIL, 'benchmark')
+
+
+def _replay(user, content):
+    """POST the first REPLAYS records one by one, return recipes/s"""
+    path = reverse('recipe:recipe-list')
+    start = time.perf_counter()
+    for line in itertools.islice(io.BytesIO(content), REPLAYS):
+        record = json.loads(line)
+        record['tags'] = [_get_or_create(Tag, user, tag['name']).pk
+                          for tag in record['tags']]
+        record['ingredients'] = [
+            _get_or_create(Ingredient, user, ingredient['name']).pk
+            for ingredient in record['ingredients']]
+        call_view(RecipeViewSet, {'post': 'create'}, user, record,
+                  method='post', path=path)
+
+    count = Recipe.objects.filter(user=user).count()
+
+    return count / (time.perf_counter() - start)
+
+
+def _get_or_create(model, user, name):
+    return model.objects.get_or_create(user=user, name=name)[0]
+
+
+def _import(user, content, batch_size):
+    progress = {}
+    for progress in importer.import_recipes(
+            user, importer.parse_ndjson(io.BytesIO(content)),
+            batch_size=batch_size):
+        pass
+
+    return progress['created']
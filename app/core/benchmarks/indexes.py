@@ -0,0 +1,67 @@
+"""EXPLAIN ANALYZE the per-user queries with and without the composite
+indexes added in core/migrations/0008_recipe_indexes.py and
+0013_recipe_range_indexes.py"""
+from django.db import connection, transaction
+from core.models import Tag, Ingredient, Recipe
+
+
+INDEXES = (
+    'core_tag_user_name_idx',
+    'core_ingred_user_name_idx',
+    'core_recipe_user_id_idx',
+    'core_recipe_tags_tag_recipe_idx',
+    'core_recipe_ingred_ingred_recipe_idx',
+    'core_recipe_user_time_idx',
+    'core_recipe_user_price_idx',
+)
+
+
+class _Rollback(Exception):
+    """raised to undo the dropped indexes"""
+
+
+def _queries(user):
+    tag = Tag.objects.filter(user=user).first()
+    ingredient = Ingredient.objects.filter(user=user).first()
+
+    return (
+        ('tags by name', Tag.objects.filter(
+            user=user).order_by('-name', 'id')[:100]),
+        ('ingredients by name', Ingredient.objects.filter(
+            user=user).order_by('-name', 'id')[:100]),
+        ('recipes by id', Recipe.objects.filter(
+            user=user).order_by('-id')[:100]),
+        ('recipes with tag', Recipe.objects.filter(
+            user=user, tags__id__in=[tag.id])),
+        ('recipes with ingredient', Recipe.objects.filter(
+            user=user, ingredients__id__in=[ingredient.id])),
+        ('assigned tags', Tag.objects.filter(
+            user=user, recipe__isnull=False).distinct()),
+        ('quick recipes by time', Recipe.objects.filter(
+            user=user, time_minutes__lte=30
+        ).order_by('time_minutes', 'id')[:100]),
+        ('cheap recipes by price', Recipe.objects.filter(
+            user=user, price__lte=10
+        ).order_by('-price', '-id')[:100]),
+    )
+
+
+def _explain(command, queries, label):
+    for name, queryset in queries:
+        command.stdout.write(f'--- {name} ({label}) ---')
+        command.stdout.write(queryset.explain(analyze=True))
+
+
+def run(command, user, options):
+    queries = _queries(user)
+    _explain(command, queries, 'with indexes')
+
+    try:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for index in INDEXES:
+                    cursor.execute(f'DROP INDEX {index}')
+            _explain(command, queries, 'without indexes')
+            raise _Rollback
+    except _Rollback:
+        pass
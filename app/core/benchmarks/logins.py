@@ -0,0 +1,75 @@
+"""Logins per second per core for each installed password hasher
+
+'verify' runs password checks through the login hashing pool from several
+client threads at once, the CPU-bound part of a login burst; 'login' posts
+to the token endpoint one request at a time (the seeded dataset lives in
+an open transaction other threads can't see).
+"""
+import os
+import threading
+import time
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory
+from user import passwords
+from user.views import CreateTokenView
+
+
+PASSWORD = 'benchmark'
+CHECKS = 40
+LOGINS = 10
+
+
+def run(command, user, options):
+    cores = os.cpu_count() or 1
+    clients = settings.LOGIN_HASHING_WORKERS * 4
+    command.stdout.write(
+        f'{cores} cores, {settings.LOGIN_HASHING_WORKERS} hashing workers, '
+        f'{clients} client threads')
+
+    for hasher in settings.PASSWORD_HASHERS:
+        name = hasher.rsplit('.', 1)[1]
+        with override_settings(PASSWORD_HASHERS=[hasher]):
+            encoded = make_password(PASSWORD)
+            rate = _verify_rate(encoded, clients)
+            command.stdout.write(
+                f'{name:>28} verify: {rate:7.1f}/s  '
+                f'{rate / cores:7.1f}/s per core')
+
+            user.set_password(PASSWORD)
+            user.save()
+            rate = _login_rate(user)
+            command.stdout.write(
+                f'{name:>28}  login: {rate:7.1f}/s  '
+                f'{rate / cores:7.1f}/s per core')
+
+
+def _verify_rate(encoded, clients):
+    per_client = max(CHECKS // clients, 1)
+
+    def client():
+        for _ in range(per_client):
+            passwords.check(PASSWORD, encoded)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return per_client * clients / (time.perf_counter() - start)
+
+
+def _login_rate(user):
+    view = CreateTokenView.as_view()
+    factory = APIRequestFactory()
+    payload = {'email': user.email, 'password': PASSWORD}
+
+    start = time.perf_counter()
+    for _ in range(LOGINS):
+        response = view(factory.post('/', payload))
+        assert response.status_code == 200, response.data
+
+    return LOGINS / (time.perf_counter() - start)
@@ -0,0 +1,59 @@
+"""Compare media serving throughput with Django's static() view
+
+Runs in-process, so neither variant gets wsgi.file_wrapper/sendfile and
+the numbers show the Python side only: the 'x-accel-redirect' and 304
+rows are what is left for Django when the front end server or the
+client's cache does the sending.
+"""
+import os
+import tempfile
+import time
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.views.static import serve
+from core.views import serve_media
+
+
+REQUESTS = 200
+SIZES = (('thumbnail', 4 * 2 ** 10), ('photo', 2 * 2 ** 20))
+
+
+def run(command, user, options):
+    factory = RequestFactory()
+
+    with tempfile.TemporaryDirectory() as media, \
+            override_settings(MEDIA_ROOT=media):
+        for name, size in SIZES:
+            path = f'{name}.jpg'
+            with open(os.path.join(media, path), 'wb') as fh:
+                fh.write(os.urandom(size))
+            etag = serve_media(factory.get('/'), path)['ETag']
+
+            cases = (
+                ('static()', lambda request: serve(
+                    request, path, document_root=media), {}),
+                ('serve_media', lambda request: serve_media(
+                    request, path), {}),
+                ('serve_media 304', lambda request: serve_media(
+                    request, path), {'HTTP_IF_NONE_MATCH': etag}),
+            )
+            for label, view, headers in cases:
+                _report(command, name, label, view, factory, headers)
+
+            with override_settings(MEDIA_SENDFILE='x-accel-redirect'):
+                _report(
+                    command, name, 'x-accel-redirect',
+                    lambda request: serve_media(request, path), factory, {})
+
+
+def _report(command, name, label, view, factory, headers):
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        response = view(factory.get('/', **headers))
+        for _ in response:
+            pass
+        response.close()
+    elapsed = time.perf_counter() - start
+
+    command.stdout.write(
+        f'{name:>9} {label:>16}: {REQUESTS / elapsed:9.0f} req/s')
@@ -0,0 +1,30 @@
+"""Time recipe/tag list requests with the response cache cold and warm"""
+from django.test.utils import override_settings
+from django.urls import reverse
+from core.benchmarks.api import call_view
+from core.benchmarks.seed import timed
+from recipe import cache
+from recipe.views import RecipeViewSet, TagViewSet
+
+
+def run(command, user, options):
+    cases = (
+        ('recipes', RecipeViewSet, reverse('recipe:recipe-list')),
+        ('tags', TagViewSet, reverse('recipe:tag-list')),
+    )
+    for name, viewset, path in cases:
+        def request():
+            return call_view(
+                viewset, {'get': 'list'}, user, path=path).render()
+
+        with override_settings(RESPONSE_CACHE_ENABLED=False):
+            best, median = timed(request, options['repeat'])
+        command.stdout.write(
+            f'{name:>8} uncached: best {best:9.2f} ms  '
+            f'median {median:9.2f} ms')
+
+        cache.reset_stats()
+        best, median = timed(request, options['repeat'])
+        command.stdout.write(
+            f'{name:>8}   cached: best {best:9.2f} ms  '
+            f'median {median:9.2f} ms  {cache.stats()}')
@@ -0,0 +1,44 @@
+"""Time ?search= with the GIN-indexed search vector against ILIKE
+
+Seeding bypasses the signals, so the vectors are built first (which is
+timed too); run with `--recipes 1000000` for the size this was tuned for.
+"""
+import time
+from django.db import connection
+from django.test.utils import override_settings
+from core.models import Recipe
+from core.benchmarks.api import view_for
+from core.benchmarks.seed import timed
+from recipe import search
+from recipe.views import RecipeViewSet
+
+
+PAGE_SIZE = 20
+
+
+def run(command, user, options):
+    start = time.perf_counter()
+    search.update_vectors(Recipe.objects.filter(user=user))
+    with connection.cursor() as cursor:
+        cursor.execute(f'ANALYZE {Recipe._meta.db_table}')
+    command.stdout.write(
+        f'built search vectors in {time.perf_counter() - start:.1f} s')
+
+    count = user.recipe_set.count()
+    terms = (
+        ('rare title', str(count // 2)),
+        ('common tag', 'tag 7'),
+        ('no match', 'saffron'),
+    )
+    for label, text in terms:
+        for mode in ('fulltext', 'ilike'):
+            with override_settings(RECIPE_SEARCH_MODE=mode):
+                view = view_for(RecipeViewSet, user, {'search': text})
+                queryset = view.get_queryset()
+                page = queryset.values_list('id', flat=True)[:PAGE_SIZE]
+                rows = queryset.count()
+                best, median = timed(
+                    lambda: list(page.all()), options['repeat'])
+            command.stdout.write(
+                f'{label:>10} {mode:>8}: {rows:>8} matches  '
+                f'first page best {best:8.2f} ms  median {median:8.2f} ms')
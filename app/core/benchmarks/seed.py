@@ -0,0 +1,70 @@
+import random
+import statistics
+import time
+from django.contrib.auth import get_user_model
+from django.db import connection
+from core.models import Tag, Ingredient, Recipe
+
+
+BENCHMARK_EMAIL = 'benchmark@example.com'
+
+
+def benchmark_user():
+    """return a fresh user to own the benchmark dataset"""
+    get_user_model().objects.filter(email=BENCHMARK_EMAIL).delete()
+
+    return get_user_model().objects.create_user(BENCHMARK_EMAIL, 'benchmark')
+
+
+def seed_dataset(user, recipes, tags=50, ingredients=200, per_recipe=3,
+                 batch_size=2000, seed=0):
+    """bulk create tags, ingredients and recipes with random links"""
+    rng = random.Random(seed)
+
+    tag_ids = [obj.id for obj in Tag.objects.bulk_create(
+        Tag(user=user, name=f'tag {i}') for i in range(tags))]
+    ingred_ids = [obj.id for obj in Ingredient.objects.bulk_create(
+        Ingredient(user=user, name=f'ingredient {i}')
+        for i in range(ingredients))]
+
+    for start in range(0, recipes, batch_size):
+        links = [
+            (rng.sample(tag_ids, min(per_recipe, tags)),
+             rng.sample(ingred_ids, min(per_recipe, ingredients)))
+            for _ in range(start, min(start + batch_size, recipes))
+        ]
+        batch = Recipe.objects.bulk_create(
+            Recipe(
+                user=user,
+                title=f'recipe {i}',
+                time_minutes=rng.randint(1, 240),
+                price=rng.randint(100, 99999) / 100,
+                tag_ids=sorted(recipe_tags),
+                ingredient_ids=sorted(recipe_ingreds))
+            for i, (recipe_tags, recipe_ingreds) in enumerate(links, start))
+
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tag_id)
+            for recipe, (recipe_tags, _) in zip(batch, links)
+            for tag_id in recipe_tags)
+        Recipe.ingredients.through.objects.bulk_create(
+            Recipe.ingredients.through(
+                recipe_id=recipe.id, ingredient_id=ingred_id)
+            for recipe, (_, recipe_ingreds) in zip(batch, links)
+            for ingred_id in recipe_ingreds)
+
+    with connection.cursor() as cursor:
+        for model in (Tag, Ingredient, Recipe, Recipe.tags.through,
+                      Recipe.ingredients.through):
+            cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+
+def timed(func, repeat=5):
+    """call func <repeat> times, return (best, median) in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    return min(samples), statistics.median(samples)
@@ -0,0 +1,59 @@
+"""Rows per second of the list endpoints with and without values() rows
+
+Lists are built from model instances and ModelSerializer, and from the
+values() rows of recipe/mixins.py. The rendering of the resulting page
+is timed separately, with the stdlib encoder and (if installed) orjson.
+"""
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from core import renderers
+from core.benchmarks.api import call_view
+from core.benchmarks.seed import timed
+from recipe.views import IngredientViewSet, RecipeViewSet, TagViewSet
+
+
+PAGE_SIZE = 1000
+
+
+def run(command, user, options):
+    endpoints = (
+        ('recipes', RecipeViewSet, 'recipe:recipe-list'),
+        ('tags', TagViewSet, 'recipe:tag-list'),
+        ('ingredients', IngredientViewSet, 'recipe:ingredient-list'),
+    )
+    for name, viewset, url in endpoints:
+        path = reverse(url)
+        params = {'page_size': PAGE_SIZE}
+
+        for values in (False, True):
+            label = 'values' if values else 'serializer'
+
+            def request():
+                return call_view(
+                    viewset, {'get': 'list'}, user, params, path=path)
+
+            with override_settings(RESPONSE_CACHE_ENABLED=False,
+                                   VALUES_LIST_ENABLED=values):
+                rows = len(request().data['results'])
+                best, median = timed(request, options['repeat'])
+            _report(command, f'{name} {label}', rows, best, median)
+
+        data = request().data
+        for label, renderer in _renderers():
+            best, median = timed(
+                lambda: renderer.render(data), options['repeat'])
+            _report(command, f'{name} {label}', rows, best, median)
+
+
+def _renderers():
+    yield 'json', JSONRenderer()
+    if renderers.orjson is not None:
+        yield 'orjson', renderers.FastJSONRenderer()
+
+
+def _report(command, label, rows, best, median):
+    rate = rows / best * 1000 if best else 0
+    command.stdout.write(
+        f'{label:>22}: {rate:9.0f} rows/s  '
+        f'best {best:8.2f} ms  median {median:8.2f} ms')
@@ -0,0 +1,43 @@
+"""Requests/sec of an authenticated endpoint with and without the token cache
+
+Requests go through the full DRF authentication path with a real token
+header, against the user profile endpoint whose only query is the token
+lookup itself.
+"""
+import time
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+from user import authentication
+from user.views import ManageUserView
+
+
+REQUESTS = 500
+
+
+def run(command, user, options):
+    token, _ = Token.objects.get_or_create(user=user)
+    header = f'Token {token.key}'
+    factory = APIRequestFactory()
+
+    cases = (
+        ('TokenAuthentication', TokenAuthentication, False),
+        ('cached, shared tier', authentication.CachingTokenAuthentication,
+         True),
+        ('cached, local tier', authentication.CachingTokenAuthentication,
+         False),
+    )
+    for label, auth_class, clear_local in cases:
+        view = ManageUserView.as_view(authentication_classes=(auth_class,))
+        authentication.reset_stats()
+
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            if clear_local:
+                authentication.clear_local()
+            view(factory.get('/', HTTP_AUTHORIZATION=header)).render()
+        elapsed = time.perf_counter() - start
+
+        command.stdout.write(
+            f'{label:>20}: {REQUESTS / elapsed:8.0f} req/s  '
+            f'{authentication.stats()}')
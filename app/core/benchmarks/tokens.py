@@ -0,0 +1,115 @@
+"""Concurrent logins with get_or_create and upsert token issuance
+
+The seeded dataset is invisible to other connections, so this scenario
+commits its own users from a separate thread and deletes them afterwards.
+Client threads log in through the token endpoint, all as the same user
+(racing on the token row) and as a user each. Passwords use the MD5
+hasher so that the database work is what gets measured.
+"""
+import threading
+import time
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.test import APIRequestFactory
+from user.serializers import AuthTokenSerializer
+from user.views import CreateTokenView
+
+
+CLIENTS = 8
+LOGINS = 50
+PASSWORD = 'benchmark'
+EMAIL = 'token-benchmark-{}@example.com'
+
+
+def run(command, user, options):
+    views = (
+        ('get_or_create', ObtainAuthToken.as_view(
+            serializer_class=AuthTokenSerializer)),
+        ('upsert', CreateTokenView.as_view()),
+        ('signed', CreateTokenView.as_view()),
+    )
+    with override_settings(PASSWORD_HASHERS=[
+            'django.contrib.auth.hashers.MD5PasswordHasher']):
+        emails = _committed(_create_users)
+        try:
+            for label, view in views:
+                with override_settings(TOKEN_SIGNED=label == 'signed'):
+                    for shared in (True, False):
+                        _committed(_delete_tokens)
+                        rate, failures = _load(view, emails, shared)
+                        who = 'same user' if shared else 'user each'
+                        command.stdout.write(
+                            f'{label:>13} {who:>9}: {rate:7.0f} logins/s'
+                            f'  {failures} failed')
+        finally:
+            _committed(_delete_users)
+
+
+def _load(view, emails, shared):
+    factory = APIRequestFactory()
+    failures = []
+
+    def client(email):
+        try:
+            for _ in range(LOGINS):
+                response = view(factory.post(
+                    '/', {'email': email, 'password': PASSWORD}))
+                if response.status_code != 200:
+                    failures.append(response.status_code)
+        except Exception as exc:
+            failures.append(exc)
+        finally:
+            connection.close()
+
+    threads = [
+        threading.Thread(target=client, args=(
+            emails[0] if shared else email,))
+        for email in emails
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return CLIENTS * LOGINS / (time.perf_counter() - start), len(failures)
+
+
+def _committed(func):
+    """run <func> in its own autocommit connection, return its result"""
+    result = []
+
+    def target():
+        try:
+            result.append(func())
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+
+    return result[0] if result else None
+
+
+def _emails():
+    return [EMAIL.format(i) for i in range(CLIENTS)]
+
+
+def _create_users():
+    _delete_users()
+    for email in _emails():
+        get_user_model().objects.create_user(email, PASSWORD)
+
+    return _emails()
+
+
+def _delete_tokens():
+    Token.objects.filter(user__email__in=_emails()).delete()
+
+
+def _delete_users():
+    get_user_model().objects.filter(email__in=_emails()).delete()
@@ -0,0 +1,85 @@
+"""Peak memory of parsing a large image upload, per upload handler
+
+Each variant parses the same multipart body, read from disk, in a
+forked child, so the peak RSS it reports is not polluted by the other
+variant or by earlier scenarios. 'django' is the default handler chain
+followed by the storage save that used to happen; 'streaming' is
+recipe.uploads.StagingUploadHandler, which leaves the file in place.
+"""
+import io
+import multiprocessing
+import resource
+import tempfile
+import time
+from PIL import Image
+from django.core.files.storage import default_storage
+from django.core.handlers.wsgi import WSGIRequest
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from core.benchmarks.images import photo
+from recipe import uploads
+from recipe.images import STAGING_DIR
+
+
+UPLOAD_SIZE = 20 * 2 ** 20
+
+
+def run(command, user, options):
+    image = io.BytesIO(padded(photo(), UPLOAD_SIZE))
+    image.name = 'photo.jpg'
+    # load Pillow's format plugins up front so neither child pays for it
+    Image.init()
+
+    with tempfile.TemporaryFile() as body:
+        body.write(encode_multipart(BOUNDARY, {'image': image}))
+        length = body.tell()
+        command.stdout.write(f'upload: {length / 2 ** 20:.1f} MiB')
+
+        for variant in ('django', 'streaming'):
+            context = multiprocessing.get_context('fork')
+            results = context.Queue()
+            child = context.Process(
+                target=_measure, args=(variant, body, length, results))
+            child.start()
+            peak, elapsed = results.get()
+            child.join()
+            command.stdout.write(
+                f'{variant:>10}: peak rss +{peak / 1024:7.1f} MiB  '
+                f'{elapsed:9.2f} ms')
+
+
+def padded(data, size):
+    """JPEG <data> zero-padded to <size> bytes
+
+    Decoders ignore bytes after the end-of-image marker, so the result
+    is still a valid JPEG.
+    """
+    return data + b'\0' * max(size - len(data), 0)
+
+
+def _measure(variant, body, length, results):
+    """parse <body> as an upload request, report (peak rss kB, ms)"""
+    body.seek(0)
+    request = WSGIRequest({
+        'REQUEST_METHOD': 'POST',
+        'PATH_INFO': '/',
+        'CONTENT_TYPE': MULTIPART_CONTENT,
+        'CONTENT_LENGTH': str(length),
+        'wsgi.input': body,
+    })
+    if variant == 'streaming':
+        request.upload_handlers = [
+            uploads.StagingUploadHandler(request, max_size=length)]
+
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    upload = request.FILES['image']
+    if variant == 'streaming':
+        name = upload.staged_name
+    else:
+        name = default_storage.save(f'{STAGING_DIR}/photo.jpg', upload)
+    elapsed = (time.perf_counter() - start) * 1000
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+
+    request.close()
+    default_storage.delete(name)
+    results.put((peak, elapsed))
@@ -0,0 +1,155 @@
+"""Postgres backend with an in-process connection pool and health checks
+
+Django opens a connection per thread and, with CONN_MAX_AGE = 0, closes
+it at the end of every request. With POOL_SIZE set, connections are
+handed back to a pool shared by the threads of the process instead, and
+the next request reuses one, so only a request that finds the pool empty
+pays for connecting. Up to POOL_SIZE idle connections are kept; any more
+are closed as they are released.
+
+A connection taken from the pool is pinged first and replaced if the
+server dropped it. With HEALTH_CHECKS, one kept open across requests by
+CONN_MAX_AGE is pinged before the first query of each request too, as
+Django 4.1's CONN_HEALTH_CHECKS does, instead of failing that query.
+
+STATEMENT_TIMEOUT (milliseconds) limits the statements of web requests.
+It is passed to the server at connection startup, so it costs no query,
+and only once serve_requests() has been called, as app/wsgi.py does:
+migrations and other management commands run table-wide statements that
+must not be cancelled.
+"""
+import threading
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+
+IDLE = extensions.TRANSACTION_STATUS_IDLE
+
+
+class Pool:
+    """idle connections to one database, shared by the threads of the
+    process"""
+
+    def __init__(self, size):
+        self.size = size
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def get(self):
+        """a working idle connection, or None if there is none"""
+        while True:
+            with self.lock:
+                if not self.idle:
+                    return None
+                connection = self.idle.pop()
+            if _ping(connection):
+                return connection
+            connection.close()
+
+    def put(self, connection):
+        """keep <connection> for reuse, or close it if the pool is full"""
+        if not connection.closed and \
+                connection.get_transaction_status() != IDLE:
+            try:
+                connection.rollback()
+            except base.Database.Error:
+                connection.close()
+        with self.lock:
+            if not connection.closed and len(self.idle) < self.size:
+                self.idle.append(connection)
+                return
+        connection.close()
+
+
+def _ping(connection):
+    """True if <connection> still reaches the server"""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        if connection.get_transaction_status() != IDLE:
+            connection.rollback()
+    except base.Database.Error:
+        return False
+
+    return True
+
+
+# whether new connections serve web requests, see serve_requests()
+_serving = False
+
+
+def serve_requests():
+    """give the connections opened from now on the STATEMENT_TIMEOUT"""
+    global _serving
+    _serving = True
+
+
+# pools by connection parameters; test runs connect to a second database
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def close_pools():
+    """close the idle connections of every pool and forget the pools"""
+    with _pools_lock:
+        for pool in _pools.values():
+            with pool.lock:
+                for connection in pool.idle:
+                    connection.close()
+        _pools.clear()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+        self.health_check_done = False
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        timeout = self.settings_dict.get('STATEMENT_TIMEOUT')
+        if _serving and timeout:
+            conn_params['options'] = ' '.join(filter(None, (
+                conn_params.get('options'),
+                f'-c statement_timeout={timeout}')))
+
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        size = self.settings_dict.get('POOL_SIZE', 0)
+        if size:
+            key = tuple(sorted(conn_params.items()))
+            with _pools_lock:
+                self.pool = _pools.setdefault(key, Pool(size))
+            connection = self.pool.get()
+            if connection is not None:
+                self.isolation_level = self.settings_dict['OPTIONS'].get(
+                    'isolation_level', connection.isolation_level)
+                return connection
+
+        return super().get_new_connection(conn_params)
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def _close(self):
+        if self.pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            self.pool.put(self.connection)
+
+    def close_if_unusable_or_obsolete(self):
+        """called as each request starts and finishes"""
+        self.health_check_done = False
+        super().close_if_unusable_or_obsolete()
+
+    def _cursor(self, name=None):
+        if self.connection is not None and not self.health_check_done:
+            self.health_check_done = True
+            if self.settings_dict.get('HEALTH_CHECKS') and \
+                    not self.is_usable():
+                self.close()
+
+        return super()._cursor(name)
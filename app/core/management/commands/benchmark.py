@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core import benchmarks
+from core.benchmarks.seed import benchmark_user, seed_dataset
+
+
+class Rollback(Exception):
+    """raised to discard the seeded dataset"""
+
+
+class Command(BaseCommand):
+    """django command to seed a dataset and run a performance scenario"""
+    help = 'Seed a benchmark dataset and run a performance scenario'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', choices=sorted(benchmarks.SCENARIOS))
+        parser.add_argument(
+            '--recipes', type=int, nargs='+', default=[1000],
+            help='dataset sizes to run the scenario against')
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--ingredients', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='commit the seeded dataset instead of rolling it back')
+
+    def handle(self, *args, **options):
+        scenario = benchmarks.get_scenario(options['scenario'])
+
+        for size in options['recipes']:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{options["scenario"]}: {size} recipes'))
+            try:
+                with transaction.atomic():
+                    self._run(scenario, size, options)
+                    if not options['keep']:
+                        raise Rollback
+            except Rollback:
+                pass
+
+    def _run(self, scenario, size, options):
+        user = benchmark_user()
+        seed_dataset(
+            user, size,
+            tags=options['tags'],
+            ingredients=options['ingredients'])
+        scenario(self, user, options)
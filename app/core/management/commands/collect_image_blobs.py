@@ -0,0 +1,146 @@
+import os
+from datetime import timedelta
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from core.models import ImageBlob, Recipe
+from recipe.images import BLOB_DIR, STAGING_DIR, blob_digest
+
+
+class Command(BaseCommand):
+    """django command to delete image blobs no recipe references
+
+    Works through the blob table in primary key batches and through the
+    media tree one hash shard at a time, so memory stays bounded however
+    many images are stored.
+    """
+    help = 'Delete unreferenced image blobs and leftover upload files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=3600,
+            help='only collect blobs and files older than this (seconds)')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='report what would be deleted without deleting it')
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.batch_size = options['batch_size']
+        self.cutoff = timezone.now() - timedelta(seconds=options['grace'])
+        self.cutoff_timestamp = self.cutoff.timestamp()
+
+        blobs, files = self.collect_blobs()
+        orphans = self.collect_orphan_files()
+        staged = self.collect_staged_files()
+
+        verb = 'would delete' if self.dry_run else 'deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {blobs} blobs ({files} files), {orphans} orphaned '
+            f'blob files and {staged} stale staged uploads'))
+
+    def collect_blobs(self):
+        """delete unreferenced blob rows and their renditions"""
+        unreferenced = ImageBlob.objects.filter(
+            ref_count=0, created_at__lt=self.cutoff).order_by('pk')
+        blobs = files = 0
+        last = 0
+        while True:
+            with transaction.atomic():
+                # rows being attached right now are locked; skip them
+                batch = list(unreferenced.filter(
+                    pk__gt=last
+                ).select_for_update(skip_locked=True).values_list(
+                    'pk', 'renditions'
+                )[:self.batch_size])
+                if not batch:
+                    break
+                last = batch[-1][0]
+
+                # the files go while the rows are still locked: once the
+                # delete commits, an upload of the same bytes finds no blob
+                # and must not find its files either, or it would build a
+                # blob on files about to be deleted
+                for _, renditions in batch:
+                    for formats in renditions.values():
+                        for name in formats.values():
+                            files += 1
+                            if not self.dry_run:
+                                default_storage.delete(name)
+                if not self.dry_run:
+                    # ref_count 0 means no recipe points here; the FK would
+                    # refuse the delete otherwise
+                    rows = ImageBlob.objects.filter(
+                        pk__in=[pk for pk, _ in batch])
+                    rows._raw_delete(rows.db)
+
+            blobs += len(batch)
+
+        return blobs, files
+
+    def collect_orphan_files(self):
+        """delete blob files whose blob row no longer exists"""
+        deleted = 0
+        for shard in self._shards():
+            names = [
+                entry.name for entry in os.scandir(shard)
+                if entry.is_file() and self._stale(entry)
+            ]
+            digests = {blob_digest(name) for name in names}
+            live = set(ImageBlob.objects.filter(
+                sha256__in=digests).values_list('sha256', flat=True))
+            for name in names:
+                if blob_digest(name) not in live:
+                    deleted += 1
+                    if not self.dry_run:
+                        os.remove(os.path.join(shard, name))
+
+        return deleted
+
+    def collect_staged_files(self):
+        """delete staged uploads no recipe is waiting on"""
+        root = default_storage.path(STAGING_DIR)
+        if not os.path.isdir(root):
+            return 0
+
+        deleted = 0
+        batch = []
+        for entry in os.scandir(root):
+            if entry.is_file() and self._stale(entry):
+                batch.append(entry.name)
+            if len(batch) >= self.batch_size:
+                deleted += self._delete_staged(batch)
+                batch = []
+        if batch:
+            deleted += self._delete_staged(batch)
+
+        return deleted
+
+    def _delete_staged(self, names):
+        staged = [os.path.join(STAGING_DIR, name) for name in names]
+        pending = set(Recipe.objects.filter(
+            staged_image__in=staged).values_list('staged_image', flat=True))
+        orphans = [name for name in staged if name not in pending]
+        if not self.dry_run:
+            for name in orphans:
+                default_storage.delete(name)
+
+        return len(orphans)
+
+    def _shards(self):
+        """yield the leaf directories of the blob tree, one at a time"""
+        root = default_storage.path(BLOB_DIR)
+        if not os.path.isdir(root):
+            return
+        for first in os.scandir(root):
+            if not first.is_dir():
+                continue
+            for second in os.scandir(first.path):
+                if second.is_dir():
+                    yield second.path
+
+    def _stale(self, entry):
+        """True if the file at <entry> predates the grace period"""
+        return entry.stat().st_mtime < self.cutoff_timestamp
@@ -0,0 +1,59 @@
+import json
+import sys
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from recipe import importer
+
+
+class Command(BaseCommand):
+    """django command to import a user's recipes from NDJSON or CSV
+
+    Reports progress after every batch. Batches reported are committed,
+    so an interrupted import resumes with --skip set to the last number
+    of records read.
+    """
+    help = "Import recipes into a user's collection from NDJSON or CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='file to import, - for stdin')
+        parser.add_argument(
+            '--user', required=True,
+            help='email of the user the recipes are created for')
+        parser.add_argument(
+            '--input', choices=sorted(importer.PARSERS),
+            help='file format; csv for .csv files and ndjson otherwise')
+        parser.add_argument(
+            '--skip', type=int, default=0,
+            help='records to skip, to resume an interrupted import')
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user with email {options["user"]}')
+
+        path = options['path']
+        parse = importer.PARSERS[
+            options['input'] or importer.input_for(path)]
+        if path == '-':
+            self.run(user, parse(sys.stdin.buffer), options)
+        else:
+            with open(path, 'rb') as stream:
+                self.run(user, parse(stream), options)
+
+    def run(self, user, records, options):
+        progress = {}
+        for progress in importer.import_recipes(
+                user, records, options['skip'], options['batch_size']):
+            for error in progress['errors']:
+                self.stderr.write(
+                    f'record {error["record"]}: '
+                    f'{json.dumps(error["errors"])}')
+            self.stdout.write(
+                f'{progress["records"]} records read, '
+                f'{progress["created"]} recipes created, '
+                f'{progress["invalid"]} invalid')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'imported {progress.get("created", 0)} recipes'))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from core.models import Recipe
+from recipe import cache, id_arrays
+
+
+class Command(BaseCommand):
+    """django command to rebuild recipe id arrays that drifted
+
+    Compares each recipe's tag_ids/ingredient_ids with its m2m links in
+    primary key batches and rewrites the arrays of the recipes that
+    differ, so memory and lock time stay bounded however many recipes
+    there are.
+    """
+    help = 'Rebuild recipe tag/ingredient id arrays from the m2m tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='report the drifted recipes without rewriting them')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.order_by('pk')
+        checked = repaired = 0
+        last = 0
+        while True:
+            bounds = list(recipes.filter(pk__gt=last).values_list(
+                'pk', flat=True)[:options['batch_size']])
+            if not bounds:
+                break
+            batch = recipes.filter(pk__gt=last, pk__lte=bounds[-1])
+            last = bounds[-1]
+
+            drifted = list(id_arrays.stale(batch).values_list(
+                'pk', 'user_id'))
+            if drifted and not options['dry_run']:
+                id_arrays.update_arrays(Recipe.objects.filter(
+                    pk__in=[pk for pk, _ in drifted]))
+                for user_id in {user_id for _, user_id in drifted}:
+                    cache.bump_version(user_id)
+            checked += len(bounds)
+            repaired += len(drifted)
+
+        verb = 'would repair' if options['dry_run'] else 'repaired'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {repaired} of {checked} recipes'))
@@ -0,0 +1,37 @@
+# Generated by Django 2.1.15 on 2026-10-17 06:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_auto_20190628_0413'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'name'], name='core_ingred_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'id'], name='core_recipe_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'name'], name='core_tag_user_name_idx'),
+        ),
+        # the auto-created m2m tables only get a unique (recipe_id, x_id)
+        # index, add the reverse direction for tag/ingredient -> recipe joins
+        migrations.RunSQL(
+            'CREATE INDEX core_recipe_tags_tag_recipe_idx '
+            'ON core_recipe_tags (tag_id, recipe_id)',
+            reverse_sql='DROP INDEX core_recipe_tags_tag_recipe_idx',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX core_recipe_ingred_ingred_recipe_idx '
+            'ON core_recipe_ingredients (ingredient_id, recipe_id)',
+            reverse_sql='DROP INDEX core_recipe_ingred_ingred_recipe_idx',
+        ),
+    ]
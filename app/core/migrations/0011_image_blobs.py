@@ -0,0 +1,37 @@
+# Generated by Django 2.1.15 on 2026-10-17 06:30
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_recipe_image_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('size', models.PositiveIntegerField()),
+                ('renditions', django.contrib.postgres.fields.jsonb.JSONField(default=dict)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='recipes', to='core.ImageBlob'),
+        ),
+        # collect_image_blobs scans unreferenced blobs only
+        migrations.RunSQL(
+            'CREATE INDEX core_imageblob_unreferenced_idx '
+            'ON core_imageblob (created_at) WHERE ref_count = 0',
+            reverse_sql='DROP INDEX core_imageblob_unreferenced_idx',
+        ),
+    ]
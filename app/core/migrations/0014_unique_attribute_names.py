@@ -0,0 +1,88 @@
+# Generated by Django 2.1.15 on 2026-10-17 09:40
+
+from django.db import migrations
+
+
+# tag/ingredient table, the recipe link table and its column for them
+TABLES = (
+    ('core_tag', 'core_recipe_tags', 'tag_id'),
+    ('core_ingredient', 'core_recipe_ingredients', 'ingredient_id'),
+)
+
+# every row with the id of the row it is merged into: the oldest one with
+# the same name, ignoring case, of the same user
+MERGED = """
+WITH merged AS (
+    SELECT id, min(id) OVER (PARTITION BY user_id, lower(name)) AS keep
+    FROM {table}
+)
+"""
+
+MERGE_SQL = (
+    # recipe representations list the ids that are about to change
+    MERGED + """
+    UPDATE core_recipe SET updated_at = now()
+    WHERE id IN (
+        SELECT link.recipe_id FROM {links} link
+        JOIN merged ON merged.id = link.{column}
+        WHERE merged.id <> merged.keep
+    )
+    """,
+    MERGED + """
+    UPDATE {table} SET updated_at = now()
+    WHERE id IN (SELECT keep FROM merged WHERE id <> keep)
+    """,
+    MERGED + """
+    INSERT INTO {links} (recipe_id, {column})
+    SELECT link.recipe_id, merged.keep FROM {links} link
+    JOIN merged ON merged.id = link.{column}
+    WHERE merged.id <> merged.keep
+    ON CONFLICT DO NOTHING
+    """,
+    MERGED + """
+    DELETE FROM {links} USING merged
+    WHERE {links}.{column} = merged.id AND merged.id <> merged.keep
+    """,
+    MERGED + """
+    DELETE FROM {table} USING merged
+    WHERE {table}.id = merged.id AND merged.id <> merged.keep
+    """,
+)
+
+
+def merge_duplicates(apps, schema_editor):
+    """merge tags/ingredients of a user named alike, then index the names
+
+    Only Postgres gets the unique (user, lower(name)) index, which the
+    ensure endpoint's ON CONFLICT relies on.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, links, column in TABLES:
+        for sql in MERGE_SQL:
+            schema_editor.execute(
+                sql.format(table=table, links=links, column=column))
+        # run the deferred foreign key checks of the deletes, which would
+        # otherwise keep the table from being indexed
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        schema_editor.execute(
+            f'CREATE UNIQUE INDEX {table}_user_lower_name_uniq '
+            f'ON {table} (user_id, lower(name))')
+
+
+def drop_unique_names(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, _, _ in TABLES:
+        schema_editor.execute(f'DROP INDEX {table}_user_lower_name_uniq')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_recipe_range_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, drop_unique_names),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 2.1.15 on 2026-10-17 10:05
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+# the id arrays recipe.id_arrays.update_arrays builds, for the rows that
+# exist already; filled in before the GIN indexes are built
+BACKFILL_SQL = """
+UPDATE core_recipe SET
+    tag_ids = ARRAY(
+        SELECT tag_id FROM core_recipe_tags
+        WHERE recipe_id = core_recipe.id ORDER BY tag_id),
+    ingredient_ids = ARRAY(
+        SELECT ingredient_id FROM core_recipe_ingredients
+        WHERE recipe_id = core_recipe.id ORDER BY ingredient_id)
+"""
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_unique_attribute_names'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tag_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tag_ids'], name='core_recipe_tag_ids_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['ingredient_ids'], name='core_recipe_ingredient_ids_gin'),
+        ),
+    ]
@@ -2,6 +2,9 @@ import os
 import uuid
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.fields import ArrayField, JSONField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
                                         PermissionsMixin
 
@@ -57,6 +60,15 @@ class Tag(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # names are also unique per user regardless of case, through the
+        # core_tag_user_lower_name_uniq index of migration 0014
+        indexes = [
+            models.Index(
+                fields=['user', 'name'], name='core_tag_user_name_idx')
+        ]
 
     def __str__(self):
         return self.name
@@ -68,13 +80,48 @@ class Ingredient(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # names are also unique per user regardless of case, through the
+        # core_ingredient_user_lower_name_uniq index of migration 0014
+        indexes = [
+            models.Index(
+                fields=['user', 'name'], name='core_ingred_user_name_idx')
+        ]
 
     def __str__(self):
         return self.name
 
 
+class ImageBlob(models.Model):
+    """Renditions of one uploaded image, shared by every recipe using it
+
+    Keyed by the sha256 of the uploaded bytes; `ref_count` is the number
+    of recipes pointing at the blob, unreferenced blobs are removed by
+    `manage.py collect_image_blobs`.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.PositiveIntegerField()
+    renditions = JSONField(default=dict)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256
+
+
 class Recipe(models.Model):
     """Represents a cooking dish/recipe"""
+    IMAGE_PENDING = 'pending'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUS_CHOICES = (
+        (IMAGE_PENDING, 'Pending'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    )
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE)
@@ -86,6 +133,43 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    # set by the image pipeline in recipe/images.py
+    image_status = models.CharField(
+        max_length=10, blank=True, choices=IMAGE_STATUS_CHOICES)
+    staged_image = models.CharField(max_length=255, blank=True)
+    renditions = JSONField(default=dict, blank=True)
+    image_blob = models.ForeignKey(
+        'ImageBlob',
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT,
+        related_name='recipes')
+    updated_at = models.DateTimeField(auto_now=True)
+    # maintained by recipe/search.py
+    search_vector = SearchVectorField(null=True, editable=False)
+    # copies of the tags/ingredients links, maintained by recipe/id_arrays.py
+    tag_ids = ArrayField(
+        models.IntegerField(), default=list, blank=True, editable=False)
+    ingredient_ids = ArrayField(
+        models.IntegerField(), default=list, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'id'], name='core_recipe_user_id_idx'),
+            # range filters and ?ordering= on the recipes endpoint
+            models.Index(
+                fields=['user', 'time_minutes', 'id'],
+                name='core_recipe_user_time_idx'),
+            models.Index(
+                fields=['user', 'price', 'id'],
+                name='core_recipe_user_price_idx'),
+            # ?tags= and ?ingredients= containment filters
+            GinIndex(fields=['tag_ids'], name='core_recipe_tag_ids_gin'),
+            GinIndex(
+                fields=['ingredient_ids'],
+                name='core_recipe_ingredient_ids_gin'),
+        ]
 
     def __str__(self):
         return self.title
@@ -0,0 +1,58 @@
+"""JSON rendering with orjson when it is installed
+
+orjson is an optional dependency. Without it, or when the client asks for
+indented output, FastJSONRenderer is the stock JSONRenderer. With it the
+compact output is the same document: values orjson does not encode the
+way DRF does (datetimes, decimals, lazy strings, ...) go through DRF's
+JSONEncoder.
+"""
+from rest_framework.compat import LONG_SEPARATORS, SHORT_SEPARATORS
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+OPTIONS = 0 if orjson is None else (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that encodes with orjson if available"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not self.compact \
+                or self.ensure_ascii \
+                or self.get_indent(accepted_media_type,
+                                   renderer_context or {}) is not None:
+            return super().render(
+                data, accepted_media_type, renderer_context)
+
+        return _escape(orjson.dumps(
+            data, default=self.encoder_class().default, option=OPTIONS))
+
+    def render_lines(self, items):
+        """<items> as compact JSON documents, one per line (NDJSON)"""
+        if orjson is None or not self.compact or self.ensure_ascii:
+            encoder = self.encoder_class(
+                ensure_ascii=self.ensure_ascii, allow_nan=not self.strict,
+                separators=SHORT_SEPARATORS if self.compact
+                else LONG_SEPARATORS)
+            return _escape(''.join(
+                encoder.encode(item) + '\n' for item in items
+            ).encode('utf-8'))
+
+        default = self.encoder_class().default
+        return _escape(b''.join(
+            orjson.dumps(item, default=default,
+                         option=OPTIONS | orjson.OPT_APPEND_NEWLINE)
+            for item in items))
+
+
+def _escape(data):
+    """keep JSON a strict javascript subset, as JSONRenderer does"""
+    return data.replace(
+        '\u2028'.encode('utf-8'), b'\\u2028'
+    ).replace('\u2029'.encode('utf-8'), b'\\u2029')
@@ -0,0 +1,167 @@
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, \
+                        HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from recipe.images import BLOB_DIR
+
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# a year, the most HTTP/1.1 caches honour
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+class RangeFile:
+    """Read at most <length> bytes of <file> from <start>
+
+    Having no fileno(), it is streamed through read() rather than handed
+    to sendfile, which would not stop at the end of the range.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+@require_safe
+def serve_media(request, path):
+    """serve a file from MEDIA_ROOT the way a production server would
+
+    With MEDIA_SENDFILE set to 'x-accel-redirect' or 'x-sendfile' only the
+    headers are produced and the front end server sends the bytes. Either
+    way responses carry ETag/Last-Modified and answer conditional and
+    single Range requests; content-addressed blob files are marked
+    immutable.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stats = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError, ValueError):
+        raise Http404('"%s" does not exist' % path)
+    if not stat.S_ISREG(stats.st_mode):
+        raise Http404('"%s" does not exist' % path)
+
+    etag = f'"{stats.st_mtime_ns:x}-{stats.st_size:x}"'
+    if not_modified(request, etag, stats.st_mtime):
+        response = HttpResponseNotModified()
+    elif settings.MEDIA_SENDFILE:
+        response = HttpResponse(content_type=content_type(full_path))
+        if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = quote(
+                settings.MEDIA_ACCEL_REDIRECT_PREFIX + path)
+        else:
+            response['X-Sendfile'] = full_path
+    else:
+        response = file_response(request, full_path, stats.st_size, etag)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stats.st_mtime)
+    response['Cache-Control'] = cache_control(full_path)
+
+    return response
+
+
+def file_response(request, full_path, size, etag):
+    """the file, or the byte range of it the request asks for"""
+    byte_range = requested_range(request, size, etag)
+    if byte_range is None:
+        response = FileResponse(
+            open(full_path, 'rb'), content_type=content_type(full_path))
+    elif byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    else:
+        start, end = byte_range
+        response = FileResponse(
+            RangeFile(open(full_path, 'rb'), start, end - start + 1),
+            status=206, content_type=content_type(full_path))
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+
+    # larger reads when no wsgi.file_wrapper/sendfile is available
+    response.block_size = 64 * 2 ** 10
+    response['Accept-Ranges'] = 'bytes'
+
+    return response
+
+
+def requested_range(request, size, etag):
+    """(start, end) of a single satisfiable Range, False if it is not
+
+    None means the whole file should be sent: there is no (or an
+    unsupported) Range header, or If-Range no longer matches.
+    """
+    header = request.META.get('HTTP_RANGE')
+    if not header:
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != etag:
+        return None
+
+    match = RANGE_RE.match(header.strip())
+    if match is None or match.groups() == ('', ''):
+        return None
+
+    first, last = match.groups()
+    if not first:
+        # suffix range: the last <last> bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        return False
+
+    return start, end
+
+
+def not_modified(request, etag, mtime):
+    """True if the client's cached copy is still current"""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        etags = parse_etags(if_none_match)
+        return etag in etags or '*' in etags
+
+    since = parse_http_date_safe(
+        request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+
+    return since is not None and int(mtime) <= since
+
+
+def cache_control(full_path):
+    """blob files never change once written, everything else might"""
+    # the normalized path, so uploads/blobs/../x is not taken for a blob
+    path = os.path.relpath(full_path, os.path.abspath(settings.MEDIA_ROOT))
+    if path.startswith(os.path.join(BLOB_DIR, '')):
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+
+    return f'public, max-age={settings.MEDIA_MAX_AGE}'
+
+
+def content_type(full_path):
+    content_type, encoding = mimetypes.guess_type(full_path)
+    if encoding:
+        return 'application/octet-stream'
+
+    return content_type or 'application/octet-stream'
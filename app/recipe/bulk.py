@@ -0,0 +1,234 @@
+"""Set-based writes for many recipes at once
+
+These bypass the per-object save()/delete() signals, so every function
+here invalidates the owner's cached responses and ETag fingerprints
+itself (see recipe/signals.py for the per-object equivalents).
+"""
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, Value, When
+from django.utils import timezone
+from core.models import ImageBlob, Recipe
+from recipe import cache, id_arrays, search
+from recipe.signals import RELATIONS, touch
+
+
+BATCH_SIZE = 1000
+MAX_ITEMS = 10000
+
+# insert the names a user has no tag/ingredient of (whatever the case) yet
+ENSURE_SQL = """
+INSERT INTO {table} (user_id, name, updated_at)
+SELECT %s, name, %s FROM unnest(%s::varchar[]) AS name
+ON CONFLICT (user_id, lower(name)) DO NOTHING
+"""
+
+# each name with the id and stored name of the user's object
+ENSURED_SQL = """
+SELECT requested.name, {table}.id, {table}.name
+FROM unnest(%s::varchar[]) AS requested (name)
+JOIN {table} ON {table}.user_id = %s
+    AND lower({table}.name) = lower(requested.name)
+"""
+
+LINK_SQL = (
+    'INSERT INTO {table} ({source}, {target}) '
+    'SELECT * FROM unnest(%s::integer[], %s::integer[])')
+
+# Recipe m2m field name -> related model
+M2M_FIELDS = {relation: model for model, relation in RELATIONS.items()}
+
+
+def _through(relation):
+    return Recipe._meta.get_field(relation).remote_field.through
+
+
+def _link(relation, links):
+    """insert (recipe_id, related_id) pairs into an m2m table
+
+    On Postgres the pairs go in as two arrays in a single statement,
+    which saves building a through model instance per link.
+    """
+    field = Recipe._meta.get_field(relation)
+    through = field.remote_field.through
+    source, target = field.m2m_column_name(), field.m2m_reverse_name()
+
+    if connection.vendor != 'postgresql':
+        through.objects.bulk_create(
+            [through(**{source: recipe_id, target: related_id})
+             for recipe_id, related_id in links],
+            batch_size=BATCH_SIZE)
+        return
+
+    links = list(links)
+    if not links:
+        return
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(LINK_SQL.format(
+            table=quote(through._meta.db_table),
+            source=quote(source),
+            target=quote(target)
+        ), [[link[0] for link in links], [link[1] for link in links]])
+
+
+def _touch_related(user, recipe_ids):
+    """mark the tags/ingredients linked to <recipe_ids> as updated"""
+    for model in M2M_FIELDS.values():
+        touch(model.objects.filter(user=user, recipe__in=recipe_ids))
+
+
+def create_recipes(user, items):
+    """insert recipes and their links, return the new recipe ids
+
+    <items> are validated recipe dicts whose `tags`/`ingredients` are
+    lists of objects already checked to belong to <user>.
+    """
+    with transaction.atomic():
+        recipes = Recipe.objects.bulk_create(
+            [Recipe(user=user, **_fields(item), **_arrays(item))
+             for item in items],
+            batch_size=BATCH_SIZE)
+        ids = [recipe.pk for recipe in recipes]
+
+        for relation in M2M_FIELDS:
+            _link(relation, (
+                (recipe_id, related_id)
+                for recipe_id, item in zip(ids, items)
+                for related_id in _pks(item.get(relation, ()))
+            ))
+        _touch_related(user, ids)
+        search.update_vectors(Recipe.objects.filter(pk__in=ids))
+
+    cache.bump_version(user.pk)
+
+    return ids
+
+
+def update_recipes(user, items):
+    """apply partial updates to many recipes, return the updated ids
+
+    Each field is rewritten for every recipe in one UPDATE using a CASE
+    on the primary key; `tags`/`ingredients`, when given, replace the
+    recipe's links and id arrays.
+    """
+    ids = [item['id'] for item in items]
+    columns = {}
+    for item in items:
+        for name, value in dict(_fields(item), **_arrays(item)).items():
+            columns.setdefault(name, []).append((item['id'], value))
+
+    with transaction.atomic():
+        _touch_related(user, ids)
+        updates = {
+            name: Case(
+                *[When(pk=pk, then=Value(
+                    value, output_field=Recipe._meta.get_field(name)))
+                  for pk, value in values],
+                default=F(name))
+            for name, values in columns.items()
+        }
+        Recipe.objects.filter(user=user, pk__in=ids).update(
+            updated_at=timezone.now(), **updates)
+
+        for relation in M2M_FIELDS:
+            changed = [item for item in items if relation in item]
+            if not changed:
+                continue
+            _through(relation).objects.filter(
+                recipe_id__in=[item['id'] for item in changed]).delete()
+            _link(relation, (
+                (item['id'], related_id)
+                for item in changed
+                for related_id in _pks(item[relation])
+            ))
+        _touch_related(user, ids)
+        search.update_vectors(Recipe.objects.filter(user=user, pk__in=ids))
+
+    cache.bump_version(user.pk)
+
+    return ids
+
+
+def delete_recipes(user, ids):
+    """delete many recipes and their links in a fixed number of queries"""
+    with transaction.atomic():
+        _touch_related(user, ids)
+        for relation in M2M_FIELDS:
+            _through(relation).objects.filter(recipe_id__in=ids).delete()
+        recipes = Recipe.objects.filter(user=user, pk__in=ids)
+        _release_blobs(recipes)
+        # the per-object delete signals would cost queries per recipe and
+        # their work is done above, so delete the rows directly
+        recipes._raw_delete(recipes.db)
+
+    cache.bump_version(user.pk)
+
+
+def ensure_names(model, user, names):
+    """return {name: object} of <user>'s <model> objects for <names>
+
+    The objects that don't exist yet are created. Names are unique per
+    user regardless of case (migration 0014 indexes (user, lower(name))),
+    so a name that differs from an existing one only in case gets that
+    object. Costs one INSERT ... ON CONFLICT DO NOTHING and one SELECT
+    however many names there are; Postgres only.
+    """
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}
+
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            ENSURE_SQL.format(table=table),
+            [user.pk, timezone.now(), names])
+        created = cursor.rowcount
+        # a new statement, so it also sees rows that a concurrent request
+        # committed while the insert waited on them
+        cursor.execute(ENSURED_SQL.format(table=table), [names, user.pk])
+        rows = cursor.fetchall()
+
+    if created:
+        cache.bump_version(user.pk)
+
+    return {
+        name: model(pk=pk, user=user, name=stored)
+        for name, pk, stored in rows
+    }
+
+
+def _release_blobs(recipes):
+    """drop the image blob references held by <recipes>"""
+    counts = recipes.filter(image_blob__isnull=False).values(
+        'image_blob').annotate(count=Count('pk')).order_by()
+    counts = {row['image_blob']: row['count'] for row in counts}
+    if not counts:
+        return
+
+    ImageBlob.objects.filter(pk__in=counts).update(ref_count=Case(
+        *[When(pk=pk, then=F('ref_count') - count)
+          for pk, count in counts.items()],
+        default=F('ref_count')))
+
+
+def _fields(item):
+    """the plain model fields of a validated recipe dict"""
+    return {
+        name: value for name, value in item.items()
+        if name not in M2M_FIELDS and name != 'id'
+    }
+
+
+def _arrays(item):
+    """the id array columns of the relations given in a validated recipe
+    dict"""
+    return {
+        column: id_arrays.ids(item[relation])
+        for relation, column in id_arrays.COLUMNS.items()
+        if relation in item
+    }
+
+
+def _pks(objects):
+    """primary keys of <objects> with duplicates removed, keeping order"""
+    return list(dict.fromkeys(obj.pk for obj in objects))
@@ -0,0 +1,109 @@
+"""Per-user versioned cache for the recipe list endpoints
+
+Every user has a version counter and cached responses are keyed on it, so
+invalidating all of a user's cached lists is a single `incr` of the
+counter (see recipe/signals.py) instead of a scan over their keys. Stale
+entries are never read again and age out through the cache's own timeout
+and MAX_ENTRIES culling.
+"""
+import hashlib
+import threading
+import time
+from collections import Counter
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def is_enabled():
+    return settings.RESPONSE_CACHE_ENABLED
+
+
+def get_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def _version_key(user_id):
+    return f'recipe:version:{user_id}'
+
+
+def _initial_version():
+    # start from the clock so that a counter evicted from the cache never
+    # restarts at a value older responses were stored under
+    return int(time.time() * 1000000)
+
+
+def get_version(user_id):
+    """return the current cache version for a user"""
+    cache = get_cache()
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), timeout=None)
+        version = cache.get(key)
+
+    return version
+
+
+def bump_version(user_id):
+    """invalidate every cached response for a user
+
+    Inside a transaction the version is bumped again once it commits:
+    until then other requests read the rows as they were, and may cache
+    them under the version bumped first.
+    """
+    _bump(user_id)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(user_id))
+
+
+def _bump(user_id):
+    cache = get_cache()
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.set(_version_key(user_id), _initial_version(), timeout=None)
+
+
+def response_key(request):
+    """cache key for a request, scoped to the user's current version"""
+    user_id = request.user.pk
+    url = request.build_absolute_uri().encode('utf-8')
+
+    return 'recipe:response:{}:{}:{}'.format(
+        user_id, get_version(user_id), hashlib.md5(url).hexdigest())
+
+
+def get_response(key):
+    """return cached response data, or None on a miss"""
+    data = get_cache().get(key)
+    with _stats_lock:
+        _stats['hits' if data is not None else 'misses'] += 1
+
+    return data
+
+
+def set_response(key, data):
+    get_cache().set(key, data)
+
+
+def stats():
+    """return the hit/miss counters for this process"""
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else 0.0,
+    }
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
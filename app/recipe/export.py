@@ -0,0 +1,101 @@
+"""Streaming export of a user's recipe collection
+
+The rows are read through a server-side cursor, EXPORT_CHUNK_SIZE at a
+time, and each chunk is written out before the next one is read, so only
+a chunk is held in memory however many recipes there are.
+
+A record has the fields of the recipe list items and is read the same
+way (see ValuesListMixin in recipe/mixins.py): from values() rows, with
+the tag and ingredient ids of each recipe read from its id arrays (see
+recipe/id_arrays.py), or collected by an ARRAY() subquery in the
+cursor's query. Lists that ValuesListMixin would hand to
+the serializer are exported with it as well, prefetching the relations
+of one chunk of model instances at a time.
+"""
+import csv
+import io
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+from core.renderers import FastJSONRenderer
+
+
+def chunked(iterable, size):
+    """lists of up to <size> items from <iterable>"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def records(queryset, serializer, readers, relations):
+    """lists of the exported records of <queryset>, a chunk at a time
+
+    <readers> are ValuesListMixin._value_readers() of <serializer>, or
+    None to export through the serializer, and <relations> the
+    ValuesListMixin._related_values() they read.
+    """
+    size = settings.EXPORT_CHUNK_SIZE
+    if readers is None:
+        lookups = queryset._prefetch_related_lookups
+        for chunk in chunked(queryset.iterator(chunk_size=size), size):
+            prefetch_related_objects(chunk, *lookups)
+            yield [serializer.to_representation(recipe) for recipe in chunk]
+        return
+
+    keys = [key for _, key, _, _ in readers]
+    rows = queryset.annotate(**relations).values(*keys).iterator(
+        chunk_size=size)
+    for chunk in chunked(rows, size):
+        yield [
+            {name: read(row[key]) for name, key, _, read in readers}
+            for row in chunk
+        ]
+
+
+def ndjson(chunks, names):
+    """one JSON document per line"""
+    renderer = FastJSONRenderer()
+    for chunk in chunks:
+        yield renderer.render_lines(chunk)
+
+
+def to_csv(chunks, names):
+    """a header row, then a row per record; id lists are space separated"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for chunk in chunks:
+        for record in chunk:
+            writer.writerow([_cell(record[name]) for name in names])
+        yield _drain(buffer)
+    if buffer.tell():
+        # no records, only the header
+        yield _drain(buffer)
+
+
+def _drain(buffer):
+    data = buffer.getvalue().encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate()
+
+    return data
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return ' '.join(str(item) for item in value)
+
+    return value
+
+
+# ?output= -> (content type, file extension, writer)
+OUTPUTS = {
+    'ndjson': ('application/x-ndjson', 'ndjson', ndjson),
+    'csv': ('text/csv; charset=utf-8', 'csv', to_csv),
+}
@@ -0,0 +1,114 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+
+class UserPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key relation to objects owned by the requesting user
+
+    Lookups go through `resolve()`, which fetches every id it is given
+    with one `filter(pk__in=...)` query and remembers the objects on the
+    request, so validating the same ids again (e.g. across the items of a
+    bulk payload) costs nothing. With `many=True` the whole list is
+    resolved at once by `BatchedManyRelatedField`.
+    """
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+
+        return BatchedManyRelatedField(**list_kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.context.get('request')
+        if request is not None:
+            queryset = queryset.filter(user=request.user)
+
+        return queryset
+
+    def to_internal_value(self, data):
+        pk = self.to_pk(data)
+        objects = self.resolve([pk])
+        if pk not in objects:
+            self.fail('does_not_exist', pk_value=pk)
+
+        return objects[pk]
+
+    def to_pk(self, data):
+        """coerce submitted <data> to a primary key value"""
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return self.queryset.model._meta.pk.to_python(data)
+        except (DjangoValidationError, TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+    def resolve(self, pks):
+        """return {pk: object} for those of <pks> that exist"""
+        cache = self._request_cache()
+        wanted = set(pks) - set(cache)
+        if wanted:
+            found = {obj.pk: obj for obj in self.get_queryset().filter(
+                pk__in=wanted)}
+            cache.update(found)
+            # remember misses too, so unknown ids are not looked up twice
+            cache.update(dict.fromkeys(wanted - set(found)))
+
+        return {
+            pk: cache[pk] for pk in pks if cache.get(pk) is not None
+        }
+
+    def _request_cache(self):
+        """the per-request {pk: object or None} cache for this model"""
+        request = self.context.get('request')
+        if request is None:
+            return {}
+        if not hasattr(request, '_related_objects'):
+            request._related_objects = {}
+
+        return request._related_objects.setdefault(self.queryset.model, {})
+
+
+class BatchedManyRelatedField(serializers.ManyRelatedField):
+    """Resolve a list of primary keys with a single query
+
+    Every missing id is reported, not just the first one.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        relation = self.child_relation
+        pks = [relation.to_pk(item) for item in data]
+        objects = relation.resolve(pks)
+        missing = [pk for pk in dict.fromkeys(pks) if pk not in objects]
+        if missing:
+            message = relation.error_messages['does_not_exist']
+            raise serializers.ValidationError([
+                message.format(pk_value=pk) for pk in missing
+            ])
+
+        return [objects[pk] for pk in pks]
+
+
+class NameField(serializers.CharField):
+    """Name of a related object, given as a string or a {"name": ...}
+
+    The object form lets imports read the relations of an export made
+    with ?expand=.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, dict):
+            data = data.get('name')
+
+        return super().to_internal_value(data)
@@ -0,0 +1,63 @@
+"""Denormalized tag and ingredient ids on recipes
+
+Recipe.tag_ids and Recipe.ingredient_ids hold the ids of the recipe's
+tags and ingredients in ascending order, the same lists the serializers
+render from the m2m tables. The columns are rebuilt by the signal
+handlers in recipe/signals.py and written alongside the links by the
+set-based writes in recipe/bulk.py; `manage.py repair_recipe_id_arrays`
+rewrites any that have drifted from the m2m tables.
+
+With RECIPE_ID_ARRAYS enabled, recipe lists read the ids from the
+columns instead of an ARRAY() subquery per relation, and ?tags= and
+?ingredients= filter with array containment on their GIN indexes (`&&`
+for match=any, `@>` for match=all) instead of going through the m2m
+tables. The columns are kept up to date either way, so the setting can
+be switched without a repair.
+"""
+from django.conf import settings
+from django.db.models import F, Q
+from core.models import Recipe
+from recipe.mixins import related_pks
+
+
+# Recipe m2m field -> array column
+COLUMNS = {'tags': 'tag_ids', 'ingredients': 'ingredient_ids'}
+
+
+def is_enabled():
+    return settings.RECIPE_ID_ARRAYS
+
+
+def ids(objects):
+    """the value of an id array column for the linked <objects>"""
+    return sorted({obj.pk for obj in objects})
+
+
+def update_arrays(recipes, relations=COLUMNS):
+    """rebuild the <relations> arrays of the <recipes> queryset in one
+    UPDATE"""
+    recipes.update(**{
+        COLUMNS[relation]: related_pks(Recipe, relation)
+        for relation in relations
+    })
+
+
+def stale(recipes):
+    """the <recipes> whose arrays differ from their m2m links"""
+    expected = {
+        f'_{column}': related_pks(Recipe, relation)
+        for relation, column in COLUMNS.items()
+    }
+    drifted = Q()
+    for column in COLUMNS.values():
+        drifted |= ~Q(**{column: F(f'_{column}')})
+
+    return recipes.annotate(**expected).filter(drifted)
+
+
+def filter_related(queryset, relation, pks, match):
+    """keep recipes whose <relation> array has any/all of <pks>"""
+    lookup = 'contains' if match == 'all' else 'overlap'
+
+    return queryset.filter(**{
+        f'{COLUMNS[relation]}__{lookup}': sorted(set(pks))})
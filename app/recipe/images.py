@@ -0,0 +1,277 @@
+"""Off-request processing of uploaded recipe images
+
+An upload is only written to a staging file during the request. The
+resizing happens afterwards on a small thread pool: each configured
+rendition is written as JPEG and WebP, EXIF data is dropped (after the
+orientation tag has been applied) and the storage names are attached to
+the recipe. With IMAGE_PROCESSING_MODE = 'sync' the work is done inline,
+which is what the tests use.
+
+Renditions are content addressed: they belong to an ImageBlob keyed by
+the sha256 of the uploaded bytes and are stored under that hash, so an
+upload seen before is attached to the recipe without being processed or
+stored again, and a blob's URLs never change content.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from core.models import ImageBlob, Recipe
+from recipe import cache
+
+
+logger = logging.getLogger(__name__)
+
+STAGING_DIR = os.path.join('uploads', 'staging')
+BLOB_DIR = os.path.join('uploads', 'blobs')
+
+# name, Pillow format, file extension, save options
+FORMATS = (
+    ('jpeg', 'JPEG', 'jpg', {'quality': 85, 'optimize': True}),
+    ('webp', 'WEBP', 'webp', {'quality': 80, 'method': 4}),
+)
+
+# EXIF orientation -> transpose that puts the image upright
+ORIENTATION_TAG = 0x0112
+ORIENTATIONS = {
+    2: Image.FLIP_LEFT_RIGHT,
+    3: Image.ROTATE_180,
+    4: Image.FLIP_TOP_BOTTOM,
+    5: Image.TRANSPOSE,
+    6: Image.ROTATE_270,
+    7: Image.TRANSVERSE,
+    8: Image.ROTATE_90,
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def submit(recipe, upload):
+    """give <recipe> the image in <upload>
+
+    Bytes that were uploaded before only repoint the recipe at their
+    blob; anything new is staged and scheduled for processing.
+    """
+    staged, digest = stage(upload)
+
+    blob = ImageBlob.objects.filter(sha256=digest).first()
+    if blob is not None and attach(recipe.pk, blob):
+        default_storage.delete(staged)
+        return
+
+    recipe.staged_image = staged
+    recipe.image_status = Recipe.IMAGE_PENDING
+    recipe.save(update_fields=['staged_image', 'image_status', 'updated_at'])
+    schedule(recipe.pk, staged, digest)
+
+
+def stage(upload):
+    """return the staging name and sha256 of <upload>
+
+    Uploads streamed in by recipe.uploads.StagingUploadHandler are
+    already in place and hashed; anything else is written here.
+    """
+    if getattr(upload, 'staged_name', None) is not None:
+        upload.close()
+        return upload.staged_name, upload.sha256
+
+    sha256 = hashlib.sha256()
+    for chunk in upload.chunks():
+        sha256.update(chunk)
+    upload.seek(0)
+    ext = os.path.splitext(upload.name)[1].lower()
+    name = default_storage.save(
+        os.path.join(STAGING_DIR, f'{uuid.uuid4()}{ext}'), upload)
+
+    return name, sha256.hexdigest()
+
+
+def schedule(recipe_id, staged, digest):
+    """process the staged image now or on the pool after commit"""
+    if settings.IMAGE_PROCESSING_MODE == 'sync':
+        process(recipe_id, staged, digest)
+        return
+
+    transaction.on_commit(lambda: _get_executor().submit(
+        _process_in_thread, recipe_id, staged, digest))
+
+
+def process(recipe_id, staged, digest):
+    """build the blob for <staged> and attach it to the recipe"""
+    blob = ImageBlob.objects.filter(sha256=digest).first()
+    if blob is None:
+        try:
+            with default_storage.open(staged, 'rb') as fh:
+                renditions = write_renditions(
+                    upright(Image.open(fh)), digest)
+        except Exception:
+            logger.exception('processing image %s failed', staged)
+            _finish(recipe_id, staged, None)
+            return
+
+        blob, _ = ImageBlob.objects.get_or_create(sha256=digest, defaults={
+            'size': default_storage.size(staged),
+            'renditions': renditions,
+        })
+
+    _finish(recipe_id, staged, blob)
+
+
+def upright(image):
+    """apply the EXIF orientation and return an RGB copy without EXIF"""
+    try:
+        orientation = (image._getexif() or {}).get(ORIENTATION_TAG)
+    except (AttributeError, KeyError, IndexError, TypeError, ValueError):
+        orientation = None
+
+    image = image.convert('RGB')
+    if orientation in ORIENTATIONS:
+        image = image.transpose(ORIENTATIONS[orientation])
+
+    return image
+
+
+def write_renditions(image, digest):
+    """save every configured size of <image>, return their storage names"""
+    renditions = {}
+    for size_name, size in settings.IMAGE_RENDITIONS.items():
+        resized = image.copy()
+        resized.thumbnail(size, Image.LANCZOS)
+
+        renditions[size_name] = {}
+        for fmt_name, fmt, ext, options in FORMATS:
+            name = blob_name(digest, size_name, ext)
+            renditions[size_name][fmt_name] = name
+            if default_storage.exists(name):
+                # written by a concurrent upload of the same bytes
+                continue
+
+            buffer = io.BytesIO()
+            resized.save(buffer, fmt, **options)
+            saved = default_storage.save(name, ContentFile(buffer.getvalue()))
+            if saved != name:
+                default_storage.delete(saved)
+
+    return renditions
+
+
+def blob_name(digest, size_name, ext):
+    """storage name of a rendition, sharded by the upload's sha256"""
+    return os.path.join(
+        BLOB_DIR, digest[:2], digest[2:4], f'{digest}-{size_name}.{ext}')
+
+
+def blob_digest(name):
+    """the upload sha256 a blob file name belongs to"""
+    return os.path.basename(name).split('-', 1)[0]
+
+
+def rendition_urls(recipe):
+    """{size: {format: url}} for the renditions of <recipe>"""
+    return {
+        size_name: {
+            fmt_name: default_storage.url(name)
+            for fmt_name, name in formats.items()
+        }
+        for size_name, formats in recipe.renditions.items()
+    }
+
+
+def attach(recipe_id, blob):
+    """point the recipe at <blob>, False if the blob has been collected"""
+    with transaction.atomic():
+        recipe = Recipe.objects.select_for_update().get(pk=recipe_id)
+        return _attach(recipe, blob)
+
+
+def _finish(recipe_id, staged, blob):
+    """store the outcome unless the recipe has moved on to a newer upload
+
+    The row is updated only while it still points at <staged>, so the
+    result of a superseded upload is never attached. A None <blob> marks
+    the image as failed.
+    """
+    with transaction.atomic():
+        recipe = Recipe.objects.select_for_update().filter(
+            pk=recipe_id, staged_image=staged).first()
+        if recipe is not None and not _attach(recipe, blob):
+            # only possible if the blob outlived the collection grace
+            # period between being built and attached
+            _attach(recipe, None)
+
+    default_storage.delete(staged)
+
+    return recipe is not None
+
+
+def _attach(recipe, blob):
+    """update the locked <recipe> row and the blob reference counts"""
+    fields = {'staged_image': '', 'updated_at': timezone.now()}
+
+    if blob is None:
+        fields['image_status'] = Recipe.IMAGE_FAILED
+    else:
+        # the row lock keeps collect_image_blobs off this blob
+        blob = ImageBlob.objects.select_for_update().filter(
+            pk=blob.pk).first()
+        if blob is None:
+            return False
+        fields.update(
+            image=blob.renditions['original']['jpeg'],
+            renditions=blob.renditions,
+            image_blob=blob,
+            image_status=Recipe.IMAGE_READY)
+
+        if recipe.image_blob_id != blob.pk:
+            ImageBlob.objects.filter(pk=blob.pk).update(
+                ref_count=F('ref_count') + 1)
+            if recipe.image_blob_id is not None:
+                ImageBlob.objects.filter(pk=recipe.image_blob_id).update(
+                    ref_count=F('ref_count') - 1)
+            elif recipe.image:
+                # stored before blobs existed, owned by this recipe alone
+                legacy = [recipe.image.name] + [
+                    name for formats in recipe.renditions.values()
+                    for name in formats.values()
+                ]
+                transaction.on_commit(lambda: _delete_files(legacy))
+
+    Recipe.objects.filter(pk=recipe.pk).update(**fields)
+    cache.bump_version(recipe.user_id)
+
+    return True
+
+
+def _delete_files(names):
+    for name in names:
+        default_storage.delete(name)
+
+
+def _process_in_thread(recipe_id, staged, digest):
+    try:
+        process(recipe_id, staged, digest)
+    finally:
+        # worker threads get their own connection; do not leak it
+        connection.close()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_PROCESSING_WORKERS,
+                thread_name_prefix='recipe-images')
+
+    return _executor
@@ -0,0 +1,131 @@
+"""Streaming import of recipes from NDJSON or CSV
+
+Records are parsed from the stream one at a time and written in batches
+of IMPORT_BATCH_SIZE by bulk.create_recipes, each batch in a savepoint
+of its own. The next batch is only read once the previous one has been
+written, so a slow database holds the reader back and memory holds one
+batch (plus the user's tag and ingredient names) however large the file.
+
+A record has the recipe fields of RecipeImportSerializer, with `tags`
+and `ingredients` given by name: JSON arrays of names (or of objects
+with a "name", as in an export with ?expand=) in NDJSON, and names
+separated by CSV_SEPARATOR in a CSV cell. Names are matched to the
+user's tags and ingredients regardless of case, and the missing ones are
+created (see bulk.ensure_names).
+
+Invalid records are reported and left out; the others are written.
+Every batch that has been reported is committed, so an interrupted
+import resumes by skipping the records already read.
+"""
+import csv
+import io
+import itertools
+import json
+from django.conf import settings
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+from recipe import bulk
+from recipe.export import chunked
+from recipe.serializers import RecipeImportSerializer
+
+
+# separates the tag/ingredient names of a CSV cell
+CSV_SEPARATOR = ';'
+
+NOT_AN_OBJECT = {'non_field_errors': ['Expected a JSON object.']}
+
+
+def parse_ndjson(stream):
+    """records of the binary NDJSON <stream>
+
+    Lines that are not a JSON object come out as None.
+    """
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+
+        yield record if isinstance(record, dict) else None
+
+
+def parse_csv(stream):
+    """records of the binary CSV <stream>, which starts with a header"""
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    for record in csv.DictReader(text):
+        for relation in bulk.M2M_FIELDS:
+            if record.get(relation) is not None:
+                record[relation] = [
+                    name.strip()
+                    for name in record[relation].split(CSV_SEPARATOR)
+                    if name.strip()
+                ]
+
+        yield record
+
+
+PARSERS = {'ndjson': parse_ndjson, 'csv': parse_csv}
+
+
+def input_for(filename):
+    """the parser name for a file called <filename>"""
+    return 'csv' if filename.lower().endswith('.csv') else 'ndjson'
+
+
+def import_recipes(user, records, skip=0, batch_size=None):
+    """create <user>'s recipes from <records>, yield progress per batch
+
+    Progress is a dict of the number of `records` read (skipped ones
+    included), recipes `created` and records found `invalid` so far, and
+    the `errors` of the batch's invalid records by record number. Every
+    batch before a progress report is committed; pass its `records` back
+    as <skip> to resume after a failure.
+    """
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    serializer = RecipeImportSerializer()
+    names = {}
+    progress = {'records': skip, 'created': 0, 'invalid': 0}
+
+    for batch in chunked(itertools.islice(records, skip, None), batch_size):
+        items, errors = [], []
+        for number, record in enumerate(batch, progress['records'] + 1):
+            try:
+                if record is None:
+                    raise ValidationError(NOT_AN_OBJECT)
+                items.append(serializer.run_validation(record))
+            except ValidationError as exc:
+                errors.append({'record': number, 'errors': exc.detail})
+
+        if items:
+            with transaction.atomic():
+                _link_names(user, items, names)
+                progress['created'] += len(bulk.create_recipes(user, items))
+        progress['records'] += len(batch)
+        progress['invalid'] += len(errors)
+
+        yield dict(progress, errors=errors)
+
+
+def _link_names(user, items, names):
+    """replace the tag/ingredient names of <items> with their objects
+
+    <names> caches {relation: {name: object}} across batches. It starts
+    with the user's objects, loaded with one query per model; names not
+    found there go through bulk.ensure_names.
+    """
+    for relation, model in bulk.M2M_FIELDS.items():
+        if relation not in names:
+            names[relation] = {
+                obj.name: obj for obj in
+                model.objects.filter(user=user).only('pk', 'name')}
+        objects = names[relation]
+
+        objects.update(bulk.ensure_names(model, user, (
+            name for item in items for name in item.get(relation, ())
+            if name not in objects)))
+
+        for item in items:
+            if relation in item:
+                item[relation] = [objects[name] for name in item[relation]]
@@ -0,0 +1,245 @@
+import hashlib
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.db import connection
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery
+from django.utils.http import parse_etags
+from rest_framework import serializers, status
+from rest_framework.relations import ManyRelatedField, \
+                                    PrimaryKeyRelatedField, RelatedField
+from rest_framework.response import Response
+from recipe import cache
+
+
+def etag_matches(request, etag):
+    """True if the request's If-None-Match lists <etag>"""
+    etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+
+    return etag in etags or '*' in etags
+
+
+def conditional_response(request, etag, view, *args, **kwargs):
+    """304 if <etag> matches the request, else the response of <view>"""
+    if etag and etag_matches(request, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = view(request, *args, **kwargs)
+
+    if etag and response.status_code in (status.HTTP_200_OK,
+                                         status.HTTP_304_NOT_MODIFIED):
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+
+    return response
+
+
+class CachedListMixin:
+    """Serve list() from the per-user versioned response cache
+
+    The response's ETag is cached along with its data, so a cache hit
+    answers conditional requests without touching the database.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if not cache.is_enabled():
+            return super().list(request, *args, **kwargs)
+
+        key = cache.response_key(request)
+        cached = cache.get_response(key)
+        if cached is not None:
+            data, etag = cached
+            return conditional_response(
+                request, etag, lambda request: Response(data))
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set_response(key, (response.data, response.get('ETag')))
+
+        return response
+
+
+class ConditionalGetMixin:
+    """Answer list/retrieve with 304 Not Modified when the ETag matches
+
+    The ETag is derived from a single aggregate query (latest updated_at
+    plus row count) over the same queryset the response would serialize,
+    so an unchanged resource costs one query and no serialization.
+    Relations named in `etag_related` are folded into the detail
+    fingerprint, since the detail representation nests them, and those
+    returned by _list_related() into the list fingerprint.
+    """
+    etag_related = ()
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        etag = self._etag(
+            request, self._fingerprint(queryset, self._list_related()))
+
+        return conditional_response(
+            request, etag, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: kwargs[lookup]})
+        except (TypeError, ValueError):
+            return super().retrieve(request, *args, **kwargs)
+
+        fingerprint = self._fingerprint(queryset, self.etag_related)
+        etag = self._etag(request, fingerprint) if fingerprint['count'] \
+            else None
+
+        return conditional_response(
+            request, etag, super().retrieve, *args, **kwargs)
+
+    def _list_related(self):
+        """relations the list items of this request render nested"""
+        return ()
+
+    def _fingerprint(self, queryset, related=()):
+        aggregates = {'updated': Max('updated_at'), 'count': Count('pk')}
+        for relation in related:
+            aggregates[f'{relation}_updated'] = Max(f'{relation}__updated_at')
+            aggregates[f'{relation}_count'] = Count(relation, distinct=True)
+        if related:
+            aggregates['count'] = Count('pk', distinct=True)
+
+        return queryset.order_by().aggregate(**aggregates)
+
+    def _etag(self, request, fingerprint):
+        """strong ETag for this user, URL, media type and fingerprint"""
+        parts = [
+            str(request.user.pk),
+            request.get_full_path(),
+            request.accepted_media_type or '',
+        ]
+        parts += [
+            value.isoformat() if hasattr(value, 'isoformat') else str(value)
+            for _, value in sorted(fingerprint.items())
+        ]
+        digest = hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()
+
+        return f'"{digest}"'
+
+
+class Array(Subquery):
+    """ARRAY(<subquery>): the single column of the subquery as an array"""
+    template = 'ARRAY(%(subquery)s)'
+
+
+def related_pks(model, relation):
+    """ids linked to each <model> row through the m2m <relation>, in order
+
+    Matches the primary key lists the serializers render from relations
+    prefetched in id order.
+    """
+    field = model._meta.get_field(relation)
+    source = field.m2m_field_name()
+    target = f'{field.m2m_reverse_field_name()}_id'
+    links = field.remote_field.through.objects.filter(
+        **{source: OuterRef('pk')}
+    ).order_by(target).values(target)
+
+    return Array(links, output_field=ArrayField(IntegerField()))
+
+
+def _identity(value):
+    return value
+
+
+def _nullable(to_representation):
+    def represent(value):
+        return None if value is None else to_representation(value)
+
+    return represent
+
+
+# fields whose to_representation leaves the database value as it is
+PLAIN_FIELDS = (serializers.IntegerField, serializers.CharField)
+
+
+class ValuesListMixin:
+    """Build list responses from .values() rows, without model instances
+
+    Each field the list serializer would render (after any trimming by
+    the view) is read from a values() column; relations it renders as
+    primary keys come from an ARRAY() subquery instead of a prefetch.
+    Only fields that are not plain columns go through their serializer
+    field's to_representation, so the output is the same, byte for byte,
+    as the serializer's.
+
+    Lists whose serializer has nested or computed fields, and databases
+    other than Postgres, use the regular serializer path, as does every
+    list with VALUES_LIST_ENABLED = False.
+    """
+
+    def list(self, request, *args, **kwargs):
+        readers = self._value_readers(self.get_serializer())
+        if readers is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        relations = self._related_values(queryset.model, readers)
+        keys = [key for _, key, _, _ in readers]
+        # keyset pagination reads the ordering values off the last row
+        keys += [
+            name for name in (
+                field.lstrip('-') for field in queryset.query.order_by)
+            if name not in keys
+        ]
+        queryset = queryset.prefetch_related(None).annotate(
+            **relations).values(*keys)
+
+        page = self.paginate_queryset(queryset)
+        data = [
+            {name: read(row[key]) for name, key, _, read in readers}
+            for row in (queryset if page is None else page)
+        ]
+        if page is not None:
+            return self.get_paginated_response(data)
+
+        return Response(data)
+
+    def _related_values(self, model, readers):
+        """{values() key: expression} of the relations <readers> render as
+        primary key lists"""
+        return {
+            key: self._related_pks(model, source)
+            for _, key, source, _ in readers if key != source
+        }
+
+    def _related_pks(self, model, relation):
+        return related_pks(model, relation)
+
+    def _value_readers(self, serializer):
+        """(field name, values() key, source, converter) for each field
+
+        None when a field can't be read from a values() row.
+        """
+        if not (settings.VALUES_LIST_ENABLED and
+                connection.vendor == 'postgresql'):
+            return None
+
+        readers = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if field.source != name or '.' in name:
+                return None
+            if isinstance(field, ManyRelatedField):
+                if not isinstance(field.child_relation,
+                                  PrimaryKeyRelatedField):
+                    return None
+                readers.append((name, f'_{name}_pks', name, _identity))
+            elif isinstance(field, (serializers.BaseSerializer,
+                                    serializers.SerializerMethodField,
+                                    RelatedField)):
+                return None
+            elif isinstance(field, PLAIN_FIELDS):
+                readers.append((name, name, name, _identity))
+            else:
+                readers.append((
+                    name, name, name, _nullable(field.to_representation)))
+
+        return readers
@@ -0,0 +1,142 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Opt-in keyset (cursor) pagination over the queryset's ordering
+
+    Rather than an OFFSET, each page is selected with a WHERE clause on
+    the ordering values of the previous page's last row, so fetching page
+    1000 costs the same as fetching page 1. The queryset must be ordered
+    and its last ordering field must be unique (e.g. `id`).
+
+    Pagination only kicks in when the request carries a `cursor` or
+    `page_size` query parameter; otherwise the full list is returned as
+    before.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 100
+    max_page_size = 1000
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """return the requested page, or None if pagination is off"""
+        params = request.query_params
+        if (self.cursor_query_param not in params and
+                self.page_size_query_param not in params):
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            try:
+                queryset = queryset.filter(self._after(position))
+            except (TypeError, ValueError, ValidationError):
+                # a tampered cursor with values the fields can't compare to
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data)
+        ]))
+
+    def get_page_size(self, request):
+        """page size from the query string, capped at max_page_size"""
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        if size <= 0:
+            return self.page_size
+
+        return min(size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        """return the ordering the queryset is sorted by"""
+        ordering = tuple(queryset.query.order_by)
+        if not ordering:
+            raise ImproperlyConfigured(
+                'KeysetPagination requires an ordered queryset')
+
+        return ordering
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        last = self.page[-1]
+        # rows are model instances, or dicts from a values() queryset
+        get = last.get if isinstance(last, dict) else \
+            lambda name: getattr(last, name)
+        position = [get(field.lstrip('-')) for field in self.ordering]
+        url = self.request.build_absolute_uri()
+
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(position))
+
+    def encode_cursor(self, position):
+        """encode a list of ordering values as an opaque url-safe token"""
+        data = json.dumps(position, cls=DjangoJSONEncoder).encode('utf-8')
+
+        return base64.urlsafe_b64encode(data).decode('ascii')
+
+    def decode_cursor(self, request):
+        """decode the cursor from the request, None for the first page"""
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+
+        try:
+            position = json.loads(
+                base64.urlsafe_b64decode(token.encode('ascii')))
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+        if (not isinstance(position, list) or
+                len(position) != len(self.ordering)):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position
+
+    def _after(self, position):
+        """build the filter for rows sorting after the given position
+
+        For ordering (a, b) this is `a > x OR (a = x AND b > y)`, with the
+        comparison flipped for descending fields. The leading field is
+        also bounded on its own so the database can range-scan an index.
+        """
+        condition = None
+        for field, value in reversed(list(zip(self.ordering, position))):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{f'{name}__{lookup}': value})
+            if condition is not None:
+                step |= Q(**{name: value}) & condition
+            condition = step
+
+        first, value = self.ordering[0], position[0]
+        bound = 'lte' if first.startswith('-') else 'gte'
+
+        return Q(**{f'{first.lstrip("-")}__{bound}': value}) & condition
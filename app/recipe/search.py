@@ -0,0 +1,81 @@
+"""Full-text search over recipe titles, tag names and ingredient names
+
+Each recipe stores a weighted tsvector of its title (A), tag names (B)
+and ingredient names (C) in `search_vector`, which has a GIN index, and
+`?search=` matches against it and ranks the results. The vectors are
+rebuilt by the signal handlers in recipe/signals.py and by the set-based
+writes in recipe/bulk.py.
+
+On databases other than Postgres, or with RECIPE_SEARCH_MODE = 'ilike',
+every word of the search has to appear (case-insensitively) in the
+title or a tag/ingredient name instead, and results are not ranked.
+"""
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, \
+                                           SearchVector
+from django.db import connection
+from django.db.models import Exists, F, FloatField, OuterRef, Q, Subquery, \
+                             TextField
+from django.db.models.functions import Cast
+from core.models import Ingredient, Tag
+
+
+CONFIG = 'english'
+
+# related model, Recipe m2m field, weight
+WEIGHTED_RELATIONS = ((Tag, 'tags', 'B'), (Ingredient, 'ingredients', 'C'))
+
+
+def is_fulltext():
+    return (settings.RECIPE_SEARCH_MODE == 'fulltext' and
+            connection.vendor == 'postgresql')
+
+
+def update_vectors(recipes):
+    """rebuild the search vectors of the <recipes> queryset in one UPDATE"""
+    if not is_fulltext():
+        return
+
+    vector = SearchVector('title', weight='A', config=CONFIG)
+    for model, _, weight in WEIGHTED_RELATIONS:
+        vector += SearchVector(_names(model), weight=weight, config=CONFIG)
+
+    recipes.update(search_vector=vector)
+
+
+def _names(model):
+    """space separated names of the <model> rows linked to a recipe"""
+    return Subquery(
+        model.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('name', ' ')
+        ).values('names'),
+        output_field=TextField())
+
+
+def search(queryset, text):
+    """return (<queryset> narrowed to matches for <text>, its ordering)"""
+    if is_fulltext():
+        query = SearchQuery(text, config=CONFIG)
+        # ts_rank is a real; as a double precision it survives the JSON
+        # round trip of the keyset cursor and compares equal to itself
+        queryset = queryset.filter(search_vector=query).annotate(
+            rank=Cast(SearchRank(F('search_vector'), query), FloatField()))
+
+        return queryset, ('-rank', '-id')
+
+    for index, word in enumerate(text.split()):
+        matches = Q(title__icontains=word)
+        for model, relation, _ in WEIGHTED_RELATIONS:
+            # a correlated EXISTS probes the m2m index per recipe, where
+            # `pk IN (...)` of a common word would materialise most links
+            linked = Exists(model.objects.filter(
+                recipe=OuterRef('pk'), name__icontains=word))
+            name = f'_search_{relation}_{index}'
+            queryset = queryset.annotate(**{name: linked})
+            matches |= Q(**{name: True})
+        queryset = queryset.filter(matches)
+
+    return queryset, ('-id',)
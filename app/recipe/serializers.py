@@ -1,8 +1,29 @@
 from rest_framework import serializers
 from core.models import Tag, Ingredient, Recipe
+from recipe import bulk, images
+from recipe.fields import NameField, UserPrimaryKeyRelatedField
 
 
-class TagSerializer(serializers.ModelSerializer):
+class UniqueNameMixin:
+    """Refuse a name the user already has, in any case
+
+    The database enforces the same with a unique (user, lower(name))
+    index; this turns the common case into a validation error.
+    """
+
+    def validate_name(self, value):
+        request = self.context.get('request')
+        model = self.Meta.model
+        if request is not None and model.objects.filter(
+                user=request.user, name__iexact=value).exists():
+            raise serializers.ValidationError(
+                f'A {model._meta.verbose_name} with this name already '
+                f'exists.')
+
+        return value
+
+
+class TagSerializer(UniqueNameMixin, serializers.ModelSerializer):
     """Serializer for <Tag> object"""
 
     class Meta:
@@ -11,7 +32,7 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', )
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(UniqueNameMixin, serializers.ModelSerializer):
     """Serializer for <Ingredient>"""
 
     class Meta:
@@ -20,14 +41,60 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only = ('id',)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class TagCountSerializer(TagSerializer):
+    """Serializer for <Tag> with the number of recipes using it"""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ('recipe_count',)
+
+
+class IngredientCountSerializer(IngredientSerializer):
+    """Serializer for <Ingredient> with the number of recipes using it"""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(IngredientSerializer.Meta):
+        fields = IngredientSerializer.Meta.fields + ('recipe_count',)
+
+
+class EnsureNamesSerializer(serializers.Serializer):
+    """Serializer for the names of a tag/ingredient ensure request"""
+    names = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        allow_empty=False,
+        max_length=bulk.MAX_ITEMS)
+
+
+class SparseFieldsMixin:
+    """Let the view pick the fields a serializer renders
+
+    `fields` limits the output to those names; relations named in
+    `expand` are rendered with the serializers in `expandable` instead of
+    as primary keys.
+    """
+    expandable = {}
+
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        for name in expand:
+            if name in self.fields:
+                self.fields[name] = self.expandable[name](
+                    many=True, read_only=True)
+
+
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for <Recipe> object"""
+    expandable = {'tags': TagSerializer, 'ingredients': IngredientSerializer}
 
-    ingredients = serializers.PrimaryKeyRelatedField(
+    ingredients = UserPrimaryKeyRelatedField(
         many=True,
         queryset=Ingredient.objects.all())
 
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = UserPrimaryKeyRelatedField(
         many=True,
         queryset=Tag.objects.all())
 
@@ -44,6 +111,155 @@ class RecipeSerializer(serializers.ModelSerializer):
         read_only = ('id', )
 
 
+class BulkRecipeListSerializer(serializers.ListSerializer):
+    """Validate a list of recipes for the bulk endpoints
+
+    Tag/ingredient ids referenced anywhere in the list are resolved up
+    front with one query per model; the items are then validated against
+    that per-request cache. Errors are reported per item.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            return super().to_internal_value(data)
+        if len(data) > bulk.MAX_ITEMS:
+            raise serializers.ValidationError({
+                'non_field_errors': [
+                    f'Expected at most {bulk.MAX_ITEMS} items.']
+            })
+
+        for relation in bulk.M2M_FIELDS:
+            self._resolve(data, self.child.fields[relation].child_relation)
+
+        items, errors = [], []
+        for item in data:
+            try:
+                items.append(self.child.run_validation(item))
+                errors.append({})
+            except serializers.ValidationError as exc:
+                items.append({})
+                errors.append(exc.detail)
+
+        if not self.child.fields['id'].read_only:
+            self._check_ids(items, errors)
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        return items
+
+    def _resolve(self, data, relation):
+        """look up every valid pk submitted under <relation> at once"""
+        pks = set()
+        for item in data:
+            values = item.get(relation.parent.field_name) \
+                if isinstance(item, dict) else None
+            if not isinstance(values, list):
+                continue
+            for value in values:
+                try:
+                    pks.add(relation.to_pk(value))
+                except serializers.ValidationError:
+                    pass
+
+        relation.resolve(pks)
+
+    def _check_ids(self, items, errors):
+        """report recipe ids that are missing, repeated or not owned by
+        the user
+
+        Partial updates skip the required check of every field, `id`
+        included, so items without one are caught here.
+        """
+        ids = {item['id'] for item in items if 'id' in item}
+        found = set(Recipe.objects.filter(
+            user=self.context['request'].user, pk__in=ids
+        ).values_list('pk', flat=True))
+
+        seen = set()
+        for item, error in zip(items, errors):
+            if 'id' not in item:
+                # items that failed validation are empty here
+                if not error:
+                    error['id'] = [
+                        self.child.fields['id'].error_messages['required']]
+                continue
+            if item['id'] not in found:
+                error['id'] = [
+                    f'Invalid pk "{item["id"]}" - object does not exist.']
+            elif item['id'] in seen:
+                error['id'] = ['Duplicate recipe id.']
+            seen.add(item['id'])
+
+
+class RecipeBulkSerializer(RecipeSerializer):
+    """Serializer for one item of a bulk recipe create"""
+    ingredients = UserPrimaryKeyRelatedField(
+        many=True,
+        required=False,
+        queryset=Ingredient.objects.all())
+
+    tags = UserPrimaryKeyRelatedField(
+        many=True,
+        required=False,
+        queryset=Tag.objects.all())
+
+    class Meta(RecipeSerializer.Meta):
+        list_serializer_class = BulkRecipeListSerializer
+
+
+class RecipeBulkUpdateSerializer(RecipeBulkSerializer):
+    """Serializer for one item of a bulk recipe update"""
+    id = serializers.IntegerField()
+
+
+class RecipeBulkDeleteSerializer(serializers.Serializer):
+    """Serializer for the recipe ids of a bulk delete"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=bulk.MAX_ITEMS)
+
+    def validate_ids(self, value):
+        """check every recipe exists and belongs to the user"""
+        ids = set(value)
+        found = set(Recipe.objects.filter(
+            user=self.context['request'].user, pk__in=ids
+        ).values_list('pk', flat=True))
+        missing = sorted(ids - found)
+        if missing:
+            raise serializers.ValidationError([
+                f'Invalid pk "{pk}" - object does not exist.'
+                for pk in missing
+            ])
+
+        return sorted(ids)
+
+
+class RecipeImportSerializer(serializers.ModelSerializer):
+    """Serializer for one record of a recipe import
+
+    Tags and ingredients are given by name; recipe/importer.py matches
+    them to the user's objects, creating the missing ones.
+    """
+    tags = serializers.ListField(
+        child=NameField(max_length=255), required=False)
+
+    ingredients = serializers.ListField(
+        child=NameField(max_length=255), required=False)
+
+    class Meta:
+        model = Recipe
+        fields = (
+            'title',
+            'time_minutes',
+            'price',
+            'link',
+            'tags',
+            'ingredients',
+        )
+
+
 class RecipeDetailSerializer(RecipeSerializer):
     """Serialize a detail recipe"""
     ingredients = IngredientSerializer(many=True, read_only=True)
@@ -52,8 +268,22 @@ class RecipeDetailSerializer(RecipeSerializer):
 
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for adding images to recipes"""
+    renditions = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'image')
-        read_only_fields = ('id',)
+        fields = ('id', 'image', 'image_status', 'renditions')
+        read_only_fields = ('id', 'image_status')
+        extra_kwargs = {'image': {'required': True}}
+
+    def get_renditions(self, recipe):
+        request = self.context.get('request')
+        urls = images.rendition_urls(recipe)
+        if request is None:
+            return urls
+
+        return {
+            size: {fmt: request.build_absolute_uri(url)
+                   for fmt, url in formats.items()}
+            for size, formats in urls.items()
+        }
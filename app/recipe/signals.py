@@ -0,0 +1,147 @@
+from django.db.models.signals import (
+    post_save, post_delete, pre_delete, m2m_changed
+)
+from django.dispatch import receiver
+from django.db.models import F
+from django.utils import timezone
+from core.models import ImageBlob, Tag, Ingredient, Recipe
+from recipe import cache, id_arrays, search
+
+
+# Recipe m2m field linking to each attribute model
+RELATIONS = {Tag: 'tags', Ingredient: 'ingredients'}
+
+
+def touch(queryset):
+    """bump updated_at without sending save signals"""
+    queryset.update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """drop the owner's cached list responses"""
+    cache.bump_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_user_cache_m2m(sender, instance, action, **kwargs):
+    """drop the owner's cached list responses when recipe links change"""
+    if action.startswith('post_'):
+        cache.bump_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def touch_linked(sender, instance, action, reverse, model, pk_set,
+                 **kwargs):
+    """mark both sides of a changed recipe link as updated
+
+    A recipe's representation includes its tag/ingredient ids, and a
+    tag/ingredient's includes whether (and how often) it is used, so the
+    ETag fingerprints of both sides must move when links change.
+    """
+    if action in ('post_add', 'post_remove'):
+        touch(type(instance).objects.filter(pk=instance.pk))
+        touch(model.objects.filter(pk__in=pk_set))
+    elif action == 'pre_clear':
+        # the linked rows are only known before they are cleared
+        touch(type(instance).objects.filter(pk=instance.pk))
+        field = RELATIONS[type(instance)] if reverse else 'recipe'
+        touch(model.objects.filter(**{field: instance}))
+
+
+@receiver(pre_delete, sender=Recipe)
+def touch_recipe_links(sender, instance, **kwargs):
+    """a deleted recipe changes the usage of its tags and ingredients"""
+    touch(Tag.objects.filter(recipe=instance))
+    touch(Ingredient.objects.filter(recipe=instance))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def touch_attribute_recipes(sender, instance, **kwargs):
+    """a deleted tag/ingredient disappears from its recipes"""
+    touch(Recipe.objects.filter(**{RELATIONS[sender]: instance}))
+
+
+@receiver(post_delete, sender=Recipe)
+def release_image_blob(sender, instance, **kwargs):
+    """a deleted recipe no longer references its image blob"""
+    if instance.image_blob_id is not None:
+        ImageBlob.objects.filter(pk=instance.image_blob_id).update(
+            ref_count=F('ref_count') - 1)
+
+
+@receiver(post_save, sender=Recipe)
+def update_search_vector(sender, instance, update_fields, **kwargs):
+    """reindex a recipe whose title may have changed"""
+    if update_fields is None or 'title' in update_fields:
+        search.update_vectors(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Recipe)
+def update_saved_id_arrays(sender, instance, created, update_fields,
+                           **kwargs):
+    """rewrite the id arrays a save may have overwritten with stale ones"""
+    columns = set(id_arrays.COLUMNS.values())
+    if not created and (update_fields is None or columns & update_fields):
+        id_arrays.update_arrays(Recipe.objects.filter(pk=instance.pk))
+
+
+def update_linked(recipes, relation):
+    """reindex <recipes> and rebuild their <relation> id arrays"""
+    search.update_vectors(recipes)
+    id_arrays.update_arrays(recipes, [relation])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_linked_recipes(sender, instance, action, reverse, model, pk_set,
+                          **kwargs):
+    """reindex the recipes whose tags/ingredients changed and rebuild
+    their id arrays"""
+    relation = RELATIONS[type(instance) if reverse else model]
+    if not reverse:
+        if action == 'post_clear' or (
+                action in ('post_add', 'post_remove') and pk_set):
+            update_linked(Recipe.objects.filter(pk=instance.pk), relation)
+    elif action in ('post_add', 'post_remove') and pk_set:
+        update_linked(Recipe.objects.filter(pk__in=pk_set), relation)
+    elif action == 'pre_clear':
+        # the recipes are only known before the links are cleared
+        instance._unlinked_recipes = list(Recipe.objects.filter(
+            **{relation: instance}).values_list('pk', flat=True))
+    elif action == 'post_clear':
+        update_linked(Recipe.objects.filter(
+            pk__in=instance.__dict__.pop('_unlinked_recipes', ())), relation)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def update_renamed_search_vectors(sender, instance, created, **kwargs):
+    """reindex the recipes of a renamed tag/ingredient"""
+    if not created:
+        search.update_vectors(
+            Recipe.objects.filter(**{RELATIONS[sender]: instance}))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_unlinked_recipes(sender, instance, **kwargs):
+    instance._unlinked_recipes = list(Recipe.objects.filter(
+        **{RELATIONS[sender]: instance}).values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def update_unlinked_recipes(sender, instance, **kwargs):
+    """reindex the recipes a deleted tag/ingredient was removed from"""
+    update_linked(Recipe.objects.filter(
+        pk__in=instance.__dict__.pop('_unlinked_recipes', ())),
+        RELATIONS[sender])
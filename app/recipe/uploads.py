@@ -0,0 +1,237 @@
+"""Streaming upload handling for recipe images and imports
+
+`StagingUploadHandler` replaces Django's memory/temporary-file handlers
+for the upload-image action. Each chunk is hashed and counted as it
+arrives and written straight to the image's staging file, which is what
+the image pipeline reads, so the upload is never held in memory or
+copied. Oversized uploads are refused from the Content-Length or as soon
+as the running size passes the limit, and content that Pillow does not
+recognise as an allowed image format is refused on the first chunk.
+
+`StreamingUploadHandler` does the same for the import action without
+writing the file anywhere: the file is read from the request body as the
+importer consumes it.
+"""
+import hashlib
+import io
+import os
+import uuid
+from PIL import Image
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.http import QueryDict
+from django.http.multipartparser import FIELD, FILE, ChunkIter, \
+    LazyStream, Parser, exhaust
+from django.utils.datastructures import MultiValueDict
+from django.utils.encoding import force_text
+from rest_framework import exceptions, status
+from recipe.images import STAGING_DIR
+
+
+# Pillow formats accepted for recipe images
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+
+class UploadTooLarge(exceptions.APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Uploaded file is too large.'
+    default_code = 'too_large'
+
+
+class StagedUploadedFile(UploadedFile):
+    """An upload that was streamed to its staging file in storage"""
+
+    def __init__(self, file, staged_name, sha256, **kwargs):
+        super().__init__(file, **kwargs)
+        self.staged_name = staged_name
+        self.sha256 = sha256
+
+    def temporary_file_path(self):
+        return self.file.name
+
+    def close(self):
+        try:
+            return self.file.close()
+        except FileNotFoundError:
+            pass
+
+
+class StagingUploadHandler(FileUploadHandler):
+    """Stream the `image` file of a request into the staging directory
+
+    Other file fields are dropped unread.
+    """
+    accept_field = 'image'
+
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = max_size or settings.IMAGE_UPLOAD_MAX_SIZE
+        self.file = None
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        if content_length > self.max_size + self.chunk_size:
+            # the multipart framing is well under a chunk
+            raise UploadTooLarge()
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        if field_name != self.accept_field or self.file is not None:
+            self.active = False
+            return
+        self.active = True
+
+        ext = os.path.splitext(self.file_name)[1].lower()
+        self.staged_name = default_storage.get_available_name(
+            os.path.join(STAGING_DIR, f'{uuid.uuid4()}{ext}'))
+        path = default_storage.path(self.staged_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.file = open(path, 'w+b')
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.active:
+            return None
+
+        if start == 0:
+            self._sniff(raw_data)
+        self.size += len(raw_data)
+        if self.size > self.max_size:
+            self._discard()
+            raise UploadTooLarge()
+
+        self.sha256.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        if not self.active:
+            return None
+        self.active = False
+
+        self.file.flush()
+        self.file.seek(0)
+
+        return StagedUploadedFile(
+            file=self.file,
+            staged_name=self.staged_name,
+            sha256=self.sha256.hexdigest(),
+            name=self.file_name,
+            content_type=self.content_type,
+            size=file_size,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra)
+
+    def upload_interrupted(self):
+        if self.file is not None:
+            self._discard()
+
+    def _sniff(self, head):
+        """refuse <head> unless it starts an allowed, sane-sized image"""
+        if identify(head) is None:
+            self._discard()
+            raise exceptions.ValidationError({'image': [
+                'Upload a valid image. The file you uploaded was either not '
+                'an image or a corrupted image.'
+            ]})
+
+        try:
+            width, height = Image.open(io.BytesIO(head)).size
+        except Image.DecompressionBombError:
+            width = height = None
+        except Exception:
+            # header longer than the first chunk, verified once complete
+            return
+        if width is None or width * height > Image.MAX_IMAGE_PIXELS:
+            self._discard()
+            raise exceptions.ValidationError({'image': [
+                'Image dimensions are too large.'
+            ]})
+
+    def _discard(self):
+        self.file.close()
+        default_storage.delete(self.staged_name)
+        self.active = False
+
+
+class StreamingUploadHandler(FileUploadHandler):
+    """Hand over the `file` of a request unread, as a stream of the body
+
+    The form fields before the file are parsed as usual; parts after it
+    are never read. The file can only be read once, front to back.
+    """
+    accept_field = 'file'
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        encoding = encoding or settings.DEFAULT_CHARSET
+        post, files = QueryDict(mutable=True), MultiValueDict()
+        stream = LazyStream(ChunkIter(input_data, self.chunk_size))
+        for item_type, meta_data, field_stream in Parser(stream, boundary):
+            try:
+                disposition = meta_data['content-disposition'][1]
+                field_name = disposition['name'].strip()
+            except (KeyError, IndexError, AttributeError):
+                exhaust(field_stream)
+                continue
+            field_name = force_text(field_name, encoding, errors='replace')
+
+            if item_type == FIELD:
+                post.appendlist(field_name, force_text(
+                    field_stream.read(settings.DATA_UPLOAD_MAX_MEMORY_SIZE),
+                    encoding, errors='replace'))
+            elif (item_type == FILE and field_name == self.accept_field and
+                    disposition.get('filename')):
+                content_type, extra = meta_data.get(
+                    'content-type', ('', {}))
+                files[field_name] = UploadedFile(
+                    file=io.BufferedReader(_PartReader(field_stream)),
+                    name=os.path.basename(force_text(
+                        disposition['filename'], encoding,
+                        errors='replace')),
+                    content_type=content_type.strip(),
+                    charset=extra.get('charset'),
+                    content_type_extra=extra)
+                break
+            else:
+                exhaust(field_stream)
+
+        return post, files
+
+
+class _PartReader(io.RawIOBase):
+    """a raw binary file reading one part of a multipart stream"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.stream.read(len(buffer))
+        buffer[:len(data)] = data
+
+        return len(data)
+
+
+def identify(head):
+    """return the allowed Pillow format <head> starts with, or None"""
+    Image.init()
+    for fmt in ALLOWED_FORMATS:
+        factory, accept = Image.OPEN[fmt]
+        if accept is not None and accept(head):
+            return fmt
+
+    return None
+
+
+def discard(files):
+    """delete the staging files of uploads that will not be processed"""
+    for upload in files.values():
+        if isinstance(upload, StagedUploadedFile):
+            upload.close()
+            default_storage.delete(upload.staged_name)
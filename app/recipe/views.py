@@ -1,78 +1,291 @@
+from decimal import Decimal, InvalidOperation
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet, ModelViewSet
 from rest_framework.mixins import ListModelMixin, CreateModelMixin
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from django.db.models import Count, Exists, F, OuterRef, Prefetch
+from django.http import StreamingHttpResponse
 from core.models import Tag, Ingredient
-from recipe import serializers
+from core.renderers import FastJSONRenderer
+from recipe import bulk, export, id_arrays, images, importer, search, \
+                   serializers, uploads
+from recipe.mixins import CachedListMixin, ConditionalGetMixin, \
+                          ValuesListMixin
+from recipe.pagination import KeysetPagination
+from user.authentication import CachingTokenAuthentication
 from core.models import Recipe
 
 
-class RecipeAttributeViewSet(GenericViewSet, ListModelMixin,
-                             CreateModelMixin):
+class RecipeAttributeViewSet(CachedListMixin, ConditionalGetMixin,
+                             ValuesListMixin, GenericViewSet,
+                             ListModelMixin, CreateModelMixin):
     "Viewset for reciple attributes e.g. tags & ingredients"
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachingTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+    ordering = ('-name', 'id')
+
+    def _flag(self, name):
+        """read a 0/1 query parameter"""
+        try:
+            return bool(int(self.request.query_params.get(name, 0)))
+        except ValueError:
+            raise ValidationError({name: 'expected 0 or 1'})
 
     def get_queryset(self):
         """return objects for the current authenticated user"""
-        assigned_only = bool(
-            int(self.request.query_params.get('assigned_only', 0))
-        )
+        assigned_only = self._flag('assigned_only')
+        queryset = self.queryset.filter(user=self.request.user)
 
-        queryset = self.queryset
-        if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+        if self._flag('with_counts'):
+            queryset = queryset.annotate(recipe_count=Count('recipe'))
+            if assigned_only:
+                queryset = queryset.filter(recipe_count__gt=0)
+        elif assigned_only:
+            field = Recipe._meta.get_field(self.recipe_relation)
+            links = field.remote_field.through.objects.filter(**{
+                field.m2m_reverse_field_name(): OuterRef('pk')
+            })
+            queryset = queryset.annotate(
+                assigned=Exists(links)
+            ).filter(assigned=True)
 
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('-name').distinct()
+        return queryset.order_by(*self.ordering)
+
+    def get_serializer_class(self):
+        """return serializer class"""
+        if self.action == 'list' and self._flag('with_counts'):
+            return self.count_serializer_class
+        elif self.action == 'ensure':
+            return serializers.EnsureNamesSerializer
+
+        return self.serializer_class
 
     def perform_create(self, serializer):
         """create new Attribute object"""
         serializer.save(user=self.request.user)
 
+    @action(methods=['POST'], detail=False)
+    def ensure(self, request):
+        """return the objects named in `names`, creating the missing ones
+
+        Names match existing objects regardless of case; the response
+        lists an object per distinct name, in the order given.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        names = list(dict.fromkeys(serializer.validated_data['names']))
+        objects = bulk.ensure_names(
+            self.queryset.model, request.user, names)
+
+        return Response(self.serializer_class(
+            [objects[name] for name in names], many=True).data)
+
 
 class TagViewSet(RecipeAttributeViewSet):
     """Manage tags in the database"""
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
+    count_serializer_class = serializers.TagCountSerializer
+    recipe_relation = 'tags'
 
 
 class IngredientViewSet(RecipeAttributeViewSet):
     """Mange ingredients in database"""
     queryset = Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
+    count_serializer_class = serializers.IngredientCountSerializer
+    recipe_relation = 'ingredients'
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(CachedListMixin, ConditionalGetMixin, ValuesListMixin,
+                    ModelViewSet):
     """Manage recipes within the database"""
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachingTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+    ordering = ('-id',)
+    etag_related = ('tags', 'ingredients')
+    # ?ordering= values; each ends on id so keyset pagination stays stable
+    # and is served by the (user, <field>, id) indexes
+    orderings = {
+        'id': ('id',),
+        '-id': ('-id',),
+        'time_minutes': ('time_minutes', 'id'),
+        '-time_minutes': ('-time_minutes', '-id'),
+        'price': ('price', 'id'),
+        '-price': ('-price', '-id'),
+    }
+    # query parameter -> (lookup, parser)
+    range_filters = {
+        'min_time': ('time_minutes__gte', int),
+        'max_time': ('time_minutes__lte', int),
+        'min_price': ('price__gte', Decimal),
+        'max_price': ('price__lte', Decimal),
+    }
+    # actions taking ?fields= and ?expand=
+    sparse_actions = ('list', 'retrieve', 'export')
 
     def _params_to_ints(self, query_str):
         """convert list-like string of ints to list (of ints)"""
-        return [int(i) for i in query_str.split(',')]
+        try:
+            return [int(i) for i in query_str.split(',')]
+        except ValueError:
+            raise ValidationError(
+                {'detail': 'expected a comma separated list of ids'})
+
+    def _filter_ranges(self, queryset):
+        """apply the min_/max_ time and price parameters"""
+        bounds = {}
+        for param, (lookup, parse) in self.range_filters.items():
+            value = self.request.query_params.get(param)
+            if value is None:
+                continue
+            try:
+                bounds[lookup] = parse(value)
+            except (ValueError, InvalidOperation):
+                raise ValidationError({param: 'expected a number'})
+            if parse is Decimal and not bounds[lookup].is_finite():
+                raise ValidationError({param: 'expected a number'})
+
+        return queryset.filter(**bounds)
+
+    def _get_ordering(self, default):
+        """the allow-listed ?ordering=, or <default>"""
+        name = self.request.query_params.get('ordering')
+        if name is None:
+            return default
+        if name not in self.orderings:
+            raise ValidationError({'ordering': 'expected one of: {}'.format(
+                ', '.join(self.orderings))})
+
+        return self.orderings[name]
+
+    def _filter_related(self, queryset, relation, ids, match):
+        """keep recipes linked to any/all of <ids> through <relation>
+
+        Matches are found in the recipes' id arrays when they are enabled,
+        else with a semi-join on the m2m table, so a recipe linked to
+        several of the ids is still returned only once.
+        """
+        if id_arrays.is_enabled():
+            return id_arrays.filter_related(queryset, relation, ids, match)
+
+        field = Recipe._meta.get_field(relation)
+        recipe, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+        ids = set(ids)
+        links = field.remote_field.through.objects.filter(
+            **{f'{target}__in': ids})
+
+        if match == 'all':
+            links = links.values(recipe).annotate(
+                matched=Count(target)
+            ).filter(matched=len(ids))
+
+        return queryset.filter(pk__in=links.values(recipe))
+
+    def _related_pks(self, model, relation):
+        """read the id arrays rather than the m2m tables when enabled"""
+        if id_arrays.is_enabled():
+            return F(id_arrays.COLUMNS[relation])
+
+        return super()._related_pks(model, relation)
+
+    def _list_related(self):
+        """the relations nested by ?expand="""
+        return sorted(self._sparse_fields()[1])
+
+    def _sparse_fields(self):
+        """the validated ?fields= and ?expand= of the request
+
+        Returns (fields, expand): the fields to render, None for all of
+        them, and the relations to render nested. Details always nest
+        both relations.
+        """
+        params = self.request.query_params
+        available = self.serializer_class.Meta.fields
+        expandable = tuple(self.serializer_class.expandable)
+
+        fields = None
+        if params.get('fields'):
+            fields = self._params_to_names('fields', available)
+        expand = set(expandable) if self.action == 'retrieve' else set()
+        if params.get('expand'):
+            expand.update(self._params_to_names('expand', expandable))
+
+        return fields, expand
+
+    def _params_to_names(self, param, allowed):
+        """convert a comma separated parameter to a list of <allowed>"""
+        names = [
+            name.strip()
+            for name in self.request.query_params[param].split(',')
+        ]
+        unknown = [name for name in names if name not in allowed]
+        if unknown:
+            raise ValidationError({param: 'expected some of: {}'.format(
+                ', '.join(allowed))})
+
+        return names
+
+    def _only_rendered(self, queryset, ordering):
+        """fetch only the columns and relations the response renders"""
+        if self.action not in self.sparse_actions:
+            return queryset
+
+        fields, expand = self._sparse_fields()
+        fields = fields or self.serializer_class.Meta.fields
+        # keyset pagination reads the ordering values off the last row
+        columns = {field.lstrip('-') for field in ordering} | set(fields)
+        queryset = queryset.only(*columns.intersection(
+            field.name for field in Recipe._meta.concrete_fields))
+
+        return queryset.prefetch_related(*(
+            Prefetch(relation, queryset=model.objects.only(
+                *(('id', 'name') if relation in expand else ('id',))
+            ).order_by('id'))
+            for relation, model in (('tags', Tag),
+                                    ('ingredients', Ingredient))
+            if relation in fields
+        ))
 
     def get_queryset(self):
         """get recipes for authenticated user"""
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        match = self.request.query_params.get('match', 'any')
         queryset = self.queryset
 
+        if match not in ('any', 'all'):
+            raise ValidationError({'match': 'expected one of: any, all'})
+
         if tags:
             tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = self._filter_related(queryset, 'tags', tag_ids, match)
 
         if ingredients:
             ingred_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingred_ids)
+            queryset = self._filter_related(
+                queryset, 'ingredients', ingred_ids, match)
+
+        queryset = self._filter_ranges(queryset)
 
-        return queryset.filter(user=self.request.user)
+        ordering = self.ordering
+        text = self.request.query_params.get('search', '').strip()
+        if text:
+            queryset, ordering = search.search(queryset, text)
+
+        ordering = self._get_ordering(ordering)
+        queryset = self._only_rendered(queryset, ordering)
+
+        return queryset.filter(
+            user=self.request.user
+        ).order_by(*ordering)
 
     def get_serializer_class(self):
         """return serializer class"""
@@ -80,24 +293,129 @@ class RecipeViewSet(ModelViewSet):
             return serializers.RecipeDetailSerializer
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
+        elif self.action == 'bulk':
+            return {
+                'POST': serializers.RecipeBulkSerializer,
+                'PATCH': serializers.RecipeBulkUpdateSerializer,
+                'DELETE': serializers.RecipeBulkDeleteSerializer,
+            }[self.request.method]
         else:
             return self.serializer_class
 
+    def get_serializer(self, *args, **kwargs):
+        """render only the requested fields of list/retrieve/export"""
+        if self.action in self.sparse_actions:
+            kwargs['fields'], kwargs['expand'] = self._sparse_fields()
+
+        return super().get_serializer(*args, **kwargs)
+
     def perform_create(self, serializer):
         """create a new recipe"""
         serializer.save(user=self.request.user)
 
+    @action(methods=['POST', 'PATCH', 'DELETE'], detail=False)
+    def bulk(self, request):
+        """create, update or delete many recipes in one request"""
+        if request.method == 'DELETE':
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            ids = serializer.validated_data['ids']
+            bulk.delete_recipes(request.user, ids)
+
+            return Response({'deleted': ids}, status=status.HTTP_200_OK)
+
+        serializer = self.get_serializer(
+            data=request.data,
+            many=True,
+            partial=request.method == 'PATCH')
+        serializer.is_valid(raise_exception=True)
+
+        if request.method == 'POST':
+            ids = bulk.create_recipes(request.user, serializer.validated_data)
+            return Response({'created': ids}, status=status.HTTP_201_CREATED)
+
+        ids = bulk.update_recipes(request.user, serializer.validated_data)
+        return Response({'updated': ids}, status=status.HTTP_200_OK)
+
+    @action(methods=['GET'], detail=False)
+    def export(self, request):
+        """stream all matching recipes as NDJSON, or CSV with ?output=csv
+
+        Takes the filters, ordering and ?fields= of the list; ?expand= is
+        for NDJSON only.
+        """
+        output = request.query_params.get('output', 'ndjson')
+        if output not in export.OUTPUTS:
+            raise ValidationError({'output': 'expected one of: {}'.format(
+                ', '.join(export.OUTPUTS))})
+        if output == 'csv' and request.query_params.get('expand'):
+            raise ValidationError({'expand': 'not available for CSV'})
+
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer()
+        names = [name for name, field in serializer.fields.items()
+                 if not field.write_only]
+        content_type, extension, write = export.OUTPUTS[output]
+        readers = self._value_readers(serializer)
+        chunks = export.records(
+            queryset, serializer, readers,
+            readers and self._related_values(queryset.model, readers))
+
+        response = StreamingHttpResponse(
+            write(chunks, names), content_type=content_type)
+        response['Content-Disposition'] = \
+            f'attachment; filename="recipes.{extension}"'
+
+        return response
+
+    @action(methods=['POST'], detail=False, url_path='import',
+            url_name='import')
+    def import_recipes(self, request):
+        """create recipes from an uploaded NDJSON or CSV `file`
+
+        Responds with a stream of NDJSON progress lines, one per batch
+        written; ?skip=<records> resumes an interrupted import.
+        """
+        # read the file off the request; must be set before request.FILES
+        request.upload_handlers = [uploads.StreamingUploadHandler(request)]
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': 'No file was submitted.'})
+        kind = request.query_params.get('input') or \
+            importer.input_for(upload.name)
+        if kind not in importer.PARSERS:
+            raise ValidationError({'input': 'expected one of: {}'.format(
+                ', '.join(importer.PARSERS))})
+        try:
+            skip = int(request.query_params.get('skip', 0))
+            if skip < 0:
+                raise ValueError(skip)
+        except ValueError:
+            raise ValidationError({'skip': 'expected a number of records'})
+
+        progress = importer.import_recipes(
+            request.user, importer.PARSERS[kind](upload), skip)
+        renderer = FastJSONRenderer()
+
+        return StreamingHttpResponse(
+            (renderer.render_lines([step]) for step in progress),
+            content_type='application/x-ndjson')
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
-        """upload image for a recipe"""
+        """upload image for a recipe, resized off the request"""
         recipe = self.get_object()
+        # stream the file to staging; must be set before request.data
+        request.upload_handlers = [uploads.StagingUploadHandler(request)]
         serializer = self.get_serializer(recipe, data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            images.submit(recipe, serializer.validated_data['image'])
+            recipe.refresh_from_db()
             return Response(
-                serializer.data,
+                self.get_serializer(recipe).data,
                 status=status.HTTP_200_OK)
 
+        uploads.discard(request.FILES)
         return Response(
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST)
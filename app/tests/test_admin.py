@@ -1,6 +1,9 @@
+import threading
+from unittest import mock
 from django.test import TestCase, Client
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from user import passwords
 
 
 class AdminSiteTests(TestCase):
@@ -40,3 +43,14 @@ class AdminSiteTests(TestCase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
+
+    def test_login_when_hashing_pool_is_full(self):
+        """test a busy hashing pool fails the admin login without a 500"""
+        client = Client()
+        with mock.patch.object(passwords, '_get_pool', return_value=(
+                None, threading.Semaphore(0))):
+            res = client.post(reverse('admin:login'), {
+                'username': 'admin@gmail.com', 'password': 'password'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('_auth_user_id', client.session)
@@ -1,7 +1,17 @@
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
 from unittest.mock import patch
-from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from core.models import ImageBlob, Recipe
+from recipe.images import STAGING_DIR, blob_name
 
 
 class CommandTests(TestCase):
@@ -22,3 +32,162 @@ class CommandTests(TestCase):
             gi.side_effect = [OperationalError] * 5 + [True]
             call_command('wait_for_db')
             self.assertEqual(gi.call_count, 6)
+
+    def test_benchmark_indexes(self):
+        """test the index benchmark explains queries with and without"""
+        out = StringIO()
+        call_command('benchmark', 'indexes', recipes=[20], stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('(with indexes)', output)
+        self.assertIn('(without indexes)', output)
+        self.assertIn('Execution Time', output)
+
+    def test_benchmark_filters(self):
+        """test the filter benchmark times every match mode"""
+        out = StringIO()
+        call_command('benchmark', 'filters', recipes=[20], stdout=out)
+
+        output = out.getvalue()
+        for case in ('chained joins', 'match=any', 'match=all'):
+            self.assertIn(case, output)
+
+
+class CollectImageBlobsTests(TestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = get_user_model().objects.create_user(
+            'blobs@email.com', 'blobpass')
+
+    def blob(self, digest, ref_count, age=7200):
+        """create a blob with one rendition file, <age> seconds old"""
+        name = self.file(blob_name(digest, 'thumbnail', 'jpg'), age)
+        blob = ImageBlob.objects.create(
+            sha256=digest, size=1, ref_count=ref_count,
+            renditions={'thumbnail': {'jpeg': name}})
+        ImageBlob.objects.filter(pk=blob.pk).update(
+            created_at=timezone.now() - timedelta(seconds=age))
+
+        return blob
+
+    def file(self, name, age=7200):
+        """write a file at <name> with an mtime <age> seconds ago"""
+        name = default_storage.save(name, ContentFile(b'x'))
+        mtime = (timezone.now() - timedelta(seconds=age)).timestamp()
+        os.utime(default_storage.path(name), (mtime, mtime))
+
+        return name
+
+    def test_collect_image_blobs(self):
+        """test only unreferenced, old blobs and files are deleted"""
+        live = self.blob('a' * 64, ref_count=1)
+        dead = self.blob('b' * 64, ref_count=0)
+        fresh = self.blob('c' * 64, ref_count=0, age=10)
+        orphan = self.file(blob_name('d' * 64, 'medium', 'jpg'))
+        stale = self.file(os.path.join(STAGING_DIR, 'stale.jpg'))
+        waiting = self.file(os.path.join(STAGING_DIR, 'waiting.jpg'))
+        Recipe.objects.create(
+            user=self.user, title='Toast', time_minutes=2, price=1,
+            staged_image=waiting)
+
+        out = StringIO()
+        call_command('collect_image_blobs', batch_size=1, stdout=out)
+
+        self.assertEqual(
+            set(ImageBlob.objects.values_list('pk', flat=True)),
+            {live.pk, fresh.pk})
+        for blob, exists in ((live, True), (dead, False), (fresh, True)):
+            name = blob.renditions['thumbnail']['jpeg']
+            self.assertEqual(default_storage.exists(name), exists)
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertFalse(default_storage.exists(stale))
+        self.assertTrue(default_storage.exists(waiting))
+        self.assertIn('deleted 1 blobs', out.getvalue())
+
+    def test_collect_image_blobs_deletes_files_first(self):
+        """test blob files are gone before the blob row is deleted"""
+        dead = self.blob('b' * 64, ref_count=0)
+        delete = default_storage.delete
+        row_present = []
+
+        def record(name):
+            row_present.append(
+                ImageBlob.objects.filter(pk=dead.pk).exists())
+            delete(name)
+
+        with patch.object(default_storage, 'delete', side_effect=record):
+            call_command('collect_image_blobs', stdout=StringIO())
+
+        self.assertTrue(row_present)
+        self.assertTrue(all(row_present))
+        self.assertFalse(ImageBlob.objects.filter(pk=dead.pk).exists())
+
+    def test_collect_image_blobs_dry_run(self):
+        """test a dry run reports without deleting"""
+        dead = self.blob('b' * 64, ref_count=0)
+
+        out = StringIO()
+        call_command('collect_image_blobs', dry_run=True, stdout=out)
+
+        self.assertTrue(ImageBlob.objects.filter(pk=dead.pk).exists())
+        self.assertTrue(default_storage.exists(
+            dead.renditions['thumbnail']['jpeg']))
+        self.assertIn('would delete 1 blobs', out.getvalue())
+
+
+class ImportRecipesTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'import@email.com', 'importpass')
+
+    def write(self, content, suffix):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w') as stream:
+            stream.write(content)
+        self.addCleanup(os.remove, path)
+
+        return path
+
+    def test_import_recipes(self):
+        """test a CSV file is imported in batches, reporting progress"""
+        path = self.write(
+            'title,time_minutes,price,tags\n'
+            'Salad,5,3.50,Vegan;Quick\n'
+            'Soup,,4.00,Quick\n'
+            'Toast,2,1.00,\n', '.csv')
+        out, err = StringIO(), StringIO()
+
+        call_command('import_recipes', path, user='import@email.com',
+                     batch_size=2, stdout=out, stderr=err)
+
+        self.assertIn('2 records read, 1 recipes created, 1 invalid',
+                      out.getvalue())
+        self.assertIn('3 records read, 2 recipes created', out.getvalue())
+        self.assertIn('record 2: {"time_minutes"', err.getvalue())
+        self.assertEqual(
+            sorted(Recipe.objects.filter(user=self.user).values_list(
+                'title', flat=True)),
+            ['Salad', 'Toast'])
+
+    def test_import_recipes_resume(self):
+        path = self.write(
+            '{"title": "One", "time_minutes": 1, "price": "1.00"}\n'
+            '{"title": "Two", "time_minutes": 2, "price": "2.00"}\n',
+            '.ndjson')
+
+        call_command('import_recipes', path, user='import@email.com',
+                     skip=1, stdout=StringIO())
+
+        self.assertEqual(
+            list(Recipe.objects.values_list('title', flat=True)), ['Two'])
+
+    def test_import_recipes_unknown_user(self):
+        with self.assertRaises(CommandError):
+            call_command('import_recipes', '-', user='nobody@email.com')
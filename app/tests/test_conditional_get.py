@@ -0,0 +1,151 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Recipe, Tag
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def detail_url(recipe_id):
+    """return recipe detail url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def sample_recipe(user, **params):
+    """create and return a sample recipe"""
+    defaults = {'title': 'Pho', 'time_minutes': 45, 'price': 12.00}
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class ConditionalGetTests(TestCase):
+    """test ETag / If-None-Match handling on the recipe endpoints"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'etag@email.com',
+            'etagpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertNotModified(self, url, etag, params=None):
+        with self.assertNumQueries(1):
+            res = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+        self.assertEqual(res['ETag'], etag)
+
+    def test_list_not_modified(self):
+        """test an unchanged recipe list answers 304 in one query"""
+        sample_recipe(user=self.user)
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotModified(RECIPE_URL, res['ETag'])
+
+    def test_list_etag_changes_on_update(self):
+        """test editing or deleting a recipe changes the list ETag"""
+        recipe = sample_recipe(user=self.user)
+        sample_recipe(user=self.user, title='Banh Mi')
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        recipe.title = 'Bun Cha'
+        recipe.save()
+        updated = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(updated.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(updated['ETag'], etag)
+
+        recipe.delete()
+        deleted = self.client.get(
+            RECIPE_URL, HTTP_IF_NONE_MATCH=updated['ETag'])
+        self.assertEqual(deleted.status_code, status.HTTP_200_OK)
+
+    def test_list_etag_changes_on_link(self):
+        """test linking a tag changes the recipe and tag list ETags"""
+        recipe = sample_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Soup')
+        params = {'assigned_only': 1}
+        recipe_etag = self.client.get(RECIPE_URL)['ETag']
+        tag_etag = self.client.get(TAGS_URL, params)['ETag']
+
+        recipe.tags.add(tag)
+
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=recipe_etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['tags'], [tag.id])
+        res = self.client.get(TAGS_URL, params, HTTP_IF_NONE_MATCH=tag_etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+
+    def test_expanded_list_etag_changes_on_tag_rename(self):
+        """test renaming a nested tag changes the ?expand= list ETag"""
+        recipe = sample_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Soup')
+        recipe.tags.add(tag)
+        params = {'expand': 'tags'}
+        etag = self.client.get(RECIPE_URL, params)['ETag']
+
+        tag.name = 'Broth'
+        tag.save()
+
+        res = self.client.get(RECIPE_URL, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['tags'][0]['name'], 'Broth')
+
+    def test_tag_list_not_modified(self):
+        """test an unchanged tag list answers 304"""
+        Tag.objects.create(user=self.user, name='Soup')
+        res = self.client.get(TAGS_URL)
+
+        self.assertNotModified(TAGS_URL, res['ETag'])
+
+    def test_detail_not_modified(self):
+        """test recipe detail answers 304 until a nested tag changes"""
+        recipe = sample_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Soup')
+        recipe.tags.add(tag)
+        url = detail_url(recipe.id)
+        etag = self.client.get(url)['ETag']
+
+        self.assertNotModified(url, etag)
+
+        tag.name = 'Noodle Soup'
+        tag.save()
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['name'], 'Noodle Soup')
+
+    def test_detail_missing_recipe(self):
+        """test a conditional request for a missing recipe is a 404"""
+        res = self.client.get(detail_url(999999), HTTP_IF_NONE_MATCH='"x"')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CachedConditionalGetTests(TestCase):
+    """test conditional requests answered from the response cache"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'cached-etag@email.com',
+            'etagpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_cached_list_not_modified(self):
+        """test a cached list answers 304 without any query"""
+        sample_recipe(user=self.user)
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        with self.assertNumQueries(0):
+            res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
@@ -0,0 +1,120 @@
+import time
+from unittest.mock import patch
+from django.db import connection
+from django.db.utils import OperationalError
+from django.test import TestCase
+from core.db.postgresql import base
+
+
+class DatabaseBackendTests(TestCase):
+    """test connection pooling and health checks of core.db.postgresql"""
+
+    def tearDown(self):
+        base.close_pools()
+
+    def wrapper(self, **settings):
+        """a connection handle of its own, as another thread would have"""
+        return base.DatabaseWrapper(
+            dict(connection.settings_dict, **settings), alias='backend')
+
+    def request(self, wrapper):
+        """the backend pid that serves a request through <wrapper>"""
+        wrapper.close_if_unusable_or_obsolete()
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            pid = cursor.fetchone()[0]
+        wrapper.close_if_unusable_or_obsolete()
+
+        return pid
+
+    def terminate(self, pid):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [pid])
+            # the backend exits once it handles the signal
+            while True:
+                cursor.execute('SELECT pg_stat_clear_snapshot()')
+                cursor.execute(
+                    'SELECT 1 FROM pg_stat_activity WHERE pid = %s', [pid])
+                if cursor.fetchone() is None:
+                    break
+                time.sleep(0.01)
+
+    def statement_timeout(self, wrapper):
+        with wrapper.cursor() as cursor:
+            cursor.execute('SHOW statement_timeout')
+            return cursor.fetchone()[0]
+
+    def test_statement_timeout(self):
+        """test only connections serving requests get the timeout"""
+        wrapper = self.wrapper(STATEMENT_TIMEOUT=1500)
+        self.assertEqual(self.statement_timeout(wrapper), '0')
+        wrapper.close()
+
+        with patch.object(base, '_serving', True):
+            self.assertEqual(self.statement_timeout(wrapper), '1500ms')
+        wrapper.close()
+
+    def test_pool_reuses_connections(self):
+        wrapper = self.wrapper(POOL_SIZE=1, CONN_MAX_AGE=0)
+
+        pid = self.request(wrapper)
+
+        self.assertIsNone(wrapper.connection)
+        self.assertEqual(self.request(wrapper), pid)
+        self.assertEqual(self.request(self.wrapper(
+            POOL_SIZE=1, CONN_MAX_AGE=0)), pid)
+
+    def test_pool_size(self):
+        """test connections beyond POOL_SIZE are closed on release"""
+        first, second = (
+            self.wrapper(POOL_SIZE=1, CONN_MAX_AGE=0) for _ in range(2))
+        first.ensure_connection()
+        second.ensure_connection()
+        raw = second.connection
+
+        first.close()
+        second.close()
+
+        self.assertTrue(raw.closed)
+        self.assertEqual(len(first.pool.idle), 1)
+
+    def test_pool_rolls_back_on_release(self):
+        wrapper = self.wrapper(POOL_SIZE=1, CONN_MAX_AGE=0)
+        wrapper.set_autocommit(False)
+        with wrapper.cursor() as cursor:
+            cursor.execute('CREATE TEMPORARY TABLE pooled (id integer)')
+
+        wrapper.close()
+        wrapper.ensure_connection()
+
+        with wrapper.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('pooled')")
+            self.assertIsNone(cursor.fetchone()[0])
+        wrapper.close()
+
+    def test_pool_replaces_dropped_connections(self):
+        wrapper = self.wrapper(POOL_SIZE=1, CONN_MAX_AGE=0)
+        pid = self.request(wrapper)
+
+        self.terminate(pid)
+
+        self.assertNotEqual(self.request(wrapper), pid)
+
+    def test_health_check(self):
+        """test a persistent connection dropped between requests"""
+        wrapper = self.wrapper(CONN_MAX_AGE=None, HEALTH_CHECKS=True)
+        pid = self.request(wrapper)
+        self.assertEqual(self.request(wrapper), pid)
+
+        self.terminate(pid)
+
+        self.assertNotEqual(self.request(wrapper), pid)
+        wrapper.close()
+
+    def test_without_health_check(self):
+        wrapper = self.wrapper(CONN_MAX_AGE=None, HEALTH_CHECKS=False)
+        self.terminate(self.request(wrapper))
+
+        with self.assertRaises(OperationalError):
+            self.request(wrapper)
+        wrapper.close()
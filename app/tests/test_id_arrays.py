@@ -0,0 +1,158 @@
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Ingredient, Recipe, Tag
+from recipe import bulk
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class IdArraysTests(TestCase):
+    """test the denormalized tag/ingredient ids of recipes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'arrays@email.com',
+            'arrayspass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tags = [
+            Tag.objects.create(user=self.user, name=f'Tag {i}')
+            for i in range(4)
+        ]
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name='Salt')
+
+    def recipe(self, title='Recipe', **fields):
+        return Recipe.objects.create(
+            user=self.user, title=title, time_minutes=5, price='1.00',
+            **fields)
+
+    def assertArrays(self, recipe):
+        """test <recipe>'s arrays match its links"""
+        recipe.refresh_from_db()
+        self.assertEqual(
+            recipe.tag_ids,
+            sorted(recipe.tags.values_list('id', flat=True)))
+        self.assertEqual(
+            recipe.ingredient_ids,
+            sorted(recipe.ingredients.values_list('id', flat=True)))
+
+    def test_links_update_arrays(self):
+        recipe, other = self.recipe(), self.recipe('Other')
+
+        recipe.tags.add(self.tags[2], self.tags[0])
+        recipe.ingredients.add(self.ingredient)
+        self.assertArrays(recipe)
+        self.assertEqual(
+            recipe.tag_ids, [self.tags[0].id, self.tags[2].id])
+
+        recipe.tags.remove(self.tags[0])
+        self.tags[1].recipe_set.add(recipe, other)
+        self.assertArrays(recipe)
+        self.assertArrays(other)
+
+        self.tags[1].recipe_set.clear()
+        self.assertArrays(recipe)
+        self.assertArrays(other)
+
+        recipe.ingredients.clear()
+        self.tags[2].delete()
+        self.assertArrays(recipe)
+        self.assertEqual(recipe.tag_ids, [])
+
+    def test_save_keeps_arrays(self):
+        """test saving an instance loaded before a link change"""
+        recipe = self.recipe()
+        stale = Recipe.objects.get(pk=recipe.pk)
+        recipe.tags.add(self.tags[0])
+
+        stale.title = 'Renamed'
+        stale.save()
+
+        self.assertArrays(recipe)
+        self.assertEqual(recipe.tag_ids, [self.tags[0].id])
+
+    def test_bulk_writes(self):
+        ids = bulk.create_recipes(self.user, [
+            {'title': 'A', 'time_minutes': 1, 'price': '1.00',
+             'tags': [self.tags[3], self.tags[1], self.tags[3]]},
+            {'title': 'B', 'time_minutes': 2, 'price': '2.00',
+             'ingredients': [self.ingredient]},
+        ])
+        for recipe in Recipe.objects.filter(pk__in=ids):
+            self.assertArrays(recipe)
+
+        bulk.update_recipes(self.user, [
+            {'id': ids[0], 'tags': [self.tags[0]]},
+            {'id': ids[1], 'title': 'C'},
+        ])
+        for recipe in Recipe.objects.filter(pk__in=ids):
+            self.assertArrays(recipe)
+        self.assertEqual(
+            Recipe.objects.get(pk=ids[1]).ingredient_ids,
+            [self.ingredient.id])
+
+    def test_filters_match_m2m_tables(self):
+        """test containment filters return what the m2m joins do"""
+        for i in range(4):
+            recipe = self.recipe(f'Recipe {i}')
+            recipe.tags.add(*self.tags[i % 3:i + 1])
+            if i % 2:
+                recipe.ingredients.add(self.ingredient)
+        tags = f'{self.tags[0].id},{self.tags[1].id}'
+
+        for params in (
+                {'tags': tags},
+                {'tags': tags, 'match': 'all'},
+                {'tags': str(self.tags[2].id),
+                 'ingredients': str(self.ingredient.id)},
+                {'tags': tags, 'ingredients': str(self.ingredient.id),
+                 'match': 'all'},
+        ):
+            res = self.client.get(RECIPE_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            with override_settings(RECIPE_ID_ARRAYS=False):
+                expected = self.client.get(RECIPE_URL, params)
+            self.assertEqual(res.content, expected.content, params)
+
+    def test_list_reads_arrays(self):
+        """test lists read the arrays, not the m2m tables"""
+        recipe = self.recipe()
+        recipe.tags.add(self.tags[0])
+        Recipe.objects.filter(pk=recipe.pk).update(tag_ids=[123])
+
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data[0]['tags'], [123])
+        content = b''.join(self.client.get(EXPORT_URL).streaming_content)
+        self.assertIn(b'"tags":[123]', content)
+
+        with override_settings(RECIPE_ID_ARRAYS=False):
+            res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data[0]['tags'], [self.tags[0].id])
+
+    def test_repair_command(self):
+        recipes = [self.recipe(f'Recipe {i}') for i in range(3)]
+        for recipe in recipes:
+            recipe.tags.add(self.tags[0])
+        drifted = Recipe.objects.filter(pk__in=[recipes[0].pk, recipes[2].pk])
+        drifted.update(tag_ids=[], ingredient_ids=[self.ingredient.id])
+
+        out = StringIO()
+        call_command(
+            'repair_recipe_id_arrays', '--dry-run', stdout=out)
+        self.assertIn('would repair 2 of 3 recipes', out.getvalue())
+        self.assertEqual(drifted.filter(tag_ids=[]).count(), 2)
+
+        call_command(
+            'repair_recipe_id_arrays', '--batch-size', '2', stdout=out)
+        self.assertIn('repaired 2 of 3 recipes', out.getvalue())
+        for recipe in recipes:
+            self.assertArrays(recipe)
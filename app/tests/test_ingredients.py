@@ -127,3 +127,41 @@ class PrivateIngredientApiTest(TestCase):
         res = self.client.get(INGREDIENT_URL, {'assigned_only': 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_retrieve_ingredients_with_counts(self):
+        """test listing ingredients with their recipe counts"""
+        eggs = Ingredient.objects.create(name='Eggs', user=self.user)
+        Ingredient.objects.create(name='Cheese', user=self.user)
+        for title in ('Omelette', 'Frittata'):
+            recipe = Recipe.objects.create(
+                title=title,
+                time_minutes=10,
+                price=4.00,
+                user=self.user)
+            recipe.ingredients.add(eggs)
+
+        # one for the ETag fingerprint, one for the counted listing
+        with self.assertNumQueries(2):
+            res = self.client.get(INGREDIENT_URL, {'with_counts': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        counts = {item['name']: item['recipe_count'] for item in res.data}
+        self.assertEqual(counts, {'Eggs': 2, 'Cheese': 0})
+
+        res = self.client.get(
+            INGREDIENT_URL, {'with_counts': 1, 'assigned_only': 1})
+        self.assertEqual(
+            res.data, [{'id': eggs.id, 'name': 'Eggs', 'recipe_count': 2}])
+
+    def test_ensure_ingredients(self):
+        """test the ensure endpoint reuses and creates ingredients"""
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+
+        res = self.client.post(
+            reverse('recipe:ingredient-ensure'),
+            {'names': ['salt', 'Pepper']}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0], {'id': salt.id, 'name': 'Salt'})
+        self.assertTrue(Ingredient.objects.filter(
+            user=self.user, name='Pepper').exists())
@@ -0,0 +1,130 @@
+import os
+import tempfile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from recipe.images import blob_name
+
+
+CONTENT = bytes(range(256)) * 40
+
+
+def media_url(path):
+    return reverse('media', args=[path])
+
+
+class MediaServingTests(TestCase):
+    """test serving files from MEDIA_ROOT"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.path = 'uploads/recipe/photo.jpg'
+        self.blob_path = blob_name('ab' * 32, 'medium', 'webp')
+        for path in (self.path, self.blob_path):
+            full_path = os.path.join(media.name, path)
+            os.makedirs(os.path.dirname(full_path))
+            with open(full_path, 'wb') as fh:
+                fh.write(CONTENT)
+
+    def get(self, path, **headers):
+        return self.client.get(media_url(path), **headers)
+
+    def test_serve_file(self):
+        """test a file is served with validators and caching headers"""
+        res = self.get(self.path)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+        self.assertEqual(res['Cache-Control'], 'public, max-age=3600')
+        self.assertIn('ETag', res)
+        self.assertIn('Last-Modified', res)
+
+    def test_blob_files_are_immutable(self):
+        """test content-addressed files are cached for a year"""
+        res = self.get(self.blob_path)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Type'], 'image/webp')
+        self.assertEqual(
+            res['Cache-Control'], 'public, max-age=31536000, immutable')
+
+    def test_paths_through_blob_dir_are_not_immutable(self):
+        """test the caching header follows the normalized path"""
+        res = self.get('uploads/blobs/../recipe/photo.jpg')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Cache-Control'], 'public, max-age=3600')
+
+    def test_conditional_requests(self):
+        """test unchanged files answer 304 Not Modified"""
+        res = self.get(self.path)
+
+        res = self.get(self.path, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, 304)
+        res = self.get(
+            self.path, HTTP_IF_MODIFIED_SINCE=res['Last-Modified'])
+        self.assertEqual(res.status_code, 304)
+        res = self.get(self.path, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(res.status_code, 200)
+
+    def test_range_requests(self):
+        """test single byte ranges are served as partial content"""
+        res = self.get(self.path, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT[100:200])
+        self.assertEqual(
+            res['Content-Range'], f'bytes 100-199/{len(CONTENT)}')
+        self.assertEqual(res['Content-Length'], '100')
+
+        res = self.get(self.path, HTTP_RANGE='bytes=-10')
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT[-10:])
+
+        res = self.get(self.path, HTTP_RANGE=f'bytes={len(CONTENT)}-')
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res['Content-Range'], f'bytes */{len(CONTENT)}')
+
+    def test_if_range_mismatch_sends_whole_file(self):
+        """test a stale If-Range ignores the Range header"""
+        res = self.get(
+            self.path, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT)
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect')
+    def test_x_accel_redirect(self):
+        """test nginx is handed the file instead of Django sending it"""
+        res = self.get(self.blob_path)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.content, b'')
+        self.assertEqual(
+            res['X-Accel-Redirect'], f'/protected-media/{self.blob_path}')
+        self.assertEqual(res['Content-Type'], 'image/webp')
+        self.assertIn('immutable', res['Cache-Control'])
+
+    @override_settings(MEDIA_SENDFILE='x-sendfile')
+    def test_x_sendfile(self):
+        """test apache/lighttpd get the absolute path of the file"""
+        res = self.get(self.path)
+
+        self.assertTrue(res['X-Sendfile'].endswith(self.path))
+
+    def test_missing_and_unsafe_paths(self):
+        """test only existing regular files under MEDIA_ROOT are served"""
+        for path in ('uploads/missing.jpg', 'uploads', '../etc/passwd'):
+            self.assertEqual(self.get(path).status_code, 404)
+
+    def test_only_safe_methods(self):
+        """test writes to media urls are refused"""
+        res = self.client.post(media_url(self.path))
+
+        self.assertEqual(res.status_code, 405)
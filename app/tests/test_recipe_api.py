@@ -1,12 +1,19 @@
+import base64
+import itertools
+import json
 import os
 import tempfile
+from unittest.mock import patch
 from PIL import Image
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
-from core.models import Recipe, Tag, Ingredient
+from core.models import ImageBlob, Recipe, Tag, Ingredient
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
 
 
@@ -101,6 +108,49 @@ class PrivateRecipeApiTest(TestCase):
         self.assertEqual(len(res.data), 1)
         self.assertEqual(res.data, serializer.data)
 
+    def test_recipes_keyset_pagination(self):
+        """test paging through recipes with a cursor"""
+        recipes = [
+            sample_recipe(user=self.user, title=f'Recipe {i}')
+            for i in range(5)
+        ]
+        expected = [recipe.id for recipe in reversed(recipes)]
+
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [item['id'] for item in res.data['results']]
+
+        while res.data['next']:
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.get(res.data['next'])
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertNotIn('OFFSET', ctx.captured_queries[0]['sql'])
+            ids += [item['id'] for item in res.data['results']]
+
+        self.assertEqual(ids, expected)
+
+    def test_recipes_invalid_cursor(self):
+        """test that a malformed cursor is rejected"""
+        res = self.client.get(RECIPE_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_recipes_tampered_cursor(self):
+        """test a cursor with values of the wrong type is rejected"""
+        sample_recipe(user=self.user)
+        for params, position in (
+                ({}, ['x']),
+                ({}, [None]),
+                ({}, [[1]]),
+                ({'ordering': 'price'}, ['cheap', 1]),
+        ):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps(position).encode('utf-8')).decode('ascii')
+            res = self.client.get(RECIPE_URL, dict(params, cursor=cursor))
+
+            self.assertEqual(
+                res.status_code, status.HTTP_404_NOT_FOUND, position)
+
     def test_view_recipe_detail(self):
         """test getting more detail about recipe"""
         recipe = sample_recipe(user=self.user)
@@ -114,6 +164,42 @@ class PrivateRecipeApiTest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
+    def test_list_recipes_constant_queries(self):
+        """test listing recipes does not query per recipe"""
+        # ETag fingerprint, recipes with their tag and ingredient ids
+        def populate(count):
+            for i in range(count):
+                recipe = sample_recipe(user=self.user, title=f'Recipe {i}')
+                recipe.tags.add(
+                    sample_tag(user=self.user, name=f'Tag {count}.{i}'))
+                recipe.ingredients.add(sample_ingredient(
+                    user=self.user, name=f'Ingr {count}.{i}'))
+
+        populate(1)
+        with self.assertNumQueries(2):
+            res = self.client.get(RECIPE_URL)
+        self.assertEqual(len(res.data), 1)
+
+        populate(10)
+        with self.assertNumQueries(2):
+            res = self.client.get(RECIPE_URL)
+        self.assertEqual(len(res.data), 11)
+
+    def test_view_recipe_detail_constant_queries(self):
+        """test recipe detail prefetches nested tags and ingredients"""
+        recipe = sample_recipe(user=self.user)
+        for i in range(5):
+            recipe.tags.add(sample_tag(user=self.user, name=f'Tag {i}'))
+            recipe.ingredients.add(
+                sample_ingredient(user=self.user, name=f'Ingr {i}'))
+
+        with self.assertNumQueries(4):
+            res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['tags']), 5)
+        self.assertEqual(len(res.data['ingredients']), 5)
+
     def test_create_basic_recipe(self):
         """test creating recipe"""
         payload = {
@@ -170,6 +256,57 @@ class PrivateRecipeApiTest(TestCase):
         self.assertIn(ingredient1, ingredients)
         self.assertIn(ingredient2, ingredients)
 
+    def test_create_recipe_resolves_ingredients_in_one_query(self):
+        """test submitted ingredient ids cost one query however many"""
+        def lookups(count):
+            ingredients = [
+                sample_ingredient(user=self.user, name=f'Spice {count}.{i}')
+                for i in range(count)
+            ]
+            payload = {
+                'title': 'Curry',
+                'ingredients': [ingredient.id for ingredient in ingredients],
+                'tags': [],
+                'time_minutes': 40,
+                'price': 8.00
+            }
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.post(RECIPE_URL, payload, format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+            return [query['sql'] for query in queries.captured_queries]
+
+        few, many = lookups(2), lookups(40)
+        self.assertEqual(len(few), len(many))
+        selects = [
+            sql for sql in many
+            if sql.startswith('SELECT') and '"core_ingredient"."id" IN' in sql
+        ]
+        self.assertEqual(len(selects), 1)
+
+    def test_create_recipe_with_unknown_ingredients(self):
+        """test other users' and missing ingredients are all reported"""
+        other = get_user_model().objects.create_user(
+            'other@email.com',
+            'otherpass')
+        foreign = sample_ingredient(user=other, name='Saffron')
+        own = sample_ingredient(user=self.user, name='Rice')
+
+        payload = {
+            'title': 'Paella',
+            'ingredients': [own.id, foreign.id, 9999],
+            'tags': [],
+            'time_minutes': 60,
+            'price': 12.00
+        }
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(res.data['ingredients']), 2)
+        self.assertIn(str(foreign.id), res.data['ingredients'][0])
+        self.assertIn('9999', res.data['ingredients'][1])
+        self.assertFalse(Recipe.objects.exists())
+
     def test_partial_recipe_update(self):
         """test updating a recipe with PATH"""
         recipe = sample_recipe(user=self.user)
@@ -204,6 +341,17 @@ class PrivateRecipeApiTest(TestCase):
         self.assertEqual(recipe.price, payload['price'])
 
 
+def exif_orientation(value):
+    """raw EXIF block holding only an orientation tag"""
+    return (
+        b'Exif\x00\x00MM\x00*\x00\x00\x00\x08'
+        b'\x00\x01\x01\x12\x00\x03\x00\x00\x00\x01' +
+        bytes([0, value, 0, 0]) +
+        b'\x00\x00\x00\x00'
+    )
+
+
+@override_settings(IMAGE_PROCESSING_MODE='sync')
 class RecipeImageUploadTest(TestCase):
     """Test class for image uploading"""
 
@@ -216,7 +364,14 @@ class RecipeImageUploadTest(TestCase):
         self.recipe = sample_recipe(user=self.user)
 
     def tearDown(self):
+        self.recipe.refresh_from_db()
         self.recipe.image.delete()
+        for blob in ImageBlob.objects.all():
+            for formats in blob.renditions.values():
+                for name in formats.values():
+                    default_storage.delete(name)
+        if self.recipe.staged_image:
+            default_storage.delete(self.recipe.staged_image)
 
     def test_upload_image_to_recipe(self):
         """test uploading image to recipe"""
@@ -239,6 +394,135 @@ class RecipeImageUploadTest(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_upload_image_renditions(self):
+        """test uploads are resized, made upright and stripped of EXIF"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            # stored sideways: orientation 6 means rotate 90 clockwise
+            img = Image.new('RGB', (3000, 1500))
+            img.save(ntf, format='JPEG', exif=exif_orientation(6))
+            ntf.seek(0)
+            res = self.client.post(url, {'image': ntf}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_READY)
+        self.assertEqual(
+            set(res.data['renditions']), {'thumbnail', 'medium', 'original'})
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.staged_image, '')
+        expected = {
+            'thumbnail': (160, 320),
+            'medium': (512, 1024),
+            'original': (1280, 2560),
+        }
+        for size, formats in self.recipe.renditions.items():
+            self.assertEqual(set(formats), {'jpeg', 'webp'})
+            for name in formats.values():
+                with default_storage.open(name) as fh:
+                    rendition = Image.open(fh)
+                    self.assertEqual(rendition.size, expected[size])
+                    self.assertNotIn('exif', rendition.info)
+
+    def test_upload_non_image_rejected(self):
+        """test content that is not an image is refused, nothing staged"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            ntf.write(b'not an image' * 10000)
+            ntf.seek(0)
+            res = self.client.post(url, {'image': ntf}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', res.data)
+        self.assertEqual(default_storage.listdir('uploads/staging')[1], [])
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=1024)
+    def test_upload_image_too_large(self):
+        """test uploads over the size limit are refused"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.effect_noise((256, 256), 64).convert('RGB').save(
+                ntf, format='JPEG')
+            ntf.seek(0)
+            res = self.client.post(url, {'image': ntf}, format='multipart')
+
+        self.assertEqual(
+            res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, '')
+
+    def upload(self, recipe, color):
+        """upload a plain <color> JPEG to <recipe>"""
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (40, 30), color).save(ntf, format='JPEG')
+            ntf.seek(0)
+            res = self.client.post(
+                image_upload_url(recipe.id), {'image': ntf},
+                format='multipart')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipe.refresh_from_db()
+
+        return res
+
+    def test_identical_uploads_share_a_blob(self):
+        """test re-uploaded bytes are attached without reprocessing"""
+        other = sample_recipe(user=self.user, title='Pizza')
+        self.upload(self.recipe, 'red')
+
+        with patch('recipe.images.write_renditions') as write:
+            res = self.upload(other, 'red')
+
+        write.assert_not_called()
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_READY)
+        blob = ImageBlob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(other.image_blob, blob)
+        self.assertEqual(other.renditions, self.recipe.renditions)
+        self.assertEqual(default_storage.listdir('uploads/staging')[1], [])
+
+    def test_reupload_releases_previous_blob(self):
+        """test replacing an image drops the old blob reference"""
+        self.upload(self.recipe, 'red')
+        red = self.recipe.image_blob
+        self.upload(self.recipe, 'blue')
+
+        red.refresh_from_db()
+        self.assertEqual(red.ref_count, 0)
+        self.assertEqual(self.recipe.image_blob.ref_count, 1)
+        self.assertIn(self.recipe.image_blob.sha256, self.recipe.image.name)
+
+    def test_deleting_recipes_releases_blobs(self):
+        """test single and bulk deletes drop their blob references"""
+        others = [sample_recipe(user=self.user) for _ in range(2)]
+        for recipe in [self.recipe] + others:
+            self.upload(recipe, 'green')
+        blob = self.recipe.image_blob
+
+        self.client.delete(detail_url(others[0].id))
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 2)
+
+        self.client.delete(
+            reverse('recipe:recipe-bulk'), {'ids': [others[1].id]},
+            format='json')
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+
+    @override_settings(IMAGE_PROCESSING_MODE='thread')
+    def test_upload_image_is_processed_after_commit(self):
+        """test the response does not wait for the renditions"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (10, 10)).save(ntf, format='JPEG')
+            ntf.seek(0)
+            res = self.client.post(url, {'image': ntf}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_PENDING)
+        self.assertEqual(res.data['renditions'], {})
+        self.recipe.refresh_from_db()
+        self.assertTrue(default_storage.exists(self.recipe.staged_image))
+
     def test_filtering_recipes_by_tags(self):
         """test getting recipes by tags"""
         recipe1 = sample_recipe(user=self.user, title='Chef Salad')
@@ -287,3 +571,334 @@ class RecipeImageUploadTest(TestCase):
         self.assertIn(serializer1.data, res.data)
         self.assertIn(serializer2.data, res.data)
         self.assertNotIn(serializer3.data, res.data)
+
+    def test_filtering_recipes_unique(self):
+        """test a recipe matching several filters is returned once"""
+        recipe = sample_recipe(user=self.user, title='Nachos')
+        tag1 = sample_tag(user=self.user, name='Snack')
+        tag2 = sample_tag(user=self.user, name='Mexican')
+        ingredient1 = sample_ingredient(user=self.user, name='Cheese')
+        ingredient2 = sample_ingredient(user=self.user, name='Chips')
+        recipe.tags.add(tag1, tag2)
+        recipe.ingredients.add(ingredient1, ingredient2)
+
+        res = self.client.get(RECIPE_URL, {
+            'tags': f'{tag1.id},{tag2.id}',
+            'ingredients': f'{ingredient1.id},{ingredient2.id}'
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in res.data], [recipe.id])
+
+    def test_filtering_recipes_match_all(self):
+        """test match=all only returns recipes with every tag"""
+        recipe1 = sample_recipe(user=self.user, title='Vegan Curry')
+        recipe2 = sample_recipe(user=self.user, title='Salad')
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Spicy')
+        recipe1.tags.add(tag1, tag2)
+        recipe2.tags.add(tag1)
+
+        res = self.client.get(
+            RECIPE_URL,
+            {'tags': f'{tag1.id},{tag2.id}', 'match': 'all'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in res.data], [recipe1.id])
+
+    def test_filtering_recipes_invalid_params(self):
+        """test malformed filter parameters are rejected"""
+        res = self.client.get(RECIPE_URL, {'tags': 'one,two'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(RECIPE_URL, {'tags': '1', 'match': 'some'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeSearchTest(TestCase):
+    """test searching recipes by title, tag and ingredient names"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'search@email.com',
+            'searchpass')
+        self.client.force_authenticate(self.user)
+
+    def search(self, text, **params):
+        res = self.client.get(RECIPE_URL, {'search': text, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return [item['id'] for item in res.data]
+
+    def test_search_ranks_title_matches_first(self):
+        """test title matches outrank tag and ingredient matches"""
+        by_ingredient = sample_recipe(user=self.user, title='Stir fry')
+        by_ingredient.ingredients.add(
+            sample_ingredient(user=self.user, name='Noodles'))
+        by_title = sample_recipe(user=self.user, title='Noodle soup')
+        by_tag = sample_recipe(user=self.user, title='Ramen')
+        by_tag.tags.add(sample_tag(user=self.user, name='noodle dishes'))
+        sample_recipe(user=self.user, title='Burger')
+
+        self.assertEqual(
+            self.search('noodle'),
+            [by_title.id, by_tag.id, by_ingredient.id])
+
+    def test_search_follows_changes(self):
+        """test renames, unlinks and deletes reach the search index"""
+        recipe = sample_recipe(user=self.user, title='Curry')
+        tag = sample_tag(user=self.user, name='Spicy')
+        recipe.tags.add(tag)
+        self.assertEqual(self.search('spicy'), [recipe.id])
+
+        tag.name = 'Mild'
+        tag.save()
+        self.assertEqual(self.search('spicy'), [])
+        self.assertEqual(self.search('mild'), [recipe.id])
+
+        recipe.tags.remove(tag)
+        self.assertEqual(self.search('mild'), [])
+        recipe.tags.add(tag)
+        tag.delete()
+        self.assertEqual(self.search('mild'), [])
+
+        recipe.title = 'Stew'
+        recipe.save()
+        self.assertEqual(self.search('curry'), [])
+        self.assertEqual(self.search('stew'), [recipe.id])
+
+    def test_search_bulk_created_recipes(self):
+        ingredient = sample_ingredient(user=self.user, name='Lentils')
+        res = self.client.post(reverse('recipe:recipe-bulk'), [
+            {'title': 'Dal', 'time_minutes': 30, 'price': '4.00',
+             'ingredients': [ingredient.id]},
+        ], format='json')
+
+        self.assertEqual(self.search('lentil'), res.data['created'])
+
+    def test_search_paginated(self):
+        """test ranked results page with the keyset cursor"""
+        recipes = [
+            sample_recipe(user=self.user, title=title)
+            for title in ('Pie', 'Pie pie', 'Pie pie pie')
+        ]
+
+        res = self.client.get(RECIPE_URL, {'search': 'pie', 'page_size': 2})
+        first = [item['id'] for item in res.data['results']]
+        res = self.client.get(res.data['next'])
+        second = [item['id'] for item in res.data['results']]
+
+        self.assertEqual(
+            first + second, [recipe.id for recipe in reversed(recipes)])
+        self.assertIsNone(res.data['next'])
+
+    def test_search_paginated_with_tied_ranks(self):
+        """test the id tiebreaker pages through results of equal rank"""
+        recipes = [
+            sample_recipe(user=self.user, title=f'Pie {i}')
+            for i in range(5)
+        ]
+
+        res = self.client.get(RECIPE_URL, {'search': 'pie', 'page_size': 2})
+        ids = [item['id'] for item in res.data['results']]
+        for _ in range(len(recipes)):
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+            ids += [item['id'] for item in res.data['results']]
+
+        self.assertIsNone(res.data['next'])
+        self.assertEqual(ids, [recipe.id for recipe in reversed(recipes)])
+
+    def test_search_limited_to_user(self):
+        other = get_user_model().objects.create_user(
+            'other@email.com', 'otherpass')
+        sample_recipe(user=other, title='Pizza')
+
+        self.assertEqual(self.search('pizza'), [])
+
+    @override_settings(RECIPE_SEARCH_MODE='ilike')
+    def test_search_ilike_fallback(self):
+        """test every word must appear in the title or a linked name"""
+        recipe1 = sample_recipe(user=self.user, title='Chicken Tikka')
+        recipe1.tags.add(sample_tag(user=self.user, name='Indian'))
+        recipe2 = sample_recipe(user=self.user, title='Chicken Soup')
+
+        self.assertEqual(self.search('chick'), [recipe2.id, recipe1.id])
+        self.assertEqual(self.search('chicken indian'), [recipe1.id])
+
+
+class RecipeRangeFilterTest(TestCase):
+    """test time/price range filters and ordering of recipes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'range@email.com',
+            'rangepass')
+        self.client.force_authenticate(self.user)
+        self.quick = sample_recipe(
+            user=self.user, title='Toast', time_minutes=5, price=1.50)
+        self.cheap = sample_recipe(
+            user=self.user, title='Rice', time_minutes=30, price=2.00)
+        self.slow = sample_recipe(
+            user=self.user, title='Roast', time_minutes=180, price=25.00)
+
+    def ids(self, params):
+        res = self.client.get(RECIPE_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return [item['id'] for item in res.data]
+
+    def plan(self, params):
+        """EXPLAIN the recipe list query the endpoint runs for <params>
+
+        Sequential scans and sorts are disabled, as they would win (or
+        tie) on a table this small; the plan shows which index the query
+        can use.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(RECIPE_URL, params)
+        # the other query is the unordered ETag fingerprint
+        sql = next(
+            query['sql'] for query in queries.captured_queries
+            if 'ORDER BY' in query['sql'])
+
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_sort = off')
+            cursor.execute(f'EXPLAIN {sql}')
+            lines = [row[0] for row in cursor.fetchall()]
+        # leave out the subplans collecting each recipe's tag and
+        # ingredient ids when the id arrays are disabled
+        return '\n'.join(itertools.takewhile(
+            lambda line: not line.lstrip().startswith('SubPlan'), lines))
+
+    def test_filter_time_and_price(self):
+        """test filtering by time and price bounds"""
+        self.assertEqual(
+            self.ids({'max_time': 30}), [self.cheap.id, self.quick.id])
+        self.assertEqual(
+            self.ids({'min_time': 30, 'max_price': '2.00'}), [self.cheap.id])
+        self.assertEqual(self.ids({'min_price': '2.01'}), [self.slow.id])
+
+    def test_ordering(self):
+        """test ordering by the allowed fields"""
+        self.assertEqual(
+            self.ids({'ordering': 'price'}),
+            [self.quick.id, self.cheap.id, self.slow.id])
+        self.assertEqual(
+            self.ids({'ordering': '-time_minutes'}),
+            [self.slow.id, self.cheap.id, self.quick.id])
+
+    def test_ordering_paginated_with_ties(self):
+        """test the id tiebreaker pages through equal prices"""
+        same = sample_recipe(
+            user=self.user, title='Toast 2', time_minutes=5, price=1.50)
+
+        res = self.client.get(
+            RECIPE_URL, {'ordering': 'price', 'page_size': 1})
+        ids = [item['id'] for item in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            ids += [item['id'] for item in res.data['results']]
+
+        self.assertEqual(
+            ids, [self.quick.id, same.id, self.cheap.id, self.slow.id])
+
+    def test_invalid_params(self):
+        """test malformed bounds and orderings outside the allow-list"""
+        for params in ({'min_time': 'soon'}, {'max_price': 'NaN'},
+                       {'min_price': '1e'}, {'ordering': 'title'}):
+            res = self.client.get(RECIPE_URL, params)
+            self.assertEqual(
+                res.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_time_range_uses_index(self):
+        """test a time range is read in order from the time index"""
+        plan = self.plan({'min_time': 10, 'max_time': 60,
+                          'ordering': 'time_minutes'})
+
+        self.assertIn('core_recipe_user_time_idx', plan)
+        self.assertNotIn('Sort', plan)
+
+    def test_price_range_uses_index(self):
+        """test a price range is read in order from the price index"""
+        plan = self.plan({'max_price': '10.00', 'ordering': '-price'})
+
+        self.assertIn('core_recipe_user_price_idx', plan)
+        self.assertNotIn('Sort', plan)
+
+
+class RecipeSparseFieldsTest(TestCase):
+    """test ?fields= and ?expand= on the recipe endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'sparse@email.com',
+            'sparsepass')
+        self.client.force_authenticate(self.user)
+        self.tag = sample_tag(user=self.user, name='Brunch')
+        self.ingredient = sample_ingredient(user=self.user, name='Eggs')
+        self.recipe = sample_recipe(user=self.user, title='Shakshuka')
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(self.ingredient)
+
+    def get(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return res, [query['sql'] for query in queries.captured_queries]
+
+    def test_list_fields(self):
+        """test only the requested columns and relations are fetched"""
+        res, queries = self.get(RECIPE_URL, {'fields': 'id,title'})
+
+        self.assertEqual(
+            res.data, [{'id': self.recipe.id, 'title': 'Shakshuka'}])
+        recipe_query = next(sql for sql in queries if 'ORDER BY' in sql)
+        self.assertNotIn('"core_recipe"."price"', recipe_query)
+        self.assertNotIn('"core_recipe"."search_vector"', recipe_query)
+        self.assertFalse(any('core_recipe_tags' in sql for sql in queries))
+
+    def test_list_expand(self):
+        """test expanded relations are nested, the others stay ids"""
+        res, _ = self.get(
+            RECIPE_URL, {'fields': 'id,tags,ingredients', 'expand': 'tags'})
+
+        self.assertEqual(res.data, [{
+            'id': self.recipe.id,
+            'tags': [{'id': self.tag.id, 'name': 'Brunch'}],
+            'ingredients': [self.ingredient.id],
+        }])
+
+    def test_detail_fields(self):
+        """test details nest relations and honour ?fields="""
+        res, _ = self.get(detail_url(self.recipe.id), {'fields': 'id,tags'})
+
+        self.assertEqual(res.data, {
+            'id': self.recipe.id,
+            'tags': [{'id': self.tag.id, 'name': 'Brunch'}],
+        })
+
+    def test_sparse_paginated_ordering(self):
+        """test ordering columns are fetched even when not rendered"""
+        sample_recipe(user=self.user, title='Porridge', price=1.00)
+        params = {'fields': 'title', 'ordering': 'price', 'page_size': 1}
+
+        res, queries = self.get(RECIPE_URL, params)
+        self.assertEqual(res.data['results'], [{'title': 'Porridge'}])
+        res, next_queries = self.get(res.data['next'], {})
+
+        self.assertEqual(res.data['results'], [{'title': 'Shakshuka'}])
+        self.assertEqual(len(queries), len(next_queries))
+
+    def test_invalid_fields(self):
+        for params in ({'fields': 'id,password'}, {'expand': 'user'}):
+            res = self.client.get(RECIPE_URL, params)
+            self.assertEqual(
+                res.status_code, status.HTTP_400_BAD_REQUEST, params)
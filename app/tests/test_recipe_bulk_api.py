@@ -0,0 +1,164 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Recipe, Tag, Ingredient
+
+
+BULK_URL = reverse('recipe:recipe-bulk')
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def sample_recipe(user, **params):
+    """create and return a sample recipe"""
+    defaults = {'title': 'Waffles', 'time_minutes': 15, 'price': 4.00}
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeBulkApiTests(TestCase):
+    """test the bulk create/update/delete recipe endpoint"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'bulk@email.com',
+            'bulkpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Breakfast')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name='Flour')
+
+    def test_bulk_create(self):
+        """test creating many recipes with their links"""
+        payload = [
+            {
+                'title': f'Pancakes {i}',
+                'time_minutes': 10 + i,
+                'price': '3.50',
+                'tags': [self.tag.id],
+                'ingredients': [self.ingredient.id],
+            }
+            for i in range(20)
+        ]
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data['created']), 20)
+        recipe = Recipe.objects.get(id=res.data['created'][3])
+        self.assertEqual(recipe.title, 'Pancakes 3')
+        self.assertEqual(list(recipe.tags.all()), [self.tag])
+        self.assertEqual(list(recipe.ingredients.all()), [self.ingredient])
+
+    def test_bulk_create_constant_queries(self):
+        """test the number of queries does not grow with the payload"""
+        def payload(count):
+            return [{
+                'title': f'Crepe {i}',
+                'time_minutes': 5,
+                'price': '2.00',
+                'tags': [self.tag.id],
+            } for i in range(count)]
+
+        # tag check, savepoint, recipes, tag links, two touches, search
+        # vectors, release
+        with self.assertNumQueries(8):
+            self.client.post(BULK_URL, payload(2), format='json')
+        with self.assertNumQueries(8):
+            self.client.post(BULK_URL, payload(50), format='json')
+
+    def test_bulk_create_reports_item_errors(self):
+        """test invalid items are reported by position, nothing saved"""
+        other = get_user_model().objects.create_user(
+            'other@email.com',
+            'otherpass')
+        foreign_tag = Tag.objects.create(user=other, name='Dinner')
+        payload = [
+            {'title': 'Fine', 'time_minutes': 5, 'price': '1.00'},
+            {'title': 'No time', 'price': '1.00'},
+            {
+                'title': 'Foreign tag',
+                'time_minutes': 5,
+                'price': '1.00',
+                'tags': [self.tag.id, foreign_tag.id],
+            },
+        ]
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('time_minutes', res.data[1])
+        self.assertIn('tags', res.data[2])
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+    def test_bulk_update(self):
+        """test partially updating many recipes at once"""
+        recipe1 = sample_recipe(user=self.user)
+        recipe2 = sample_recipe(user=self.user, title='French Toast')
+        recipe2.tags.add(self.tag)
+        payload = [
+            {'id': recipe1.id, 'title': 'Belgian Waffles', 'price': '6.00'},
+            {'id': recipe2.id, 'time_minutes': 25, 'tags': []},
+        ]
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipe1.refresh_from_db()
+        recipe2.refresh_from_db()
+        self.assertEqual(recipe1.title, 'Belgian Waffles')
+        self.assertEqual(str(recipe1.price), '6.00')
+        self.assertEqual(recipe1.time_minutes, 15)
+        self.assertEqual(recipe2.title, 'French Toast')
+        self.assertEqual(recipe2.time_minutes, 25)
+        self.assertEqual(recipe2.tags.count(), 0)
+
+    def test_bulk_update_unknown_recipe(self):
+        """test updating a recipe of another user is rejected"""
+        other = get_user_model().objects.create_user(
+            'other@email.com',
+            'otherpass')
+        recipe = sample_recipe(user=other)
+        payload = [{'id': recipe.id, 'title': 'Hijacked'}]
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', res.data[0])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Waffles')
+
+    def test_bulk_update_requires_id(self):
+        """test an update item without an id is rejected"""
+        recipe = sample_recipe(user=self.user)
+        payload = [{'id': recipe.id, 'title': 'Crepes'}, {'title': 'x'}]
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertEqual(res.data[1], {'id': ['This field is required.']})
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Waffles')
+
+    def test_bulk_delete(self):
+        """test deleting many recipes and their links"""
+        recipes = [sample_recipe(user=self.user) for _ in range(3)]
+        recipes[0].tags.add(self.tag)
+        ids = [recipe.id for recipe in recipes[:2]]
+        res = self.client.delete(BULK_URL, {'ids': ids}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            list(Recipe.objects.values_list('id', flat=True)),
+            [recipes[2].id])
+        self.assertFalse(Recipe.tags.through.objects.exists())
+
+    def test_bulk_write_invalidates_list_cache(self):
+        """test bulk writes show up in the cached recipe list"""
+        self.client.get(RECIPE_URL)
+        payload = [{'title': 'Scones', 'time_minutes': 30, 'price': '2.50'}]
+        self.client.post(BULK_URL, payload, format='json')
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(len(res.data), 1)
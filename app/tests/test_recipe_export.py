@@ -0,0 +1,115 @@
+import csv
+import io
+import json
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Ingredient, Recipe, Tag
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False, EXPORT_CHUNK_SIZE=2)
+class RecipeExportTests(TestCase):
+    """test streaming exports of the recipe collection"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'export@email.com',
+            'exportpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        tags = [Tag.objects.create(user=self.user, name=name)
+                for name in ('Vegan', 'Quick')]
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        for i, price in enumerate(('1.00', '2.50', '3.75', '10.00', '0.99')):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Recipe "{i}", plain',
+                time_minutes=i * 5, price=price)
+            recipe.tags.add(*tags[:i % 3])
+            if i % 2:
+                recipe.ingredients.add(ingredient)
+
+        other = get_user_model().objects.create_user(
+            'other@email.com', 'otherpass')
+        Recipe.objects.create(
+            user=other, title='Not mine', time_minutes=1, price='1.00')
+
+    def export(self, params=None):
+        res = self.client.get(EXPORT_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+
+        return res, b''.join(res.streaming_content).decode('utf-8')
+
+    def listed(self, params=None):
+        params = dict(params or {}, page_size=1000)
+        return self.client.get(RECIPE_URL, params).json()['results']
+
+    def test_ndjson_matches_list(self):
+        """test each line is the list item of the same recipe, in order"""
+        for params in ({}, {'ordering': 'price'}, {'fields': 'id,tags'},
+                       {'max_time': 10, 'tags': Tag.objects.first().id},
+                       {'expand': 'tags'}):
+            res, content = self.export(params)
+
+            self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+            self.assertEqual(
+                [json.loads(line) for line in content.splitlines()],
+                self.listed(params), params)
+
+    @override_settings(VALUES_LIST_ENABLED=False)
+    def test_ndjson_through_serializer(self):
+        _, content = self.export({'ordering': 'time_minutes'})
+
+        self.assertEqual(
+            [json.loads(line) for line in content.splitlines()],
+            self.listed({'ordering': 'time_minutes'}))
+
+    def test_single_cursor(self):
+        """test the tag ids are read with the recipes, whatever the chunks"""
+        res = self.client.get(EXPORT_URL, {'fields': 'id,tags'})
+
+        with self.assertNumQueries(1):
+            lines = b''.join(res.streaming_content).splitlines()
+        self.assertEqual(len(lines), 5)
+
+    def test_csv(self):
+        res, content = self.export({'output': 'csv', 'ordering': 'id'})
+        rows = list(csv.reader(io.StringIO(content)))
+
+        self.assertEqual(res['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('recipes.csv', res['Content-Disposition'])
+        self.assertEqual(rows[0], list(self.listed()[0]))
+        expected = self.listed({'ordering': 'id'})
+        self.assertEqual(len(rows), len(expected) + 1)
+        for row, recipe in zip(rows[1:], expected):
+            record = dict(zip(rows[0], row))
+            self.assertEqual(record['title'], recipe['title'])
+            self.assertEqual(record['price'], recipe['price'])
+            self.assertEqual(
+                record['tags'], ' '.join(str(id) for id in recipe['tags']))
+
+    def test_empty_csv_has_header(self):
+        _, content = self.export(
+            {'output': 'csv', 'fields': 'id,title', 'min_time': 1000})
+
+        self.assertEqual(content, 'id,title\r\n')
+
+    def test_invalid_params(self):
+        for params in ({'output': 'xml'},
+                       {'output': 'csv', 'expand': 'tags'},
+                       {'fields': 'nope'}):
+            res = self.client.get(EXPORT_URL, params)
+            self.assertEqual(
+                res.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_login_required(self):
+        res = APIClient().get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,165 @@
+import json
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Ingredient, Recipe, Tag
+
+
+IMPORT_URL = reverse('recipe:recipe-import')
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def ndjson(*records):
+    return '\n'.join(
+        record if isinstance(record, str) else json.dumps(record)
+        for record in records
+    ).encode('utf-8')
+
+
+@override_settings(IMPORT_BATCH_SIZE=2)
+class RecipeImportTests(TestCase):
+    """test streaming imports of recipes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'import@email.com',
+            'importpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+
+    def upload(self, content, name='recipes.ndjson', **params):
+        url = IMPORT_URL
+        if params:
+            url += '?' + '&'.join(f'{k}={v}' for k, v in params.items())
+        res = self.client.post(
+            url, {'file': SimpleUploadedFile(name, content)},
+            format='multipart')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return [json.loads(line) for line in
+                b''.join(res.streaming_content).splitlines()]
+
+    def test_ndjson(self):
+        """test tags are matched by name and missing ones created once"""
+        progress = self.upload(ndjson(
+            {'title': 'Salad', 'time_minutes': 5, 'price': '3.50',
+             'tags': ['VEGAN', 'Quick'], 'ingredients': ['Lettuce']},
+            {'title': 'Soup', 'time_minutes': 30, 'price': '4.00',
+             'tags': ['Quick', 'Quick']},
+            {'title': 'Toast', 'time_minutes': 2, 'price': '1.00'},
+        ))
+
+        self.assertEqual([step['records'] for step in progress], [2, 3])
+        self.assertEqual(progress[-1]['created'], 3)
+        self.assertEqual(
+            sorted(Tag.objects.values_list('name', flat=True)),
+            ['Quick', 'Vegan'])
+        salad = Recipe.objects.get(title='Salad')
+        self.assertEqual(salad.user, self.user)
+        self.assertEqual(salad.price, Decimal('3.50'))
+        self.assertIn(self.vegan, salad.tags.all())
+        self.assertEqual(
+            list(salad.ingredients.values_list('name', flat=True)),
+            ['Lettuce'])
+        self.assertEqual(
+            Recipe.objects.get(title='Soup').tags.get().name, 'Quick')
+
+    def test_csv(self):
+        content = (
+            'title,time_minutes,price,tags,ingredients\r\n'
+            'Salad,5,3.50,Vegan; Quick,"Lettuce;Oil, olive"\r\n'
+            'Toast,2,1.00,,\r\n'
+        ).encode('utf-8')
+
+        progress = self.upload(content, name='recipes.csv')
+
+        self.assertEqual(progress[-1]['created'], 2)
+        salad = Recipe.objects.get(title='Salad')
+        self.assertEqual(
+            sorted(salad.tags.values_list('name', flat=True)),
+            ['Quick', 'Vegan'])
+        self.assertEqual(
+            sorted(salad.ingredients.values_list('name', flat=True)),
+            ['Lettuce', 'Oil, olive'])
+        self.assertFalse(Recipe.objects.get(title='Toast').tags.exists())
+
+    def test_invalid_records_are_reported(self):
+        """test bad records are left out and the rest written"""
+        progress = self.upload(ndjson(
+            {'title': 'Good', 'time_minutes': 5, 'price': '1.00'},
+            'not json',
+            {'title': 'Bad', 'time_minutes': 'soon', 'price': '1.00'},
+            '[1, 2]',
+        ))
+
+        errors = [error for step in progress for error in step['errors']]
+        self.assertEqual([error['record'] for error in errors], [2, 3, 4])
+        self.assertIn('time_minutes', errors[1]['errors'])
+        self.assertEqual(progress[-1]['invalid'], 3)
+        self.assertEqual(
+            list(Recipe.objects.values_list('title', flat=True)), ['Good'])
+
+    def test_resume(self):
+        """test ?skip= leaves out the records already imported"""
+        content = ndjson(*(
+            {'title': f'Recipe {i}', 'time_minutes': i, 'price': '1.00'}
+            for i in range(5)))
+
+        progress = self.upload(content, skip=3)
+
+        self.assertEqual(progress[-1], {
+            'records': 5, 'created': 2, 'invalid': 0, 'errors': []})
+        self.assertEqual(
+            sorted(Recipe.objects.values_list('title', flat=True)),
+            ['Recipe 3', 'Recipe 4'])
+
+    def test_round_trip(self):
+        """test an expanded export imports into another collection"""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Curry', time_minutes=40, price='7.25')
+        recipe.tags.add(self.vegan)
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Rice'))
+        res = self.client.get(
+            EXPORT_URL, {'expand': 'tags,ingredients'})
+        content = b''.join(res.streaming_content)
+
+        other = get_user_model().objects.create_user(
+            'other@email.com', 'otherpass')
+        self.client.force_authenticate(other)
+        self.upload(content)
+
+        copy = Recipe.objects.get(user=other)
+        self.assertEqual(
+            (copy.title, copy.time_minutes, copy.price),
+            ('Curry', 40, Decimal('7.25')))
+        self.assertEqual(copy.tags.get().name, 'Vegan')
+        self.assertEqual(copy.tags.get().user, other)
+        self.assertEqual(copy.ingredients.get().name, 'Rice')
+
+    @override_settings(FILE_UPLOAD_HANDLERS=[])
+    def test_file_read_from_request(self):
+        """test the file is parsed off the request, not saved first"""
+        progress = self.upload(ndjson(
+            *({'title': f'Recipe {i}', 'time_minutes': i, 'price': '1.00'}
+              for i in range(5))))
+
+        self.assertEqual([step['records'] for step in progress], [2, 4, 5])
+        self.assertEqual(Recipe.objects.count(), 5)
+
+    def test_invalid_params(self):
+        res = self.client.post(IMPORT_URL, {}, format='multipart')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        for query in ('input=xml', 'skip=-1', 'skip=some'):
+            res = self.client.post(
+                f'{IMPORT_URL}?{query}',
+                {'file': SimpleUploadedFile('r.ndjson', b'{}')},
+                format='multipart')
+            self.assertEqual(
+                res.status_code, status.HTTP_400_BAD_REQUEST, query)
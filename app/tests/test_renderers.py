@@ -0,0 +1,74 @@
+import datetime
+import unittest
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+from unittest import mock
+from django.test import SimpleTestCase
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+from rest_framework.renderers import JSONRenderer
+from core import renderers
+
+
+PAYLOAD = OrderedDict([
+    ('count', 2),
+    ('next', None),
+    ('results', [
+        OrderedDict([
+            ('id', 1),
+            ('title', 'Crème brûlée  '),
+            ('price', Decimal('5.50')),
+            ('ratio', 1.5),
+            ('tags', [3, 1]),
+            ('public', True),
+        ]),
+        {
+            'created': datetime.datetime(
+                2020, 1, 2, 3, 4, 5, 678, tzinfo=timezone.utc),
+            'day': datetime.date(2020, 1, 2),
+            'uuid': uuid.UUID(int=1),
+            'detail': _('Not found.'),
+        },
+    ]),
+])
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """test FastJSONRenderer renders what JSONRenderer does"""
+
+    def assertSameOutput(self, *args):
+        self.assertEqual(
+            renderers.FastJSONRenderer().render(*args),
+            JSONRenderer().render(*args))
+
+    def test_same_output(self):
+        self.assertSameOutput(PAYLOAD)
+
+    def test_indented_output(self):
+        self.assertSameOutput(PAYLOAD, 'application/json; indent=4')
+
+    def test_no_data(self):
+        self.assertSameOutput(None)
+
+    def test_without_orjson(self):
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertSameOutput(PAYLOAD)
+            self.test_lines()
+
+    def test_lines(self):
+        """test render_lines writes each item as JSONRenderer would"""
+        items = PAYLOAD['results']
+
+        self.assertEqual(
+            renderers.FastJSONRenderer().render_lines(items),
+            b''.join(JSONRenderer().render(item) + b'\n' for item in items))
+
+    @unittest.skipIf(renderers.orjson is None, 'orjson is not installed')
+    def test_uses_orjson(self):
+        with mock.patch.object(
+                renderers.orjson, 'dumps',
+                wraps=renderers.orjson.dumps) as dumps:
+            renderers.FastJSONRenderer().render(PAYLOAD)
+
+        dumps.assert_called_once()
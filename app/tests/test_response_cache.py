@@ -0,0 +1,127 @@
+import threading
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Recipe, Tag
+from recipe import cache
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def sample_recipe(user, **params):
+    """create and return a sample recipe"""
+    defaults = {'title': 'Ramen', 'time_minutes': 20, 'price': 8.00}
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ResponseCacheTests(TestCase):
+    """test the per-user versioned list response cache"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'cache@email.com',
+            'cachepass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        cache.reset_stats()
+
+    def test_list_served_from_cache(self):
+        """test a repeated list request runs no queries"""
+        sample_recipe(user=self.user)
+        res1 = self.client.get(RECIPE_URL)
+
+        with self.assertNumQueries(0):
+            res2 = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res2.status_code, status.HTTP_200_OK)
+        self.assertEqual(res1.data, res2.data)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_query_params_cached_separately(self):
+        """test requests with different parameters do not share entries"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(TAGS_URL)
+        res = self.client.get(TAGS_URL, {'with_counts': 1})
+
+        self.assertIn('recipe_count', res.data[0])
+
+    def test_create_invalidates_cache(self):
+        """test creating a tag shows up in the next listing"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(TAGS_URL)
+
+        self.client.post(TAGS_URL, {'name': 'Dessert'})
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(len(res.data), 2)
+
+    def test_m2m_change_invalidates_cache(self):
+        """test linking a tag to a recipe refreshes the recipe list"""
+        recipe = sample_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Noodles')
+        self.client.get(RECIPE_URL)
+
+        recipe.tags.add(tag)
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.data[0]['tags'], [tag.id])
+
+    def test_cache_scoped_to_user(self):
+        """test another user's changes do not invalidate this user"""
+        other = get_user_model().objects.create_user(
+            'other@email.com',
+            'otherpass')
+        self.client.get(RECIPE_URL)
+        version = cache.get_version(self.user.id)
+
+        sample_recipe(user=other)
+
+        self.assertEqual(cache.get_version(self.user.id), version)
+        self.assertEqual(len(self.client.get(RECIPE_URL).data), 0)
+
+    def test_evicted_version_not_reused(self):
+        """test a lost version counter never resurrects old entries"""
+        version = cache.get_version(self.user.id)
+        cache.bump_version(self.user.id)
+        cache.get_cache().delete(f'recipe:version:{self.user.id}')
+
+        self.assertGreater(cache.get_version(self.user.id), version + 1)
+
+
+class ResponseCacheCommitTests(TransactionTestCase):
+    """test invalidation waits for the writing transaction to commit"""
+
+    def test_response_cached_before_commit_not_served(self):
+        """test a list cached by another request mid-transaction is stale
+        once the write commits"""
+        user = get_user_model().objects.create_user(
+            'commit@email.com',
+            'commitpass')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        def concurrent_list():
+            try:
+                client.get(RECIPE_URL)
+            finally:
+                connection.close()
+
+        with transaction.atomic():
+            sample_recipe(user=user)
+            # another connection still sees no recipes, and caches that
+            # under the version the create has bumped already
+            reader = threading.Thread(target=concurrent_list)
+            reader.start()
+            reader.join()
+
+        res = client.get(RECIPE_URL)
+
+        self.assertEqual(len(res.data), 1)
@@ -8,6 +8,7 @@ from recipe.serializers import TagSerializer
 
 
 TAGS_URL = reverse('recipe:tag-list')
+ENSURE_URL = reverse('recipe:tag-ensure')
 
 
 class PublicTagsApiTests(TestCase):
@@ -59,6 +60,22 @@ class PrivateTagsApiTests(TestCase):
         self.assertEqual(len(res.data), 1)
         self.assertEqual(res.data[0]['name'], tag.name)
 
+    def test_tags_keyset_pagination(self):
+        """test paging through tags ordered by name then id"""
+        for name in ('Vegan', 'Dessert', 'Dinner', 'Brunch', 'Spicy'):
+            Tag.objects.create(user=self.user, name=name)
+        expected = list(
+            Tag.objects.order_by('-name', 'id').values_list('id', flat=True))
+
+        res = self.client.get(TAGS_URL, {'page_size': 3})
+        ids = [item['id'] for item in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            ids += [item['id'] for item in res.data['results']]
+
+        self.assertEqual(ids, expected)
+
     def test_create_tag_successful(self):
         """test creating a new tag"""
         payload = {'name': 'test'}
@@ -120,3 +137,49 @@ class PrivateTagsApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(len(res.data), 1)
+
+    def test_retrieve_tags_invalid_flag(self):
+        """test a non 0/1 assigned_only value is rejected"""
+        res = self.client.get(TAGS_URL, {'assigned_only': 'yes'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_duplicate_tag(self):
+        """test a name the user has, in any case, is refused"""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.post(TAGS_URL, {'name': 'VEGAN'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Tag.objects.count(), 1)
+
+    def test_ensure_tags(self):
+        """test existing tags are found and missing ones created at once"""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        other = get_user_model().objects.create_user(
+            'other@email.com', 'otherpass')
+        Tag.objects.create(user=other, name='Quick')
+
+        # the insert and the select
+        with self.assertNumQueries(2):
+            res = self.client.post(ENSURE_URL, {
+                'names': ['vegan', 'Quick', 'Spicy', 'Quick', 'QUICK'],
+            }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [tag['name'] for tag in res.data],
+            ['Vegan', 'Quick', 'Spicy', 'Quick'])
+        self.assertEqual(res.data[0]['id'], vegan.id)
+        self.assertEqual(res.data[1]['id'], res.data[3]['id'])
+        self.assertEqual(
+            sorted(Tag.objects.filter(user=self.user).values_list(
+                'name', flat=True)),
+            ['Quick', 'Spicy', 'Vegan'])
+
+    def test_ensure_tags_invalid(self):
+        for payload in ({}, {'names': []}, {'names': ['']},
+                        {'names': 'Vegan'}):
+            res = self.client.post(ENSURE_URL, payload, format='json')
+            self.assertEqual(
+                res.status_code, status.HTTP_400_BAD_REQUEST, payload)
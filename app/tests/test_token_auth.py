@@ -0,0 +1,186 @@
+import time
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from user import authentication, tokens
+
+
+ME_URL = reverse('user:me')
+
+
+def create_user(email='token@email.com', **params):
+    return get_user_model().objects.create_user(email, 'password', **params)
+
+
+class CachingTokenAuthenticationTests(TestCase):
+    """test token authentication served from the token caches"""
+
+    def setUp(self):
+        authentication.clear_local()
+        authentication.get_cache().clear()
+        authentication.reset_stats()
+
+        self.user = create_user(name='before')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_repeated_requests_skip_the_database(self):
+        """test only the first request looks the token up"""
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+        self.assertEqual(authentication.stats()['local_hits'], 1)
+
+    def test_shared_tier(self):
+        """test another process finds the token in the shared cache"""
+        self.client.get(ME_URL)
+        authentication.clear_local()
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(authentication.stats(), {
+            'local_hits': 0,
+            'shared_hits': 1,
+            'misses': 1,
+            'hit_rate': 0.5,
+        })
+
+    def test_invalid_token(self):
+        """test unknown tokens are still refused"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token nope')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_is_refused(self):
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_refused(self):
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_changes_are_not_served_stale(self):
+        """test a password/profile update drops the cached user"""
+        self.client.get(ME_URL)
+        res = self.client.patch(
+            ME_URL, {'name': 'after', 'password': 'new password'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'after')
+
+    @override_settings(TOKEN_AUTH_CACHE_SIZE=1)
+    def test_local_tier_is_bounded(self):
+        """test the least recently used token is evicted"""
+        other = Token.objects.create(user=create_user('other@email.com'))
+        self.client.get(ME_URL)
+        APIClient().get(ME_URL, HTTP_AUTHORIZATION=f'Token {other.key}')
+        authentication.get_cache().clear()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(authentication.stats()['misses'], 3)
+
+    @override_settings(TOKEN_EXPIRY=60)
+    def test_expired_token_is_refused(self):
+        """test tokens older than TOKEN_EXPIRY stop working"""
+        self.assertEqual(self.client.get(ME_URL).status_code, 200)
+        Token.objects.filter(pk=self.token.pk).update(
+            created=timezone.now() - timedelta(minutes=2))
+        authentication.clear_local()
+        authentication.get_cache().clear()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class SignedTokenAuthenticationTests(TestCase):
+    """test authentication with signed tokens"""
+
+    def setUp(self):
+        authentication.clear_local()
+        authentication.get_cache().clear()
+
+        self.user = create_user(name='signed')
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {tokens.sign(self.user)}')
+
+    def test_no_token_lookup(self):
+        """test signed tokens only load (and then cache) the user"""
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['name'], 'signed')
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_tampered_token_is_refused(self):
+        key = tokens.sign(self.user)
+        user_id, rest = key.split('.', 1)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {int(user_id) + 1}.{rest}')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_revokes_tokens(self):
+        self.client.get(ME_URL)
+        self.user.set_password('changed')
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_refused(self):
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(TOKEN_EXPIRY=60)
+    def test_expired_token_is_refused(self):
+        with mock.patch('time.time', return_value=time.time() - 120):
+            key = tokens.sign(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(str(res.data['detail']), 'Token has expired.')
@@ -0,0 +1,75 @@
+import hashlib
+import io
+from PIL import Image
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase
+from rest_framework.exceptions import ValidationError
+from recipe.uploads import StagingUploadHandler, UploadTooLarge
+
+
+def jpeg_bytes(size=(64, 64)):
+    """return the bytes of a noisy JPEG"""
+    buffer = io.BytesIO()
+    Image.effect_noise(size, 64).convert('RGB').save(buffer, 'JPEG')
+
+    return buffer.getvalue()
+
+
+class StagingUploadHandlerTests(SimpleTestCase):
+    """test streaming recipe image uploads into staging"""
+
+    def stream(self, data, handler=None, field_name='image'):
+        """feed <data> through a handler in chunks, return the upload"""
+        handler = handler or StagingUploadHandler()
+        handler.new_file(field_name, 'photo.jpg', 'image/jpeg', len(data))
+        for start in range(0, len(data), handler.chunk_size):
+            handler.receive_data_chunk(
+                data[start:start + handler.chunk_size], start)
+
+        return handler.file_complete(len(data))
+
+    def test_upload_written_to_staging(self):
+        """test the file lands in staging with its hash and size"""
+        data = jpeg_bytes((512, 512))
+        upload = self.stream(data)
+        self.addCleanup(default_storage.delete, upload.staged_name)
+        self.addCleanup(upload.close)
+
+        self.assertEqual(upload.sha256, hashlib.sha256(data).hexdigest())
+        self.assertEqual(upload.size, len(data))
+        self.assertEqual(
+            upload.temporary_file_path(),
+            default_storage.path(upload.staged_name))
+        with default_storage.open(upload.staged_name) as fh:
+            self.assertEqual(fh.read(), data)
+
+    def test_non_image_rejected_on_first_chunk(self):
+        """test content that is not an image is refused straight away"""
+        handler = StagingUploadHandler()
+        handler.new_file('image', 'photo.jpg', 'image/jpeg', None)
+
+        with self.assertRaises(ValidationError):
+            handler.receive_data_chunk(b'%PDF-1.4' + b'\0' * 100, 0)
+        self.assertFalse(default_storage.exists(handler.staged_name))
+
+    def test_oversized_upload_rejected_midway(self):
+        """test the upload stops once it passes the size limit"""
+        data = jpeg_bytes((512, 512))
+        handler = StagingUploadHandler(max_size=len(data) // 2)
+
+        with self.assertRaises(UploadTooLarge):
+            self.stream(data, handler)
+        self.assertFalse(default_storage.exists(handler.staged_name))
+
+    def test_oversized_content_length_rejected(self):
+        """test a too large request is refused before it is read"""
+        handler = StagingUploadHandler(max_size=1000)
+
+        with self.assertRaises(UploadTooLarge):
+            handler.handle_raw_input(None, {}, 10 * 2 ** 20, b'boundary')
+
+    def test_other_file_fields_ignored(self):
+        """test only the image field is written"""
+        upload = self.stream(jpeg_bytes(), field_name='attachment')
+
+        self.assertIsNone(upload)
@@ -1,8 +1,14 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APIClient
 from rest_framework import status
+from rest_framework.authtoken.models import Token
+from user import passwords
 
 
 CREATE_USER_URL = reverse('user:create')
@@ -67,6 +73,46 @@ class PublicUsersApiTest(TestCase):
         self.assertIn('token', res.data)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
+    def test_token_issued_in_one_statement(self):
+        """test a login costs the user lookup and a single upsert"""
+        payload = {'email': 'come@me.com', 'password': 'friend'}
+        user = create_user(**payload)
+
+        with self.assertNumQueries(2):
+            res = self.client.post(TOKEN_URL, payload)
+        with self.assertNumQueries(2):
+            res2 = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.data['token'], res2.data['token'])
+        self.assertEqual(Token.objects.get(user=user).key, res.data['token'])
+
+    @override_settings(TOKEN_EXPIRY=60)
+    def test_expired_token_is_replaced_on_login(self):
+        payload = {'email': 'come@me.com', 'password': 'friend'}
+        user = create_user(**payload)
+        old = self.client.post(TOKEN_URL, payload).data['token']
+        Token.objects.filter(user=user).update(
+            created=timezone.now() - timedelta(minutes=2))
+
+        res = self.client.post(TOKEN_URL, payload)
+
+        self.assertNotEqual(res.data['token'], old)
+        self.assertEqual(Token.objects.get(user=user).key, res.data['token'])
+        res = self.client.get(
+            ME_URL, HTTP_AUTHORIZATION=f'Token {res.data["token"]}')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(TOKEN_SIGNED=True)
+    def test_signed_token_issued_without_token_row(self):
+        payload = {'email': 'come@me.com', 'password': 'friend'}
+        create_user(**payload)
+
+        with self.assertNumQueries(1):
+            res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(Token.objects.exists())
+
     def test_create_token_invalid_credentials(self):
         """assure that a token is not created for invalid credentials"""
         create_user(email='come@me.com', password='elvish')
@@ -94,6 +140,34 @@ class PublicUsersApiTest(TestCase):
         self.assertNotIn('token', res.data)
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_login_rehashes_outdated_password(self):
+        """test a password stored with an old hasher is upgraded"""
+        payload = {'email': 'come@me.com', 'password': 'friend'}
+        with override_settings(PASSWORD_HASHERS=[
+                'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']):
+            user = create_user(**payload)
+        self.assertTrue(user.password.startswith('pbkdf2_sha1$'))
+
+        res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(user.check_password(payload['password']))
+
+    def test_login_refused_when_hashing_pool_is_full(self):
+        """test logins beyond the hashing queue get a 503"""
+        payload = {'email': 'come@me.com', 'password': 'friend'}
+        create_user(**payload)
+
+        with mock.patch.object(passwords, '_get_pool', return_value=(
+                None, threading.Semaphore(0))):
+            res = self.client.post(TOKEN_URL, payload)
+
+        self.assertNotIn('token', res.data)
+        self.assertEqual(
+            res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
     def test_retrieve_user_unauthorized(self):
         """test that authentication is required for users"""
         res = self.client.get(ME_URL)
@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Ingredient, Recipe, Tag
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class ValuesListTests(TestCase):
+    """test lists built from values() match the serializers exactly"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'values@email.com',
+            'valuespass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('Vegan', 'Spicy   hot', 'Café', 'Unused')
+        ]
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ('Tofu', 'Chili', '"Quoted"')
+        ]
+        for i, price in enumerate(('0.00', '4.50', '12.99', '999.99')):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Recipe {i}', time_minutes=i * 7,
+                price=price)
+            recipe.tags.add(*tags[:i])
+            recipe.ingredients.add(*ingredients[i % 3:])
+
+    def assertSameContent(self, url, params=None):
+        res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with override_settings(VALUES_LIST_ENABLED=False):
+            expected = self.client.get(url, params)
+
+        self.assertEqual(res.content, expected.content, params)
+        self.assertEqual(res.get('ETag'), expected.get('ETag'), params)
+
+    def test_recipes(self):
+        for params in (
+                {},
+                {'fields': 'title,price,tags'},
+                {'ordering': 'price', 'page_size': 2},
+                {'ordering': '-time_minutes', 'min_price': '1'},
+                {'search': 'recipe', 'page_size': 3},
+                {'tags': str(Tag.objects.first().id)},
+        ):
+            self.assertSameContent(RECIPE_URL, params)
+
+    def test_recipe_pages(self):
+        """test the cursor of a values() page continues the same way"""
+        res = self.client.get(RECIPE_URL, {'page_size': 3})
+
+        self.assertSameContent(res.data['next'])
+
+    def test_attributes(self):
+        for url in (TAGS_URL, INGREDIENTS_URL):
+            for params in ({}, {'with_counts': 1}, {'assigned_only': 1},
+                           {'with_counts': 1, 'page_size': 2}):
+                self.assertSameContent(url, params)
+
+    def test_expanded_recipes_use_serializers(self):
+        """test lists with nested relations keep the serializer path"""
+        self.assertSameContent(RECIPE_URL, {'expand': 'tags'})
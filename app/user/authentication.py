@@ -0,0 +1,201 @@
+"""Token authentication that does not query the database on every request
+
+Resolved (user, token) pairs are kept in two tiers: a bounded LRU in this
+process and the shared TOKEN_AUTH_CACHE_ALIAS cache, so a token is looked
+up in the database once per shared cache timeout rather than per request.
+
+Saving a user (which covers deactivation and password changes) and saving
+or deleting a token drop the entries from the shared cache and the local
+LRU of the process that made the change (see user/signals.py). Other
+processes keep their local copy for at most TOKEN_AUTH_CACHE_LOCAL_TIMEOUT
+seconds, which is why that timeout is kept short.
+
+Signed tokens (see user/tokens.py) need no token lookup at all; their
+user is cached by id in the same two tiers.
+"""
+import hashlib
+import pickle
+import threading
+import time
+from collections import Counter, OrderedDict
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import caches
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from user import tokens
+
+
+_local = OrderedDict()
+_local_lock = threading.Lock()
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+class CachingTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication backed by the local and shared token caches"""
+
+    def authenticate_credentials(self, key):
+        if tokens.is_signed(key):
+            return self.authenticate_signed(key)
+
+        cached = get(key)
+        if cached is None:
+            cached = super().authenticate_credentials(key)
+            put(key, *cached)
+
+        if tokens.is_expired(cached[1]):
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+
+        return cached
+
+    def authenticate_signed(self, key):
+        try:
+            user_id, password = tokens.unsign(key)
+        except signing.SignatureExpired:
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        except signing.BadSignature:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        user = get_user(user_id)
+        if user is None:
+            user = get_user_model().objects.filter(pk=user_id).first()
+            if user is not None:
+                put_user(user)
+
+        if user is None or not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'))
+        if tokens.fingerprint(user) != password:
+            # the password changed since the token was issued
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        return user, key
+
+
+def get_cache():
+    return caches[settings.TOKEN_AUTH_CACHE_ALIAS]
+
+
+def _cache_key(key):
+    # the shared cache may be readable by other services; don't store the
+    # credential itself in its keys
+    return 'auth:token:' + hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def _user_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def get(key):
+    """return the cached (user, token) for <key>, or None on a miss"""
+    return _get(_cache_key(key))
+
+
+def put(key, user, token):
+    """cache the (user, token) pair <key> authenticated as"""
+    _put(_cache_key(key), (user, token))
+
+
+def get_user(user_id):
+    """return the cached user signed tokens of <user_id> stand for"""
+    return _get(_user_key(user_id))
+
+
+def put_user(user):
+    _put(_user_key(user.pk), user)
+
+
+def invalidate(*keys):
+    """forget the cached pairs for the given token keys"""
+    _invalidate([_cache_key(key) for key in keys])
+
+
+def invalidate_user(user_id):
+    """forget the user cached for signed tokens of <user_id>"""
+    _invalidate([_user_key(user_id)])
+
+
+def _get(cache_key):
+    """the cached value of <cache_key>, or None on a miss
+
+    Every hit unpickles a fresh copy so requests never share (and mutate)
+    the same user instance.
+    """
+    now = time.monotonic()
+    with _local_lock:
+        entry = _local.get(cache_key)
+        if entry is not None and entry[0] > now:
+            _local.move_to_end(cache_key)
+            payload = entry[1]
+        else:
+            payload = None
+    if payload is not None:
+        _count('local_hits')
+        return pickle.loads(payload)
+
+    payload = get_cache().get(cache_key)
+    if payload is None:
+        _count('misses')
+        return None
+
+    _count('shared_hits')
+    _store_local(cache_key, payload)
+
+    return pickle.loads(payload)
+
+
+def _put(cache_key, value):
+    payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    get_cache().set(
+        cache_key, payload, timeout=settings.TOKEN_AUTH_CACHE_TIMEOUT)
+    _store_local(cache_key, payload)
+
+
+def _invalidate(cache_keys):
+    with _local_lock:
+        for cache_key in cache_keys:
+            _local.pop(cache_key, None)
+    get_cache().delete_many(cache_keys)
+
+
+def clear_local():
+    with _local_lock:
+        _local.clear()
+
+
+def _store_local(cache_key, payload):
+    expires = time.monotonic() + settings.TOKEN_AUTH_CACHE_LOCAL_TIMEOUT
+    with _local_lock:
+        _local[cache_key] = (expires, payload)
+        _local.move_to_end(cache_key)
+        while len(_local) > settings.TOKEN_AUTH_CACHE_SIZE:
+            _local.popitem(last=False)
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def stats():
+    """return the hit/miss counters for this process"""
+    with _stats_lock:
+        local, shared, misses = (
+            _stats['local_hits'], _stats['shared_hits'], _stats['misses'])
+
+    total = local + shared + misses
+    return {
+        'local_hits': local,
+        'shared_hits': shared,
+        'misses': misses,
+        'hit_rate': (local + shared) / total if total else 0.0,
+    }
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
+from rest_framework.request import Request
+from user import passwords
+
+
+class PooledModelBackend(ModelBackend):
+    """ModelBackend verifying passwords on the hashing pool
+
+    A password stored with an outdated hasher is rehashed with the
+    preferred one on a successful login, as User.check_password() would.
+
+    LoginBusy is only turned into a 503 inside DRF views; other callers,
+    such as the admin login, get a failed login instead of a 500.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        try:
+            return self._authenticate(request, username, password, **kwargs)
+        except passwords.LoginBusy:
+            if isinstance(request, Request):
+                raise
+            # stops authenticate() trying the remaining backends
+            raise PermissionDenied
+
+    def _authenticate(self, request, username, password, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # hash anyway, so unknown and known emails take as long
+            passwords.encode(password)
+            return None
+
+        valid, must_update = passwords.check(password, user.password)
+        if not valid or not self.user_can_authenticate(user):
+            return None
+        if must_update:
+            user.password = passwords.encode(password)
+            user.save(update_fields=['password'])
+
+        return user
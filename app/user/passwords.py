@@ -0,0 +1,73 @@
+"""Password hashing on a bounded thread pool
+
+Hashing is deliberately slow, so a burst of logins can occupy every thread
+of a worker for as long as it lasts. Running the hashes here caps how many
+run at once (LOGIN_HASHING_WORKERS) and how many may wait for a turn
+(LOGIN_HASHING_QUEUE); further logins are refused straight away with a
+503 instead of queueing behind the burst. The hashers release the GIL, so
+the request threads not hashing keep running.
+
+Only the hashing runs on the pool; the database work stays on the request
+thread and its connection.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from rest_framework import exceptions, status
+
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+
+
+class LoginBusy(exceptions.APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many logins in progress, try again shortly.'
+    default_code = 'login_busy'
+
+
+def check(password, encoded):
+    """return (valid, must_update) for <password> against <encoded>
+
+    must_update is True when the hash uses a hasher or work factor other
+    than the preferred one and should be replaced.
+    """
+    return run(_check, password, encoded)
+
+
+def encode(password):
+    """return the hash of <password> with the preferred hasher"""
+    return run(make_password, password)
+
+
+def run(func, *args):
+    """call func(*args) on the hashing pool and return its result"""
+    executor, slots = _get_pool()
+    if not slots.acquire(blocking=False):
+        raise LoginBusy()
+    try:
+        return executor.submit(func, *args).result()
+    finally:
+        slots.release()
+
+
+def _check(password, encoded):
+    outdated = []
+    valid = check_password(password, encoded, setter=outdated.append)
+
+    return valid, bool(outdated)
+
+
+def _get_pool():
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            workers = settings.LOGIN_HASHING_WORKERS
+            _executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix='password-hashing')
+            _slots = threading.BoundedSemaphore(
+                workers + settings.LOGIN_HASHING_QUEUE)
+
+    return _executor, _slots
@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from user import authentication
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """drop cached authentications of a changed user
+
+    Covers deactivation and password changes, and keeps request.user from
+    serving a stale name or email after a profile update.
+    """
+    if not created:
+        authentication.invalidate(*Token.objects.filter(
+            user=instance).values_list('key', flat=True))
+        authentication.invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    """drop the cached authentication of a saved or deleted token"""
+    authentication.invalidate(instance.key)
+
+
+@receiver(post_delete, sender=get_user_model())
+def invalidate_deleted_user(sender, instance, **kwargs):
+    """signed tokens of a deleted user must stop working at once"""
+    authentication.invalidate_user(instance.pk)
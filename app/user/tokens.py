@@ -0,0 +1,117 @@
+"""Issuing and checking API tokens
+
+By default a user has one database token, issued by a single upsert so a
+login costs one statement and concurrent logins of the same user can't
+trip over the unique user_id constraint.
+
+With TOKEN_SIGNED = True logins instead get a signed token carrying the
+user id, the issue time and a fingerprint of the password hash. It is
+checked without a token table lookup, and a password change revokes every
+signed token of the user; a single signed token can't be revoked before
+it expires.
+
+TOKEN_EXPIRY (seconds) limits the age of both kinds. An expired database
+token is replaced on the user's next login.
+"""
+import hashlib
+from datetime import timedelta
+from django.conf import settings
+from django.core import signing
+from django.db import connection
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+
+SIGNING_SALT = 'user.tokens'
+
+ISSUE_SQL = """
+WITH issued AS (
+    INSERT INTO {table} (key, user_id, created) VALUES (%s, %s, %s)
+    ON CONFLICT (user_id) {on_conflict}
+    RETURNING key
+)
+SELECT key FROM issued
+UNION ALL
+-- the existing key, unless the insert or update returned one: this still
+-- sees the statement's snapshot, i.e. the key an update replaced
+SELECT key FROM {table}
+WHERE user_id = %s AND NOT EXISTS (SELECT 1 FROM issued)
+"""
+
+REPLACE_EXPIRED = (
+    'DO UPDATE SET key = EXCLUDED.key, created = EXCLUDED.created '
+    'WHERE {table}.created < %s')
+
+
+def issue(user):
+    """return a token for <user>"""
+    if settings.TOKEN_SIGNED:
+        return sign(user)
+
+    return upsert(user)
+
+
+def upsert(user):
+    """return the database token of <user>, creating it if need be
+
+    The key comes back from the insert, or from the existing row when
+    there is one (and it has not expired) in the same statement.
+    """
+    table = connection.ops.quote_name(Token._meta.db_table)
+    now = timezone.now()
+    params = [Token().generate_key(), user.pk, now]
+    on_conflict = 'DO NOTHING'
+    if settings.TOKEN_EXPIRY is not None:
+        on_conflict = REPLACE_EXPIRED.format(table=table)
+        params.append(now - timedelta(seconds=settings.TOKEN_EXPIRY))
+    params.append(user.pk)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            ISSUE_SQL.format(table=table, on_conflict=on_conflict), params)
+        row = cursor.fetchone()
+    if row is not None:
+        return row[0]
+
+    # the conflicting row was committed by a concurrent login after this
+    # statement's snapshot was taken, so only a new query can see it
+    return Token.objects.filter(user=user).values_list(
+        'key', flat=True).get()
+
+
+def is_expired(token):
+    """True if the database <token> is older than TOKEN_EXPIRY"""
+    return settings.TOKEN_EXPIRY is not None and (
+        token.created
+        < timezone.now() - timedelta(seconds=settings.TOKEN_EXPIRY))
+
+
+def sign(user):
+    """return a signed token for <user>"""
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign(
+        f'{user.pk}.{fingerprint(user)}')
+
+
+def is_signed(key):
+    # database tokens are hex digits only
+    return ':' in key
+
+
+def unsign(key):
+    """return (user id, password fingerprint) of a signed token
+
+    Raises signing.SignatureExpired for expired tokens and
+    signing.BadSignature for anything else that does not check out.
+    """
+    value = signing.TimestampSigner(salt=SIGNING_SALT).unsign(
+        key, max_age=settings.TOKEN_EXPIRY)
+    user_id, _, password = value.partition('.')
+    try:
+        return int(user_id), password
+    except ValueError:
+        raise signing.BadSignature('malformed token')
+
+
+def fingerprint(user):
+    """short digest of the user's password hash"""
+    return hashlib.sha256(user.password.encode('utf-8')).hexdigest()[:16]
@@ -1,8 +1,11 @@
-from rest_framework import authentication, permissions
+from rest_framework import permissions
+from rest_framework.response import Response
 from rest_framework.generics import CreateAPIView, RetrieveUpdateAPIView
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
+from .authentication import CachingTokenAuthentication
 from .serializers import UserSerializer, AuthTokenSerializer
+from . import tokens
 
 
 class CreateUserView(CreateAPIView):
@@ -15,11 +18,20 @@ class CreateTokenView(ObtainAuthToken):
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
+    def post(self, request, *args, **kwargs):
+        """issue a token in one statement instead of get_or_create"""
+        serializer = self.serializer_class(
+            data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+
+        return Response({
+            'token': tokens.issue(serializer.validated_data['user'])})
+
 
 class ManageUserView(RetrieveUpdateAPIView):
     """manages authenticated users"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachingTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):